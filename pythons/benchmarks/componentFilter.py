@@ -0,0 +1,97 @@
+"""
+Compares the single pass component filter (filterComponents with the predicates extractRoutesArray
+passes it) against the old remove_small_objects + regionprops loop, on the walkways in data.json and
+on a synthetic skeleton with thousands of fragments. On the walkways it also checks that
+extractRoutesArray and the backend's walkwaySkeleton.extractSkeleton give the same skeleton.
+
+Run from the pythons folder: python benchmarks/componentFilter.py
+"""
+import inspect
+import json
+import os
+import sys
+import time
+import warnings
+
+import cv2
+import numpy as np
+from skimage.measure import label, regionprops
+from skimage.morphology import remove_small_objects, skeletonize
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "syds_backend"))
+from src.utils.walkwaySkeleton import extractSkeleton
+from utils.helpers import areaAtLeast, areaOutsideRange, base64ToImage, extractRoutesArray, filterComponents
+
+
+def legacyPrune(skeleton, min_area=100, max_area=200):
+    """
+    The filtering extractRoutesArray used to do, kept here as the reference output
+    """
+    labeled = label(skeleton)
+    if "max_size" in inspect.signature(remove_small_objects).parameters:
+        # scikit-image 0.26 forwards min_size to the inclusive max_size, 49 keeps the old "under 50" meaning
+        pruned = remove_small_objects(labeled, max_size=49)
+    else:
+        pruned = remove_small_objects(labeled, min_size=50)
+    filtered = np.zeros_like(pruned)
+    for region in regionprops(pruned):
+        if not (min_area <= region.area <= max_area):
+            filtered[pruned == region.label] = region.label
+    return (filtered > 0).astype(np.uint8)
+
+
+def prune(skeleton):
+    return filterComponents(skeleton, [areaAtLeast(50), areaOutsideRange(100, 200)]).astype(np.uint8)
+
+
+def timeIt(function, *args, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def syntheticSkeleton(size=2000, seed=0):
+    """
+    Rows of horizontal strokes of 10 to 300 pixels with gaps between them, so there are thousands
+    of separate fragments and every area bucket gets hit
+    """
+    rng = np.random.default_rng(seed)
+    skeleton = np.zeros((size, size), dtype=bool)
+    for y in range(0, size, 3):
+        x = int(rng.integers(0, 20))
+        while x < size:
+            length = int(rng.integers(10, 300))
+            skeleton[y, x:x + length] = True
+            x += length + int(rng.integers(2, 20))
+    return skeleton
+
+
+def main():
+    warnings.simplefilter("ignore")  # remove_small_objects warns when given a single label
+    with open("data.json") as f:
+        data = json.load(f)
+    cases = []
+    for floor, walkway in enumerate(data["walkways"]):
+        image = base64ToImage(walkway)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        # The skeletons the notebooks and the backend really build, prune has to reproduce both
+        used = [extractRoutesArray(walkway), extractSkeleton(image).astype(np.uint8)]
+        cases.append((f"floor {floor}", skeletonize(cv2.inRange(gray, 50, 150) > 0), used))
+    cases.append(("synthetic", syntheticSkeleton(), []))
+
+    for name, skeleton, used in cases:
+        expected, legacyTime = timeIt(legacyPrune, skeleton)
+        result, newTime = timeIt(prune, skeleton)
+        same = np.array_equal(expected, result)
+        print(f"{name:>10}: {int(label(skeleton).max()):5d} fragments, legacy {legacyTime * 1000:8.1f} ms, "
+              f"single pass {newTime * 1000:6.1f} ms, identical: {same}"
+              + (f", same as extractRoutesArray and extractSkeleton: "
+                 f"{all(np.array_equal(result, other) for other in used)}" if used else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compares how long a simulator takes to load one estate exported as a shapefile set per layer and floor,
+as a single GeoPackage and as one FlatGeobuf file per layer, plus a bounding box query through the
+spatial index of each.
+
+Run from the pythons folder: python benchmarks/containerLoad.py [data.json]
+"""
+import contextlib
+import glob
+import io
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import geopandas as gpd
+import pyogrio
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from exportShapes import exportFloor, loadFloors
+from utils.shapeExport import save_floors_container
+
+
+def export(floors, outputDir, fileFormat):
+    with contextlib.redirect_stdout(io.StringIO()):  # The exporters print a line per file
+        results = [exportFloor(job, outputDir, fileFormat=fileFormat) for job in floors]
+        if fileFormat != "shp":
+            save_floors_container([layers for _, _, layers in results], outputDir, "estate", fileFormat)
+
+
+def sources(outputDir, fileFormat):
+    """
+    Returns every (path, layer) a loader has to open for the export in outputDir
+    """
+    if fileFormat == "gpkg":
+        path = os.path.join(outputDir, "estate.gpkg")
+        return [(path, layer) for layer, _ in pyogrio.list_layers(path)]
+    return [(path, None) for path in sorted(glob.glob(os.path.join(outputDir, f"*.{fileFormat}")))]
+
+
+def loadAll(items, bbox=None):
+    return sum(len(gpd.read_file(path, layer=layer, bbox=bbox)) for path, layer in items)
+
+
+def best(function, *args, repeats=5):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main():
+    warnings.simplefilter("ignore")  # No CRS is set on the exports
+    floors = loadFloors(sys.argv[1] if len(sys.argv) > 1 else "data.json")
+    with tempfile.TemporaryDirectory() as root:
+        for fileFormat in ("shp", "gpkg", "fgb"):
+            outputDir = os.path.join(root, fileFormat)
+            _, exportTime = best(export, floors, outputDir, fileFormat, repeats=1)
+            items = sources(outputDir, fileFormat)
+            files = len(os.listdir(outputDir))
+            features, loadTime = best(loadAll, items)
+            hits, queryTime = best(loadAll, items, (0, 0, 150, 150))
+            print(f"{fileFormat:>4}: {files:3d} files on disk, {len(items):3d} opened, {features:5d} features, "
+                  f"export {exportTime * 1000:6.1f} ms, load {loadTime * 1000:6.1f} ms, "
+                  f"bbox query {queryTime * 1000:6.1f} ms ({hits} features)")
+
+
+if __name__ == "__main__":
+    main()
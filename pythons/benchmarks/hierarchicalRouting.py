@@ -0,0 +1,108 @@
+"""
+Compares the hierarchical routing mode of the backend's gridSolver against the exact search on the
+floors of data.json rasterized at a finer cell size, for speed and for how much longer its routes are.
+
+Run from the pythons folder: python benchmarks/hierarchicalRouting.py [data.json] --scale 8 --clusters 32 64 128
+--bfs also times the old per tenant BFS, which takes minutes once the grids get large.
+"""
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "syds_backend"))
+from src.utils.distanceField import EMPTY, TENANT, WALL, BIN
+from src.utils.gridSolver import gridSolver
+from src.utils.processNumpy import processNumpy
+
+
+def scaledFloors(path, scale, binCount, seed=0):
+    """
+    Builds the floor grids of data.json and blows every cell up to scale x scale cells. Walkways get
+    scale cells wide, each tenant stays one cell on the side of its block that faces its walkway.
+
+    Returns a list of grids with binCount bins dropped on random walkway cells
+    """
+    with open(path) as f:
+        data = json.load(f)
+    sources = [base64.b64decode(walkway.split(",")[1]) for walkway in data["walkways"]]
+    floors = processNumpy(sources, data["drawnRegions"], data["shapeLabels"]).requestFloors()
+    rng = np.random.default_rng(seed)
+    grids = []
+    for floor in floors:
+        grid = floor["grid"]
+        scaled = np.kron(np.where(grid == EMPTY, EMPTY, WALL), np.ones((scale, scale), dtype=np.int8)).astype(np.int8)
+        rows, cols = grid.shape
+        for x, y in floor["tenants"]:
+            for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                if 0 <= x + dx < cols and 0 <= y + dy < rows and grid[y + dy, x + dx] == EMPTY:
+                    break
+            tx = scale * x + (scale - 1 if dx > 0 else 0 if dx < 0 else scale // 2)
+            ty = scale * y + (scale - 1 if dy > 0 else 0 if dy < 0 else scale // 2)
+            scaled[ty, tx] = TENANT
+        ys, xs = np.nonzero(scaled == EMPTY)
+        picks = rng.choice(len(xs), size=min(binCount, len(xs)), replace=False)
+        scaled[ys[picks], xs[picks]] = BIN
+        grids.append(scaled)
+    return grids
+
+
+def solve(grid, mode, clusterSize=64):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # gridSolver prints every tenant and bin
+        routes = gridSolver(grid, mode, clusterSize).routes
+    return routes, time.perf_counter() - start
+
+
+def compare(exact, routes):
+    """
+    Returns (extra steps per route, routes whose reachability differs)
+    """
+    extra = []
+    mismatched = 0
+    for tenant, path in exact.items():
+        other = routes.get(tenant, [])
+        if bool(path) != bool(other):
+            mismatched += 1
+        elif path:
+            extra.append(len(other) - len(path))
+    return np.array(extra), mismatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hierarchical against exact grid routing")
+    parser.add_argument("input", nargs="?", default="data.json")
+    parser.add_argument("--scale", type=int, default=8, help="Cells per side each cell of the 379 x 600 grids becomes")
+    parser.add_argument("--clusters", type=int, nargs="+", default=[32, 64, 128], help="Cluster sizes to try")
+    parser.add_argument("--bins", type=int, default=4, help="Bins dropped on each floor")
+    parser.add_argument("--bfs", action="store_true", help="Also time the per tenant BFS")
+    args = parser.parse_args()
+
+    grids = scaledFloors(args.input, args.scale, args.bins)
+    for index, grid in enumerate(grids):
+        tenants = int((grid == TENANT).sum())
+        print(f"\nFloor {index}: {grid.shape[0]} x {grid.shape[1]} cells, {tenants} tenants")
+        exact, exactTime = solve(grid, "distanceField")
+        lengths = sum(len(path) for path in exact.values())
+        print(f"  {'distanceField (exact)':<24} {exactTime:7.2f}s")
+        if args.bfs:
+            _, bfsTime = solve(grid, "bfs")
+            print(f"  {'bfs (exact)':<24} {bfsTime:7.2f}s")
+        for clusterSize in args.clusters:
+            routes, hierarchicalTime = solve(grid, "hierarchical", clusterSize)
+            extra, mismatched = compare(exact, routes)
+            longer = (extra.sum() / lengths * 100) if lengths else 0.0
+            print(f"  {f'hierarchical {clusterSize}':<24} {hierarchicalTime:7.2f}s  "
+                  f"{longer:5.2f}% longer in total, worst route +{extra.max() if extra.size else 0} steps, "
+                  f"{(extra == 0).mean() * 100 if extra.size else 100:5.1f}% optimal"
+                  + (f", {mismatched} reachability mismatches" if mismatched else ""))
+
+
+if __name__ == "__main__":
+    main()
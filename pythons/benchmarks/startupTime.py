@@ -0,0 +1,63 @@
+"""
+Measures how long the backend and the post-processing utils take to import, and fails when a
+heavy library sneaks back into the startup path or an import goes over its time budget.
+
+Run from the repository root or the pythons folder: python pythons/benchmarks/startupTime.py
+Every import runs in a fresh interpreter, the best of --repeats runs is reported.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+# (folder the import runs from, module, modules that must not be loaded by it, budget in seconds)
+TARGETS = [
+    ("syds_backend", "src.main", ["matplotlib", "skimage", "geopandas", "pandas", "src.utils.FloorPlanExtractor"], 1.0),
+    ("syds_backend", "src.utils.workerPool", ["cv2", "matplotlib", "src.utils.gridSolver"], 0.3),
+    ("syds_backend", "src.utils.FloorPlanExtractor", ["matplotlib"], 0.5),
+    ("pythons", "utils.helpers", ["matplotlib", "skimage.morphology", "scipy.sparse"], 0.5),
+    ("pythons", "utils.shapeExport", ["matplotlib", "geopandas", "pandas"], 0.5),
+]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start,
+                   "loaded": [name for name in {forbidden!r} if name in sys.modules]}}))
+"""
+
+
+def measure(folder, module, forbidden):
+    output = subprocess.run([sys.executable, "-c", PROBE.format(module=module, forbidden=forbidden)],
+                            cwd=os.path.join(ROOT, folder), capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time check for the backend and the utils")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplies every time budget, for slow machines")
+    args = parser.parse_args()
+
+    failed = False
+    for folder, module, forbidden, budget in TARGETS:
+        runs = [measure(folder, module, forbidden) for _ in range(args.repeats)]
+        seconds = min(run["seconds"] for run in runs)
+        loaded = runs[0]["loaded"]
+        problems = []
+        if loaded:
+            problems.append(f"loads {', '.join(loaded)}")
+        if seconds > budget * args.scale:
+            problems.append(f"over the {budget * args.scale:.2f}s budget")
+        failed = failed or bool(problems)
+        status = "FAIL " + "; ".join(problems) if problems else "ok"
+        print(f"{folder + '/' + module:<45} {seconds * 1000:7.1f} ms  {status}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
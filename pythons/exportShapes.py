@@ -0,0 +1,186 @@
+"""
+Headless version of the formingNumpy notebook: turns the exported floor data into the shapefiles
+in shapes/ without opening a single plot window (unless --plot is given).
+
+    python exportShapes.py                         # data.json -> shapes/
+    python exportShapes.py processed.json --floor 1
+    python exportShapes.py data.json --points points.json --workers 4
+    python exportShapes.py --format gpkg           # every layer of every floor in shapes/estate.gpkg
+
+data.json is what the frontend exports ("walkways", "paddedImages", "drawnRegions", "shapeLabels",
+one entry per floor). processed.json is a single already processed floor ("paths" skeleton grid and
+"tenants" contours per category). The optional points file holds the hand placed points per floor:
+    {"1": {"bins": [[x, y], ...], "agents": [...], "stairs": [...], "entrypoints": [...]}, ...}
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.helpers import (breakThroughWalls, connectPointsToSkeleton, extractOuterWalls, extractRoutesArray,
+                           gettingTenantWalls, graphToSegments, nearestSkeletonIndex, skeletonToGraph)
+from utils.shapeExport import (CONTAINER_DRIVERS, build_floor_layers, save_agent_shapefile, save_bin_shapefile,
+                               save_entrypoint_shapefile, save_floors_container, save_outerwall_shapefile,
+                               save_path_segments_shapefile, save_stair_shapefile, save_tenant_lines_shapefile_exact)
+
+
+class stageTimer():
+    def __init__(self):
+        """
+        Collects how long each named stage of a floor took
+        """
+        self.timings = {}
+        self._start = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + now - self._start
+        self._start = now
+
+
+def loadFloors(path, floor=1):
+    """
+    Reads data.json or processed.json
+
+    Returns a list of floor jobs, each a dictionary with the floor number and its inputs
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if "paths" in data:
+        # processed.json, the skeleton and the tenants are already worked out
+        return [{"floor": floor, "skeleton": data["paths"], "tenants": data.get("tenants", {})}]
+
+    floors = []
+    for index, walkway in enumerate(data["walkways"]):
+        key = str(index)
+        floors.append({
+            "floor": index + 1,  # Shapefiles are numbered from floor 1
+            "walkway": walkway,
+            "paddedImage": data["paddedImages"][index] if index < len(data.get("paddedImages", [])) else None,
+            "regions": data.get("drawnRegions", {}).get(key, []),
+            "labels": data.get("shapeLabels", {}).get(key, {}),
+        })
+    return floors
+
+
+def exportFloor(job, outputDir="shapes", points=None, plot=False, snapTolerance=0.0, fileFormat="shp", connectLimit=0):
+    """
+    Runs every stage for one floor and writes its shapefiles. For the container formats nothing is written
+    here, the layers are returned so every floor can be written together by save_floors_container.
+
+    connectLimit > 0 joins the bins, stairs and agents (with their standing lines) to the walkway skeleton
+    when it is within that many pixels.
+
+    Returns (floor, {stage: seconds}, layers or None)
+    """
+    floor = job["floor"]
+    points = points or {}
+    timer = stageTimer()
+
+    if "skeleton" in job:
+        skeleton = np.asarray(job["skeleton"], dtype=np.uint8)
+        # Contours come as [[[x, y]], ...] from cv2, the exporter wants [(x, y), ...]
+        tenants = {poi: [[tuple(point) for point in np.asarray(contour).reshape(-1, 2).tolist()] for contour in contours]
+                   for poi, contours in job["tenants"].items()}
+        skipper = {}
+        outerWall = None
+        timer.lap("load")
+    else:
+        skeleton = extractRoutesArray(job["walkway"])
+        timer.lap("routes")
+        outerWall = extractOuterWalls(job["paddedImage"]) if job["paddedImage"] else None
+        timer.lap("outer wall")
+        tenants, skipper = breakThroughWalls(skeleton, gettingTenantWalls(job["regions"], job["labels"]))
+        timer.lap("tenants")
+
+    floorPoints = points.get(str(floor), {})
+    if connectLimit > 0:
+        # Every point is joined against the skeleton from before any joins, so one index serves them all
+        index = nearestSkeletonIndex(skeleton)
+        unconnected = []
+        for key in ("bins", "stairs", "agents"):
+            report = connectPointsToSkeleton(skeleton, [tuple(point) for point in floorPoints.get(key, [])],
+                                             connectLimit, tenants=key == "agents", index=index)
+            unconnected += [f"{key[:-1]} {point}" for point in report["unconnected"]]
+        if unconnected:
+            print(f"Floor {floor}: not within {connectLimit} pixels of a walkway: {', '.join(unconnected)}")
+        timer.lap("connect")
+
+    segments = graphToSegments(skeletonToGraph(skeleton))
+    timer.lap("path graph")
+
+    if fileFormat != "shp":
+        layers = build_floor_layers(floor, segments, outerWall, tenants, skipper,
+                                    *[[tuple(point) for point in floorPoints.get(key, [])]
+                                      for key in ("bins", "agents", "stairs", "entrypoints")],
+                                    snap_tolerance=snapTolerance)
+        timer.lap("layers")
+        return floor, timer.timings, layers
+
+    save_path_segments_shapefile(segments, floor, outputDir, snap_tolerance=snapTolerance, plot=plot)
+    if outerWall is not None:
+        save_outerwall_shapefile(outerWall, floor, outputDir, plot=plot)
+    save_tenant_lines_shapefile_exact(tenants, skipper, floor, outputDir, plot=plot)
+    if floorPoints.get("bins"):
+        save_bin_shapefile([tuple(point) for point in floorPoints["bins"]], floor, outputDir, plot=plot)
+    if floorPoints.get("agents"):
+        save_agent_shapefile([tuple(point) for point in floorPoints["agents"]], floor, outputDir, plot=plot)
+    if floorPoints.get("stairs"):
+        save_stair_shapefile([tuple(point) for point in floorPoints["stairs"]], floor, outputDir, plot=plot)
+    if floorPoints.get("entrypoints"):
+        save_entrypoint_shapefile([tuple(point) for point in floorPoints["entrypoints"]], floor, outputDir)
+    timer.lap("export")
+    return floor, timer.timings, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the floor data as shapefiles")
+    parser.add_argument("input", nargs="?", default="data.json", help="data.json or processed.json")
+    parser.add_argument("--output", default="shapes", help="Folder the shapefiles are written to")
+    parser.add_argument("--points", help="JSON file with the bins, agents, stairs and entry points of each floor")
+    parser.add_argument("--floor", type=int, default=1, help="Floor number used for processed.json")
+    parser.add_argument("--workers", type=int, default=None, help="Floors processed at once, defaults to the CPU count")
+    parser.add_argument("--snap", type=float, default=0.0, help="Snap path endpoints closer than this many pixels")
+    parser.add_argument("--format", default="shp", choices=["shp"] + list(CONTAINER_DRIVERS),
+                        help="shp writes a shapefile set per layer and floor, gpkg one GeoPackage, fgb one FlatGeobuf per layer")
+    parser.add_argument("--name", default="estate", help="File name used by the gpkg and fgb formats")
+    parser.add_argument("--connect", type=int, default=0,
+                        help="Join the bins, stairs and agents from --points to walkways up to this many pixels away")
+    parser.add_argument("--plot", action="store_true", help="Show the plots of every layer, runs the floors one by one")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    floors = loadFloors(args.input, args.floor)
+    points = {}
+    if args.points:
+        with open(args.points) as f:
+            points = json.load(f)
+    loadTime = time.perf_counter() - start
+
+    if args.plot or args.workers == 1 or len(floors) == 1:
+        # Plot windows have to stay in this process
+        results = [exportFloor(job, args.output, points, args.plot, args.snap, args.format, args.connect)
+                   for job in floors]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(exportFloor, job, args.output, points, False, args.snap, args.format, args.connect)
+                       for job in floors]
+            results = [future.result() for future in futures]
+
+    if args.format != "shp":
+        writeStart = time.perf_counter()
+        save_floors_container([layers for _, _, layers in sorted(results, key=lambda result: result[0])],
+                              args.output, args.name, args.format)
+        print(f"Wrote the {args.format} container(s) in {time.perf_counter() - writeStart:.2f}s")
+
+    print(f"\nRead {args.input} in {loadTime:.2f}s")
+    for floor, timings, _ in sorted(results, key=lambda result: result[0]):
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+        print(f"Floor {floor}: {stages} (total {sum(timings.values()):.2f}s)")
+    print(f"Exported {len(results)} floor(s) to {args.output} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
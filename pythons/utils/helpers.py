@@ -1,24 +1,23 @@
 import base64
+import importlib
 import numpy as np
 import cv2
-from skimage.morphology import skeletonize, remove_small_objects
-from skimage.measure import label, regionprops
-import matplotlib.pyplot as plt
 from skimage.draw import line
+# skimage.morphology and scipy.sparse are imported inside the functions that need them, they are slow to load
 
 def extractRoutesArray(base64Img):
     """
     Returns the extracted routes as a Numpy array of the possible paths
     """
+    from skimage.morphology import skeletonize
+
     image = base64ToImage(base64Img)    
     gray = cv2.cvtColor (image, cv2.COLOR_BGR2GRAY)
     mask = cv2.inRange(gray, 50, 150)
 
     skeleton = skeletonize(mask > 0)
-    labeled = label(skeleton)
-    pruned = remove_small_objects(labeled, min_size=50)
-    pruned = filterRegionsOutOfRange(pruned, min_area=100, max_area=200)
-    skeleton_pruned = pruned > 0
+    # Drops fragments under 50 pixels and the ones between 100 and 200 pixels in a single labeling pass
+    skeleton_pruned = filterComponents(skeleton, [areaAtLeast(50), areaOutsideRange(100, 200)])
     return skeleton_pruned.astype(np.uint8)
 
 def extractOuterWalls(base64Img, blocksize= 15, constant =5):
@@ -80,11 +79,7 @@ def createNewPathWithCoordinate(coord, skeleton, limit, tenants=False):
 
     if not found_points:
         print("No points found within the limit.")
-        plt.figure(figsize=(10, 8))
-        plt.imshow(new_skeleton, cmap='gray')
-        plt.title("Modified Skeleton (No New Path Found)")
-        plt.axis('off')
-        plt.show()
+        _plotting().plotSkeleton(new_skeleton, "Modified Skeleton (No New Path Found)")
         return new_skeleton, {}
     
     shortest_distance = float('inf')
@@ -128,6 +123,102 @@ def createPathCoordinates(coord1, coord2, skeleton):
     new_skeleton[rr, cc] = 1 
     return new_skeleton
 
+# Order the directions are tried in when two skeleton pixels are equally close, same as createNewPathWithCoordinate
+CONNECT_DIRECTIONS = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+
+def nearestSkeletonIndex(skeleton):
+    """
+    Precomputes, for every pixel, where the closest skeleton pixel straight up, down, left and right of it is
+    (the pixel itself not counted), with running max / min accumulations over the row and column indices.
+
+    Returns a dictionary {direction: array} following CONNECT_DIRECTIONS, holding the row of the hit for
+    up and down, the column for left and right, and -1 where that direction has no skeleton pixel
+    """
+    on = skeleton != 0
+    height, width = on.shape
+    rows = np.where(on, np.arange(height)[:, None], -1)
+    cols = np.where(on, np.arange(width)[None, :], -1)
+    rowsBelow = np.where(on, np.arange(height)[:, None], height)
+    colsRight = np.where(on, np.arange(width)[None, :], width)
+
+    up = np.full(on.shape, -1, dtype=np.int64)
+    up[1:] = np.maximum.accumulate(rows, axis=0)[:-1]
+    left = np.full(on.shape, -1, dtype=np.int64)
+    left[:, 1:] = np.maximum.accumulate(cols, axis=1)[:, :-1]
+    down = np.full(on.shape, height, dtype=np.int64)
+    down[:-1] = np.minimum.accumulate(rowsBelow[::-1], axis=0)[::-1][1:]
+    right = np.full(on.shape, width, dtype=np.int64)
+    right[:, :-1] = np.minimum.accumulate(colsRight[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    down[down == height] = -1
+    right[right == width] = -1
+    return {(0, -1): up, (0, 1): down, (-1, 0): left, (1, 0): right}
+
+def _drawStraight(skeleton, start, end):
+    """
+    Sets a horizontal or vertical line between two (x, y) points to 1, clipped to the array
+    """
+    height, width = skeleton.shape
+    x0, x1 = sorted((start[0], end[0]))
+    y0, y1 = sorted((start[1], end[1]))
+    x0, y0 = max(x0, 0), max(y0, 0)
+    x1, y1 = min(x1, width - 1), min(y1, height - 1)
+    if x0 <= x1 and y0 <= y1:
+        skeleton[y0:y1 + 1, x0:x1 + 1] = 1
+
+def connectPointsToSkeleton(skeleton, points, limit, tenants=False, spacing=8, index=None):
+    """
+    Batch version of createNewPathWithCoordinate: joins every point to the closest skeleton pixel found
+    straight up, down, left or right of it within limit pixels, drawing the joins into skeleton in place.
+    All points are measured against the skeleton as it was passed in, so one point's join never attracts another.
+
+    Parameters:
+        skeleton (np.ndarray): The walkway skeleton, modified in place
+        points (list): (x, y) points to connect, e.g. tenant entrances, bins or stairs
+        limit (int): Furthest a skeleton pixel may be
+        tenants (bool): Also draws the lines agents stand on, like createNewPathWithCoordinate(tenants=True)
+        index (dict): A nearestSkeletonIndex result to reuse, computed here when None
+
+    Returns a report {"connected": {point: skeleton pixel it was joined to}, "unconnected": [points]}
+    """
+    report = {"connected": {}, "unconnected": []}
+    if len(points) == 0:
+        return report
+    index = index if index is not None else nearestSkeletonIndex(skeleton)
+    coords = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+    height, width = skeleton.shape
+    inside = (coords[:, 0] >= 0) & (coords[:, 0] < width) & (coords[:, 1] >= 0) & (coords[:, 1] < height)
+    xs, ys = np.clip(coords[:, 0], 0, width - 1), np.clip(coords[:, 1], 0, height - 1)
+
+    # Distance to the hit in every direction, infinite when there is none or it is past the limit
+    distances = np.full((len(coords), len(CONNECT_DIRECTIONS)), np.inf)
+    for column, (dx, dy) in enumerate(CONNECT_DIRECTIONS):
+        hits = index[(dx, dy)][ys, xs]
+        distance = np.abs(hits - (xs if dx else ys)).astype(float)
+        distances[:, column] = np.where((hits >= 0) & (distance <= limit) & inside, distance, np.inf)
+    best = np.argmin(distances, axis=1)  # The first direction wins ties
+    found = np.isfinite(distances[np.arange(len(coords)), best])
+
+    for point, (x, y), column, ok in zip(points, coords.tolist(), best.tolist(), found.tolist()):
+        key = (x, y)
+        if not ok:
+            report["unconnected"].append(key)
+            continue
+        dx, dy = CONNECT_DIRECTIONS[column]
+        hit = int(index[(dx, dy)][y, x])
+        target = (hit, y) if dx else (x, hit)
+        _drawStraight(skeleton, key, target)
+        report["connected"][key] = target
+        if tenants:
+            if dx != 0:
+                _drawStraight(skeleton, (x, y - spacing), (x, y + spacing))
+                _drawStraight(skeleton, (x, y), (x - spacing * dx, y))
+                _drawStraight(skeleton, (x - spacing * dx, y - spacing), (x - spacing * dx, y + spacing))
+            else:
+                _drawStraight(skeleton, (x - spacing, y), (x + spacing, y))
+                _drawStraight(skeleton, (x, y), (x, y - spacing * dy))
+                _drawStraight(skeleton, (x - spacing, y - spacing * dy), (x + spacing, y - spacing * dy))
+    return report
+
 
 def gettingTenantWalls(regions, shape):
     """
@@ -145,198 +236,123 @@ def gettingTenantWalls(regions, shape):
     return regionPoints
 
 def breakThroughWalls(skeleton, blockDict, spacer= 5):
-    # print(skeleton)
-    # plt.imshow(skeleton)
+    """
+    Opens a door gap in the region walls wherever the skeleton crosses them.
+
+    Every crossing on an edge gets a gap reaching spacer pixels past it on both sides (cut short at the
+    edge corners), touching crossing pixels count as one crossing and gaps that overlap are merged.
+    The walls of all regions are checked together by findWallGaps.
+
+    Returns (result, blockSkipper)
+    result has the same layout as blockDict with the gap points inserted into each region
+    blockSkipper lists, per region, the index in the new region of the first point of every gap,
+    i.e. the segments that should not be drawn
+    """
+    edges = [(reference[0], reference[1], point[0], point[1])
+             for regions in blockDict.values() for region in regions
+             for reference, point in zip(region[:-1], region[1:])]
+    edgeGaps = iter(findWallGaps(skeleton, edges, spacer))
+
     result = {}
     blockSkipper = {}
     for regionTypes in blockDict:
-        # print(regionTypes)
         regions = (blockDict[regionTypes])
         listRegions = []
         listSkipper = []
         for region in (regions):
             workingRegion = []
             workingSkipper = []
-            skipperCount = 0
             for index, coordinates in enumerate(region): 
                 if index == 0:
                     workingRegion.append(coordinates)
                     continue
-                reference = (region[index - 1])
-                point = coordinates
-                pointsToBeAdded = []
-                reverse = False
-                if (reference[0] == point[0]):
-                    # Vertical Line
-                    xCoordinate = reference[0]
-                    if reference[1] >point [1]:
-                        reverse = True
-                    yCoordinates = [min(reference[1], point[1]) + i for i in range(abs(reference[1] - point[1]) + 1)]
-                    for yCoordinate in yCoordinates:
-                        if skeleton[yCoordinate, xCoordinate] == 1: 
-                            workingSkipper.append(index  + skipperCount * 2)
-                            skipperCount +=1
-                            if yCoordinate - spacer in yCoordinates:
-                                pointsToBeAdded.append((xCoordinate, yCoordinate - spacer))
-                            else:
-                                pointsToBeAdded.append((xCoordinate, min(yCoordinates)))
-                            if yCoordinate + spacer in yCoordinates:
-                                pointsToBeAdded.append((xCoordinate, yCoordinate + spacer))
-                            else:
-                                pointsToBeAdded.append((xCoordinate, max(yCoordinates)))
-                            break
-                else:
-                    # Horizontal Line
-                    xCoordinates = [min(reference[0], point[0]) + i for i in range(abs(reference[0] - point[0]) + 1)]
-                    yCoordinate = reference[1]
-                    if reference[0] >point[0]:
-                        reverse = True
-                    for xCoordinate in xCoordinates:
-                        if skeleton[yCoordinate, xCoordinate] == 1: 
-                            workingSkipper.append(index + skipperCount * 2)
-                            skipperCount +=1
-                            if xCoordinate - spacer in xCoordinates:
-                                pointsToBeAdded.append((xCoordinate - spacer, yCoordinate))
-                            else:
-                                pointsToBeAdded.append((min(xCoordinates), yCoordinate))
-                            if xCoordinate + spacer in xCoordinates:
-                                pointsToBeAdded.append((xCoordinate + spacer, yCoordinate))
-                            else:
-                                pointsToBeAdded.append((max(xCoordinates), yCoordinate))
-                            break
-                if reverse:
-                    for anotherPoint in reversed(pointsToBeAdded):
-                        workingRegion.append((anotherPoint[0], anotherPoint[1]))
-                else:
-                    for anotherPoint in (pointsToBeAdded):
-                        workingRegion.append((anotherPoint[0], anotherPoint[1]))
-                workingRegion.append((point[0], point[1]))
-            # print(region)
+                for gapStart, gapEnd in next(edgeGaps):
+                    workingSkipper.append(len(workingRegion))
+                    workingRegion.append(gapStart)
+                    workingRegion.append(gapEnd)
+                workingRegion.append((coordinates[0], coordinates[1]))
             listRegions.append(workingRegion)
             listSkipper.append(workingSkipper)
-        # print(listRegions)
         result[regionTypes] = listRegions
         blockSkipper[regionTypes] = listSkipper
     return result, blockSkipper
 
-# Actually the helper functions
-def plotNumpyArrayOverImage(image, skeleton, title="---"):
+def findWallGaps(skeleton, edges, spacer=5):
     """
-    Takes an image and a numpy array of the same dimensions and draws the skeleton over the image
+    Finds every place the skeleton crosses each wall edge, reading the pixels of all edges in one gather.
+
+    Parameters:
+        skeleton (np.ndarray): Binary skeleton, crossings are the pixels equal to 1
+        edges (list): (x1, y1, x2, y2) per edge. Edges that are not vertical are read along the row of y1
+        spacer (int): How far past a crossing the gap reaches on either side
+
+    Returns one list per edge of (gapStart, gapEnd) points, in the order they are met going from (x1, y1) to (x2, y2)
     """
-    overlay = image.copy()
-    overlay[skeleton == 1] = [0, 0, 255]  # Red skeleton lines
+    gaps = [[] for _ in edges]
+    if not edges:
+        return gaps
+    x1, y1, x2, y2 = np.asarray(edges, dtype=np.int64).reshape(-1, 4).T
+    vertical = x1 == x2
+    fixed = np.where(vertical, x1, y1)
+    first, last = np.where(vertical, y1, x1), np.where(vertical, y2, x2)
+    low, high = np.minimum(first, last), np.maximum(first, last)
+
+    # Every pixel of every edge, labelled with its edge and its position along it
+    lengths = high - low + 1
+    edgeOf = np.repeat(np.arange(len(lengths)), lengths)
+    position = low[edgeOf] + np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    ys = np.where(vertical[edgeOf], position, fixed[edgeOf])
+    xs = np.where(vertical[edgeOf], fixed[edgeOf], position)
+    inside = (ys >= 0) & (ys < skeleton.shape[0]) & (xs >= 0) & (xs < skeleton.shape[1])
+    hit = np.zeros(len(position), dtype=bool)
+    hit[inside] = skeleton[ys[inside], xs[inside]] == 1
+    edgeOf, position = edgeOf[hit], position[hit]
+    if len(position) == 0:
+        return gaps
 
-    plt.figure(figsize=(10, 8))
-    plt.imshow(cv2.cvtColor(overlay, cv2.COLOR_BGR2RGB))
-    plt.title(title)
-    plt.axis('off')
-    plt.show()
+    # Touching skeleton pixels on the same edge are one crossing, every crossing opens spacer pixels to each side
+    newRun = np.concatenate(([True], (np.diff(edgeOf) != 0) | (np.diff(position) > 1)))
+    runStarts = np.flatnonzero(newRun)
+    runEnds = np.concatenate((runStarts[1:], [len(position)])) - 1
+    runEdge = edgeOf[runStarts]
+    gapStarts = np.maximum(position[runStarts] - spacer, low[runEdge])
+    gapEnds = np.minimum(position[runEnds] + spacer, high[runEdge])
+    # Gaps on the same edge that overlap or touch become one, their ends only grow along an edge
+    newGap = np.concatenate(([True], (np.diff(runEdge) != 0) | (gapStarts[1:] > gapEnds[:-1])))
+    gapFirsts = np.flatnonzero(newGap)
+    gapLasts = np.concatenate((gapFirsts[1:], [len(runEdge)])) - 1
+
+    for edge, start, end in zip(runEdge[gapFirsts].tolist(), gapStarts[gapFirsts].tolist(), gapEnds[gapLasts].tolist()):
+        if vertical[edge]:
+            gaps[edge].append(((int(fixed[edge]), start), (int(fixed[edge]), end)))
+        else:
+            gaps[edge].append(((start, int(fixed[edge])), (end, int(fixed[edge]))))
+    # Edges walked backwards meet their gaps in the opposite order, each gap from its far side
+    for edge in np.flatnonzero(first > last).tolist():
+        gaps[edge] = [(end, start) for start, end in reversed(gaps[edge])]
+    return gaps
+
+# Actually the helper functions
+# The plotting functions live in plotting.py, these forward to it so matplotlib is only imported when plotting
+def _plotting():
+    if __package__:
+        return importlib.import_module(f"{__package__}.plotting")
+    return importlib.import_module("plotting")
+
+def plotNumpyArrayOverImage(image, skeleton, title="---"):
+    return _plotting().plotNumpyArrayOverImage(image, skeleton, title)
 
 def plotNodesOverImage(image, nodes, figSize = (10,8), markerSize =8, title="---"):
-    """
-    Function that is used to draw the nodes over a background image
-    """
-    plt.figure(figsize=figSize)
-    
-    # If a background image is provided, show it.
-    plt.imshow(image, cmap='gray')
-    
-    # Plot each node as a red circle
-    for (x, y) in nodes:
-        plt.plot(x, y, 'ro', markersize=markerSize)
-    
-    plt.title(title)
-    plt.axis('off')
-    plt.show()
+    return _plotting().plotNodesOverImage(image, nodes, figSize, markerSize, title)
 
 def plotLinesOverImage(image, lines, figSize = (10,8), title="---"):
-    """
-    Function that is used to draw lines over the iamge
-    """
-    n = len(lines)
-    print("yes")
-    print(lines)
-    for index, contour in enumerate(lines):
-        # For this contour, determine the skip indices (if none provided, use an empty list)
-        # Iterate over each point index in the contour
-        # Wrap around: next index is (j+1) mod n
-        p1 = (contour)
-        p2 = (lines[(index+1) % n])
-        cv2.line(image, p1, p2, (0, 0, 255), 2)
-    plt.figure(figsize=figSize)
-    plt.imshow(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-    plt.title(title)
-    plt.axis('off')
-    plt.show()
+    return _plotting().plotLinesOverImage(image, lines, figSize, title)
 
 def plotPOIOverImage(image, POIDict, POISkipper, figSize=(10,8), title="---"):
-    """
-    Given a POIDict (e.g., 
-      {1: [[(x,y), (x,y), ...], [(x,y), (x,y), ...], ...], 2: ...}),
-    and a POISkipper dictionary (e.g., 
-      {1: [[1,4], [2], ...], 2: [[], [], ...], 3: [[3], [2], ...]}),
-    where each inner list in POISkipper indicates the indices of the starting points of segments to skip 
-    (i.e., skip drawing the line from that point to the next point),
-    this function draws each contour onto the image accordingly.
-
-    For each contour:
-      - It iterates over each point.
-      - For each segment from point[i] to point[(i+1)%n] (wrapping at the end),
-        it checks if i is in the corresponding skip list.
-      - If not, it draws the line segment in red.
-    """
-    plt.figure(figsize=figSize)
-    
-    # Loop over each key in POIDict
-    for key, contours in POIDict.items():
-        # Get the corresponding list of skip-lists; if missing, use None
-        skipContours = POISkipper.get(key, None)
-        for i, contour in enumerate(contours):
-            # For this contour, determine the skip indices (if none provided, use an empty list)
-            if skipContours is not None and i < len(skipContours):
-                skip_indices = skipContours[i]
-            else:
-                skip_indices = []
-            
-            n = len(contour)
-            # Iterate over each point index in the contour
-            for j in range(n):
-                # If the current index is in the skip list, skip drawing the segment from this point to the next
-                if j in skip_indices:
-                    continue
-                # Wrap around: next index is (j+1) mod n
-                p1 = tuple(contour[j])
-                p2 = tuple(contour[(j+1) % n])
-                cv2.line(image, p1, p2, (0, 0, 255), 2)
-    
-    plt.imshow(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-    plt.title(title)
-    plt.axis('off')
-    plt.show()
+    return _plotting().plotPOIOverImage(image, POIDict, POISkipper, figSize, title)
 
 def draw_lines_on_image(image, line_segments, color=(0, 0, 255), thickness=2, title="---"):
-    """
-    Draws each line segment on the provided image.
-
-    Parameters:
-      image (np.ndarray): The image on which to draw the lines.
-      line_segments (list): A list of tuples, each containing two endpoints (x, y).
-      color (tuple): Color of the lines in BGR format (default is red).
-      thickness (int): Thickness of the drawn lines.
-      
-    Returns:
-      np.ndarray: The image with the drawn lines.
-    """
-    for segment in line_segments:
-        pt1, pt2 = segment  # Each segment is ((x1, y1), (x2, y2))
-        cv2.line(image, pt1, pt2, color, thickness)
-
-    plt.imshow(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-    plt.title(title)
-    plt.axis('off')
-    plt.show()
-    return image
+    return _plotting().draw_lines_on_image(image, line_segments, color, thickness, title)
 
 def base64ToImage(base64_string):
     """
@@ -353,13 +369,74 @@ def filterRegionsOutOfRange(labeled_image, min_area, max_area):
     Given a labeled image, returns a new labeled image that keeps only
     regions with area outside the range [min_area, max_area].
     """
-    filtered = np.zeros_like(labeled_image)
-    
-    for region in regionprops(labeled_image):
-        # Only keep regions with area NOT between min_area and max_area.
-        if not (min_area <= region.area <= max_area):
-            filtered[labeled_image == region.label] = region.label
-    return filtered
+    # Every area comes from one bincount and is applied through a lookup table indexed by label
+    areas = np.bincount(labeled_image.ravel())
+    keep = (areas < min_area) | (areas > max_area)
+    keep[0] = False
+    return np.where(keep[labeled_image], labeled_image, 0).astype(labeled_image.dtype)
+
+def componentStats(mask, connectivity=8):
+    """
+    Labels the connected components of a binary mask once and measures all of them in the same pass.
+
+    Returns (labels, stats), labels is the int32 label image and stats is a dictionary of arrays indexed by label
+    (index 0 being the background): "area", "left", "top", "width", "height" and "length",
+    the longest side of the bounding box
+    """
+    count, labels, raw, _ = cv2.connectedComponentsWithStats(mask.astype(np.uint8), connectivity=connectivity, ltype=cv2.CV_32S)
+    stats = {
+        "area": raw[:, cv2.CC_STAT_AREA],
+        "left": raw[:, cv2.CC_STAT_LEFT],
+        "top": raw[:, cv2.CC_STAT_TOP],
+        "width": raw[:, cv2.CC_STAT_WIDTH],
+        "height": raw[:, cv2.CC_STAT_HEIGHT],
+    }
+    stats["length"] = np.maximum(stats["width"], stats["height"])
+    return labels, stats
+
+def filterComponents(mask, predicates, connectivity=8):
+    """
+    Keeps only the connected components of the mask that pass every predicate.
+
+    Parameters:
+        mask (np.ndarray): Binary image, anything non zero is foreground
+        predicates (list): Functions taking the stats dictionary from componentStats and returning
+            a boolean array with one entry per label, e.g. areaAtLeast(50)
+        connectivity (int): 8 (default, same as skimage.measure.label on 2D images) or 4
+
+    Returns the filtered mask as a boolean array
+    """
+    labels, stats = componentStats(mask, connectivity)
+    keep = np.ones(len(stats["area"]), dtype=bool)
+    for predicate in predicates:
+        keep &= predicate(stats)
+    keep[0] = False
+    return keep[labels]
+
+def areaAtLeast(minArea):
+    """
+    Predicate for filterComponents, keeps components with at least minArea pixels
+    """
+    return lambda stats: stats["area"] >= minArea
+
+def areaOutsideRange(minArea, maxArea):
+    """
+    Predicate for filterComponents, keeps components whose area is NOT between minArea and maxArea
+    """
+    return lambda stats: (stats["area"] < minArea) | (stats["area"] > maxArea)
+
+def lengthAtLeast(minLength):
+    """
+    Predicate for filterComponents, keeps components whose bounding box has a side of at least minLength pixels
+    """
+    return lambda stats: stats["length"] >= minLength
+
+def bboxWithin(left, top, right, bottom):
+    """
+    Predicate for filterComponents, keeps components whose bounding box lies fully inside the given box
+    """
+    return lambda stats: ((stats["left"] >= left) & (stats["top"] >= top) &
+                          (stats["left"] + stats["width"] <= right) & (stats["top"] + stats["height"] <= bottom))
 
 def snapAngle(p1,p2):
     """
@@ -449,4 +526,172 @@ def convertSkeletonToLines(skeleton, epsilon=0.0):
             line_segment = (tuple(pts[i]), tuple(pts[i+1]))
             lines.append(line_segment)
     
-    return lines
\ No newline at end of file
+    return lines
+
+
+# (dy, dx) of the 8 neighbours of a pixel
+NEIGHBOUR_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+def skeletonToGraph(skeleton):
+    """
+    Converts a one pixel wide skeleton (e.g. from extractRoutesArray) into a graph of the routes.
+
+    Nodes are the endpoints and junctions, found by counting the neighbours of every pixel at once.
+    Touching junction pixels are merged into one node, and a loop without any junction is broken
+    with a node at its first pixel. Every other pixel belongs to exactly one chain between two nodes,
+    and each chain becomes an edge. At both ends an edge runs from the junction pixel its chain touches
+    through the junction's pixels to the node pixel, so consecutive points are always neighbours.
+
+    Returns a dictionary:
+        "nodes": [(x, y), ...] the node pixel closest to the middle of each junction
+        "degree": [int, ...] number of edge ends at each node
+        "edges": [{"nodes": (a, b), "points": [(x, y), ...], "length": float}, ...]
+            points runs from node a to node b and length is its pixel length (diagonal steps count sqrt(2))
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import dijkstra
+
+    mask = np.pad(skeleton > 0, 1)  # The border keeps neighbour lookups inside the array
+    width = mask.shape[1]
+    kernel = np.ones((3, 3), np.uint8)
+    kernel[1, 1] = 0
+    counts = cv2.filter2D(mask.astype(np.uint8), -1, kernel, borderType=cv2.BORDER_CONSTANT)
+    nodeMask = mask & (counts != 2)
+
+    # Chains that touch no node are closed loops, one pixel of each becomes a node
+    chainCount, chainLabels = cv2.connectedComponents((mask & ~nodeMask).astype(np.uint8), connectivity=8)
+    nearNode = cv2.dilate(nodeMask.astype(np.uint8), np.ones((3, 3), np.uint8)) > 0
+    loose = np.ones(chainCount, dtype=bool)
+    loose[chainLabels[nearNode]] = False
+    loose[0] = False
+    if loose.any():
+        loopPixels = np.flatnonzero(loose[chainLabels])
+        _, firstPixels = np.unique(chainLabels.ravel()[loopPixels], return_index=True)
+        nodeMask.ravel()[loopPixels[firstPixels]] = True
+        chainCount, chainLabels = cv2.connectedComponents((mask & ~nodeMask).astype(np.uint8), connectivity=8)
+
+    # One node per cluster of touching node pixels, placed on the pixel closest to the cluster centroid
+    nodeCount, nodeLabels, _, centroids = cv2.connectedComponentsWithStats(nodeMask.astype(np.uint8), connectivity=8)
+    nodeY, nodeX = np.nonzero(nodeMask)
+    nodeOf = nodeLabels[nodeY, nodeX]
+    offCentre = np.hypot(nodeX - centroids[nodeOf, 0], nodeY - centroids[nodeOf, 1])
+    order = np.lexsort((offCentre, nodeOf))
+    _, firsts = np.unique(nodeOf[order], return_index=True)
+    nodePoints = np.stack((nodeX[order][firsts] - 1, nodeY[order][firsts] - 1), axis=1)
+
+    # Shortest way from every junction pixel to its node pixel, all junctions in one search
+    nodePixels = nodeY * width + nodeX
+    nodePosition = np.full(mask.size, -1, dtype=np.int64)
+    nodePosition[nodePixels] = np.arange(len(nodePixels))
+    junctionPairs = []
+    junctionSteps = []
+    for dy, dx in NEIGHBOUR_OFFSETS:
+        neighbours = nodePosition[nodePixels + dy * width + dx]
+        isNode = neighbours >= 0
+        junctionPairs.append(np.stack((np.flatnonzero(isNode), neighbours[isNode])))
+        junctionSteps.append(np.full(isNode.sum(), np.hypot(dy, dx)))
+    junctionPairs = np.concatenate(junctionPairs, axis=1)
+    junctionGraph = coo_matrix((np.concatenate(junctionSteps), (junctionPairs[0], junctionPairs[1])),
+                               shape=(len(nodePixels),) * 2).tocsr()
+    _, towardsNode, _ = dijkstra(junctionGraph, directed=False, indices=order[firsts], min_only=True,
+                                 return_predecessors=True)
+
+    def junctionPath(pixel):
+        """
+        Returns the (x, y) points from a junction pixel to the node pixel of its junction
+        """
+        path = [nodePosition[pixel]]
+        while towardsNode[path[-1]] >= 0:
+            path.append(towardsNode[path[-1]])
+        return np.stack((nodeX[path] - 1, nodeY[path] - 1), axis=1)
+
+    # Neighbour pairs between chain pixels, and between chain pixels and junction pixels
+    chainPixels = np.flatnonzero(chainLabels)
+    position = np.full(mask.size, -1, dtype=np.int64)
+    position[chainPixels] = np.arange(len(chainPixels))
+    pairs = []
+    attachments = []
+    for dy, dx in NEIGHBOUR_OFFSETS:
+        neighbours = chainPixels + dy * width + dx
+        isChain = position[neighbours] >= 0
+        pairs.append(np.stack((np.flatnonzero(isChain), position[neighbours[isChain]])))
+        isNode = nodeLabels.ravel()[neighbours] > 0
+        attachments.append(np.stack((np.flatnonzero(isNode), nodeLabels.ravel()[neighbours[isNode]] - 1,
+                                     neighbours[isNode], np.full(isNode.sum(), dy != 0 and dx != 0))))
+    pairs = np.concatenate(pairs, axis=1)
+    # One attachment per chain pixel and node, touching the junction straight rather than diagonally where it can
+    attachments = np.concatenate(attachments, axis=1)
+    attachments = attachments[:, np.lexsort((attachments[3], attachments[1], attachments[0]))]
+    distinct = np.concatenate(([True], np.any(np.diff(attachments[:2], axis=1) != 0, axis=0)))
+    attachments = attachments[:, distinct]
+
+    # Orders the pixels of every chain by their step count from one of its two ends, all chains in one search
+    pixelChain = chainLabels.ravel()[chainPixels]
+    chainDegree = np.bincount(pairs[0], minlength=len(chainPixels))
+    ends = np.flatnonzero(chainDegree <= 1)
+    _, firstEnds = np.unique(pixelChain[ends], return_index=True)
+    starts = ends[firstEnds]
+    adjacency = coo_matrix((np.ones(pairs.shape[1]), (pairs[0], pairs[1])), shape=(len(chainPixels),) * 2).tocsr()
+    steps = dijkstra(adjacency, directed=False, indices=starts, unweighted=True, min_only=True) if len(starts) else np.zeros(0)
+    order = np.lexsort((steps, pixelChain))
+    chainBounds = np.flatnonzero(np.diff(pixelChain[order])) + 1
+    chainY, chainX = np.divmod(chainPixels[order], width)
+    chainPoints = np.stack((chainX - 1, chainY - 1), axis=1)
+
+    attachedPixels = attachments[0]
+    edges = []
+    for points, pixels in zip(np.split(chainPoints, chainBounds), np.split(order, chainBounds)):
+        if len(pixels) == 0:
+            continue
+        startAttached = attachments[1:3, np.searchsorted(attachedPixels, pixels[0], "left"):np.searchsorted(attachedPixels, pixels[0], "right")]
+        endAttached = attachments[1:3, np.searchsorted(attachedPixels, pixels[-1], "left"):np.searchsorted(attachedPixels, pixels[-1], "right")]
+        start, startPixel = startAttached[:, 0].tolist()
+        if len(pixels) == 1 and endAttached.shape[1] > 1:
+            endAttached = endAttached[:, endAttached[0] != start]  # A single pixel chain joins two different nodes
+        end, endPixel = endAttached[:, 0].tolist()
+        if start == end and len(pixels) == 1:
+            continue  # The outer pixel of a square corner inside a junction, not a real loop
+        polyline = np.concatenate((junctionPath(startPixel)[::-1], points, junctionPath(endPixel)))
+        length = float(np.hypot(*np.diff(polyline, axis=0).T).sum())
+        edges.append({"nodes": (start, end), "points": [tuple(point) for point in polyline.tolist()], "length": length})
+
+    edgeEnds = np.array([edge["nodes"] for edge in edges], dtype=np.int64).ravel()
+    degree = np.bincount(edgeEnds, minlength=nodeCount - 1)
+    return {"nodes": [tuple(point) for point in nodePoints.tolist()], "degree": degree.tolist(), "edges": edges}
+
+def graphToSegments(graph, epsilon=0.0):
+    """
+    Converts the edges of a skeletonToGraph graph into two point segments ((x1, y1), (x2, y2)),
+    the format taken by save_path_segments_shapefile.
+    Every edge polyline goes through cv2.approxPolyDP first, which with the default epsilon of 0 only drops the
+    points in the middle of straight runs. Larger values simplify further, the ends always stay on the nodes.
+    """
+    segments = []
+    for edge in graph["edges"]:
+        points = np.array(edge["points"], dtype=np.int32)
+        if len(points) > 2:
+            points = cv2.approxPolyDP(points.reshape(-1, 1, 2), epsilon, closed=False).reshape(-1, 2)
+        points = [tuple(point) for point in points.tolist()]
+        segments.extend((points[i], points[i + 1]) for i in range(len(points) - 1) if points[i] != points[i + 1])
+    return segments
+
+def graphAdjacency(graph):
+    """
+    Returns the graph as a sparse (nodes x nodes) matrix of edge lengths, keeping the shortest of
+    any parallel edges, ready for scipy.sparse.csgraph routines such as dijkstra
+    """
+    from scipy.sparse import coo_matrix
+
+    nodeCount = len(graph["nodes"])
+    best = {}
+    for edge in graph["edges"]:
+        a, b = sorted(edge["nodes"])
+        if a != b and edge["length"] < best.get((a, b), float("inf")):
+            best[(a, b)] = edge["length"]
+    if not best:
+        return coo_matrix((nodeCount, nodeCount)).tocsr()
+    rows, cols = np.array(list(best.keys())).T
+    lengths = np.array(list(best.values()))
+    return coo_matrix((np.concatenate((lengths, lengths)), (np.concatenate((rows, cols)), np.concatenate((cols, rows)))),
+                      shape=(nodeCount, nodeCount)).tocsr()
+
@@ -0,0 +1,164 @@
+"""
+Plotting helpers for checking the post-processing steps by eye. Kept out of helpers.py and
+shapeExport.py so that matplotlib is only loaded when something is actually plotted.
+"""
+import cv2
+import matplotlib.pyplot as plt
+import matplotlib.patches as mpatches
+
+def plotSkeleton(skeleton, title="---"):
+    """
+    Shows a numpy array on its own in grayscale
+    """
+    plt.figure(figsize=(10, 8))
+    plt.imshow(skeleton, cmap='gray')
+    plt.title(title)
+    plt.axis('off')
+    plt.show()
+
+def plotNumpyArrayOverImage(image, skeleton, title="---"):
+    """
+    Takes an image and a numpy array of the same dimensions and draws the skeleton over the image
+    """
+    overlay = image.copy()
+    overlay[skeleton == 1] = [0, 0, 255]  # Red skeleton lines
+
+    plt.figure(figsize=(10, 8))
+    plt.imshow(cv2.cvtColor(overlay, cv2.COLOR_BGR2RGB))
+    plt.title(title)
+    plt.axis('off')
+    plt.show()
+
+def plotNodesOverImage(image, nodes, figSize = (10,8), markerSize =8, title="---"):
+    """
+    Function that is used to draw the nodes over a background image
+    """
+    plt.figure(figsize=figSize)
+    
+    # If a background image is provided, show it.
+    plt.imshow(image, cmap='gray')
+    
+    # Plot each node as a red circle
+    for (x, y) in nodes:
+        plt.plot(x, y, 'ro', markersize=markerSize)
+    
+    plt.title(title)
+    plt.axis('off')
+    plt.show()
+
+def plotLinesOverImage(image, lines, figSize = (10,8), title="---"):
+    """
+    Function that is used to draw lines over the iamge
+    """
+    n = len(lines)
+    print("yes")
+    print(lines)
+    for index, contour in enumerate(lines):
+        # For this contour, determine the skip indices (if none provided, use an empty list)
+        # Iterate over each point index in the contour
+        # Wrap around: next index is (j+1) mod n
+        p1 = (contour)
+        p2 = (lines[(index+1) % n])
+        cv2.line(image, p1, p2, (0, 0, 255), 2)
+    plt.figure(figsize=figSize)
+    plt.imshow(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    plt.title(title)
+    plt.axis('off')
+    plt.show()
+
+def plotPOIOverImage(image, POIDict, POISkipper, figSize=(10,8), title="---"):
+    """
+    Given a POIDict (e.g., 
+      {1: [[(x,y), (x,y), ...], [(x,y), (x,y), ...], ...], 2: ...}),
+    and a POISkipper dictionary (e.g., 
+      {1: [[1,4], [2], ...], 2: [[], [], ...], 3: [[3], [2], ...]}),
+    where each inner list in POISkipper indicates the indices of the starting points of segments to skip 
+    (i.e., skip drawing the line from that point to the next point),
+    this function draws each contour onto the image accordingly.
+
+    For each contour:
+      - It iterates over each point.
+      - For each segment from point[i] to point[(i+1)%n] (wrapping at the end),
+        it checks if i is in the corresponding skip list.
+      - If not, it draws the line segment in red.
+    """
+    plt.figure(figsize=figSize)
+    
+    # Loop over each key in POIDict
+    for key, contours in POIDict.items():
+        # Get the corresponding list of skip-lists; if missing, use None
+        skipContours = POISkipper.get(key, None)
+        for i, contour in enumerate(contours):
+            # For this contour, determine the skip indices (if none provided, use an empty list)
+            if skipContours is not None and i < len(skipContours):
+                skip_indices = skipContours[i]
+            else:
+                skip_indices = []
+            
+            n = len(contour)
+            # Iterate over each point index in the contour
+            for j in range(n):
+                # If the current index is in the skip list, skip drawing the segment from this point to the next
+                if j in skip_indices:
+                    continue
+                # Wrap around: next index is (j+1) mod n
+                p1 = tuple(contour[j])
+                p2 = tuple(contour[(j+1) % n])
+                cv2.line(image, p1, p2, (0, 0, 255), 2)
+    
+    plt.imshow(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    plt.title(title)
+    plt.axis('off')
+    plt.show()
+
+def draw_lines_on_image(image, line_segments, color=(0, 0, 255), thickness=2, title="---"):
+    """
+    Draws each line segment on the provided image.
+
+    Parameters:
+      image (np.ndarray): The image on which to draw the lines.
+      line_segments (list): A list of tuples, each containing two endpoints (x, y).
+      color (tuple): Color of the lines in BGR format (default is red).
+      thickness (int): Thickness of the drawn lines.
+      
+    Returns:
+      np.ndarray: The image with the drawn lines.
+    """
+    for segment in line_segments:
+        pt1, pt2 = segment  # Each segment is ((x1, y1), (x2, y2))
+        cv2.line(image, pt1, pt2, color, thickness)
+
+    plt.imshow(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    plt.title(title)
+    plt.axis('off')
+    plt.show()
+    return image
+
+def plot_layer(gdf, title, figsize=(10, 8), show_legend=False, adjustable="box", **plot_kwargs):
+    """
+    Plots one exported GeoDataFrame layer, plot_kwargs go straight to GeoDataFrame.plot
+    """
+    fig, ax = plt.subplots(figsize=figsize)
+    gdf.plot(ax=ax, **plot_kwargs)
+    ax.set_title(title)
+    if show_legend:
+        ax.legend()
+    ax.set_aspect("equal", adjustable=adjustable)
+    ax.invert_yaxis()
+    plt.show()
+
+def plot_combined_features(gdf, bin_gdf, color_mapping, floor):
+    """
+    Plots every feature of a floor together with its bins, coloured by feature type
+    """
+    fig, ax = plt.subplots(figsize=(12, 10))
+    patches = [mpatches.Patch(color=color, label=label) for label, color in color_mapping.items() if label != "bin"]
+    patches.append(plt.Line2D([0], [0], marker='o', color='w', label='bin', markerfacecolor='red', markersize=8))
+    ax.legend(handles=patches, title="Feature Types")
+
+    gdf.plot(color=gdf["color"], edgecolor="grey", ax=ax)
+    bin_gdf.plot(ax=ax, color='red', markersize=50)
+    ax.set_title(f"Combined Features with Bin Locations for Floor {floor}")
+    ax.set_aspect("equal")
+    ax.invert_yaxis()
+    plt.show()
@@ -1,17 +1,21 @@
 import os
+import importlib
 import numpy as np
-import geopandas as gpd
-import matplotlib.pyplot as plt
+import shapely
 from shapely.geometry import Polygon, Point, LineString
 from shapely.errors import ShapelyDeprecationWarning
 import warnings
-import pandas as pd
-import matplotlib.patches as mpatches
+# geopandas and pandas are imported inside the functions that use them, plots come from plotting.py
 
 warnings.filterwarnings("ignore", category=ShapelyDeprecationWarning)
 
 COMMON_CRS = None
 
+def _plotting():
+    if __package__:
+        return importlib.import_module(f"{__package__}.plotting")
+    return importlib.import_module("plotting")
+
 def ensure_closed_polygon(points):
     """
     Convert input points (which may be provided as a NumPy array, a list of lists,
@@ -37,7 +41,31 @@ def ensure_closed_polygon(points):
         new_points.append(new_points[0])
     return new_points
 
-def visualise_combined_features(walkway_array, outer_wall_points, block_dict, bin_locations, floor, grid_size=1):
+def walkway_polygons(walkway_array, grid_size=1):
+    """
+    Vectorises the non-zero cells of a walkway raster into as few polygons as possible.
+
+    Every horizontal run of non-zero cells in a row becomes one rectangle, then the rectangles are
+    unioned, so the result covers exactly the same cells (holes included) as one square per pixel would.
+
+    Returns a list of shapely Polygons, one per connected walkway area
+    """
+    filled = np.asarray(walkway_array) != 0
+    if not filled.any():
+        return []
+    # Run starts and ends fall where the padded row changes value
+    edges = np.diff(np.pad(filled, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    start_rows, start_cols = np.nonzero(edges == 1)
+    _, end_cols = np.nonzero(edges == -1)
+    runs = shapely.box(start_cols * grid_size, start_rows * grid_size,
+                       end_cols * grid_size, (start_rows + 1) * grid_size)
+    merged = shapely.unary_union(runs)
+    return list(getattr(merged, "geoms", [merged]))
+
+def visualise_combined_features(walkway_array, outer_wall_points, block_dict, bin_locations, floor, grid_size=1, plot=True):
+    import geopandas as gpd
+    import pandas as pd
+
     features = []
 
     if outer_wall_points is not None and len(outer_wall_points) >= 4:
@@ -49,18 +77,8 @@ def visualise_combined_features(walkway_array, outer_wall_points, block_dict, bi
         except Exception as e:
             print(f"Error with outer wall polygon: {e}")
 
-    rows, cols = walkway_array.shape
-    for i in range(rows):
-        for j in range(cols):
-            if walkway_array[i, j] == 0:
-                continue
-            poly = Polygon([
-                (j * grid_size, i * grid_size),
-                ((j + 1) * grid_size, i * grid_size),
-                ((j + 1) * grid_size, (i + 1) * grid_size),
-                (j * grid_size, (i + 1) * grid_size)
-            ])
-            features.append({"feature": "walkway", "geometry": poly})
+    for poly in walkway_polygons(walkway_array, grid_size):
+        features.append({"feature": "walkway", "geometry": poly})
 
     type_map = {0: "empty_area", 1: "tenant", 2: "toilet", 3: "staircase"}
     for key, poly_list in block_dict.items():
@@ -97,32 +115,121 @@ def visualise_combined_features(walkway_array, outer_wall_points, block_dict, bi
     gdf["feature"] = pd.Categorical(gdf["feature"], categories=fixed_categories, ordered=True)
     gdf["color"] = gdf["feature"].map(color_mapping)
 
-    fig, ax = plt.subplots(figsize=(12, 10))
-    patches = [mpatches.Patch(color=color, label=label) for label, color in color_mapping.items() if label != "bin"]
-    patches.append(plt.Line2D([0], [0], marker='o', color='w', label='bin', markerfacecolor='red', markersize=8))
-    ax.legend(handles=patches, title="Feature Types")
-
-    gdf.plot(color=gdf["color"], edgecolor="grey", ax=ax)
-    bin_gdf.plot(ax=ax, color='red', markersize=50)
-    ax.set_title(f"Combined Features with Bin Locations for Floor {floor}")
-    ax.set_aspect("equal")
-    ax.invert_yaxis()
-    plt.show()
+    if plot:
+        _plotting().plot_combined_features(gdf, bin_gdf, color_mapping, floor)
 
     return gdf, bin_gdf
 
-def save_path_segments_shapefile(path_list, floor, output_dir="shapes"):
+def _point_key(point, digits=6):
+    return (round(float(point[0]), digits), round(float(point[1]), digits))
+
+def _snap_points(points, tolerance):
+    """
+    Maps every point to the first point seen within tolerance of it, using a spatial hash with
+    cells of size tolerance so only the 3x3 neighbouring cells have to be checked.
+    """
+    cells = {}
+    snapped = {}
+    for point in points:
+        cx, cy = int(np.floor(point[0] / tolerance)), int(np.floor(point[1] / tolerance))
+        target = point
+        for nx in (cx - 1, cx, cx + 1):
+            for ny in (cy - 1, cy, cy + 1):
+                for other in cells.get((nx, ny), []):
+                    if np.hypot(other[0] - point[0], other[1] - point[1]) <= tolerance:
+                        target = other
+                        break
+                if target is not point:
+                    break
+            if target is not point:
+                break
+        if target is point:
+            cells.setdefault((cx, cy), []).append(point)
+        snapped[point] = target
+    return snapped
+
+def simplify_path_segments(path_list, snap_tolerance=0.0):
+    """
+    Simplifies a list of two-point segments ((x1,y1),(x2,y2)) before export:
+      - endpoints closer than snap_tolerance are snapped together (0 turns snapping off)
+      - zero length segments, duplicates and reversed duplicates are dropped
+      - collinear segments that overlap, or touch at a point no other segment uses,
+        are merged into one maximal segment, so junctions are never merged through
+
+    Returns (segments, counts) where counts has the "input", "duplicates", "merged" and "output" feature counts
+    """
+    segments = [(_point_key(pt1), _point_key(pt2)) for pt1, pt2 in path_list]
+    if snap_tolerance > 0:
+        snapped = _snap_points(sorted({pt for seg in segments for pt in seg}), snap_tolerance)
+        segments = [(snapped[pt1], snapped[pt2]) for pt1, pt2 in segments]
+
+    # Hash on the sorted endpoints so (a, b) and (b, a) land on the same key
+    unique = {}
+    for pt1, pt2 in segments:
+        if pt1 != pt2:
+            unique.setdefault((min(pt1, pt2), max(pt1, pt2)), None)
+    duplicates = len(path_list) - len(unique)
+
+    endpoint_count = {}
+    for pt1, pt2 in unique:
+        endpoint_count[pt1] = endpoint_count.get(pt1, 0) + 1
+        endpoint_count[pt2] = endpoint_count.get(pt2, 0) + 1
+
+    # Groups the segments by the infinite line they lie on, then merges intervals along each line
+    lines = {}
+    for pt1, pt2 in unique:
+        dx, dy = pt2[0] - pt1[0], pt2[1] - pt1[1]
+        norm = np.hypot(dx, dy)
+        ux, uy = dx / norm, dy / norm
+        if ux < 0 or (ux == 0 and uy < 0):
+            ux, uy = -ux, -uy
+        line_key = (round(ux, 9), round(uy, 9), round(uy * pt1[0] - ux * pt1[1], 6))
+        t1, t2 = pt1[0] * ux + pt1[1] * uy, pt2[0] * ux + pt2[1] * uy
+        if t1 > t2:
+            t1, t2, pt1, pt2 = t2, t1, pt2, pt1
+        lines.setdefault(line_key, []).append((t1, t2, pt1, pt2))
+
+    simplified = []
+    for intervals in lines.values():
+        intervals.sort()
+        start_t, end_t, start_pt, end_pt = intervals[0]
+        for t1, t2, pt1, pt2 in intervals[1:]:
+            overlapping = t1 < end_t - 1e-9
+            touching = abs(t1 - end_t) <= 1e-9 and endpoint_count.get(end_pt, 0) == 2
+            if overlapping or touching:
+                if t2 > end_t:
+                    end_t, end_pt = t2, pt2
+            else:
+                simplified.append((start_pt, end_pt))
+                start_t, end_t, start_pt, end_pt = t1, t2, pt1, pt2
+        simplified.append((start_pt, end_pt))
+
+    counts = {"input": len(path_list), "duplicates": duplicates,
+              "merged": len(unique) - len(simplified), "output": len(simplified)}
+    return simplified, counts
+
+def save_path_segments_shapefile(path_list, floor, output_dir="shapes", simplify=True, snap_tolerance=0.0, plot=True):
     """
     Given a dictionary {key: [ ((x1,y1),(x2,y2)), ((x2,y2),(x3,y3)), ... ], ... },
     each entry in the list is a *two-point segment*.
     
     We'll build a GeoDataFrame of LineStrings (one for each pair),
     then save it as a shapefile.
+
+    With simplify the segments go through simplify_path_segments first (duplicates dropped,
+    collinear pieces merged, endpoints within snap_tolerance snapped) and the feature counts are printed.
     """
+    import geopandas as gpd
+
     if not path_list:
         print("No path data found; skipping.")
         return
 
+    if simplify:
+        path_list, counts = simplify_path_segments(path_list, snap_tolerance)
+        print(f"Path segments for floor {floor}: {counts['input']} -> {counts['output']} features "
+              f"({counts['duplicates']} duplicates dropped, {counts['merged']} merged)")
+
     features = []
     for seg in path_list:
         # Each 'seg' is ((x1, y1), (x2, y2))
@@ -142,20 +249,17 @@ def save_path_segments_shapefile(path_list, floor, output_dir="shapes"):
     print(f"Path segments shapefile saved for floor {floor}: {out_path}")
 
     # Optional visualization
-    fig, ax = plt.subplots(figsize=(10, 8))
-    gdf.plot(ax=ax, linewidth=2, label="Path segments")
-    ax.set_title(f"Floor {floor} - Path Segments")
-    ax.set_aspect("equal")
-    ax.invert_yaxis()
-    plt.legend()
-    plt.show()
+    if plot:
+        _plotting().plot_layer(gdf, f"Floor {floor} - Path Segments", show_legend=True, linewidth=2, label="Path segments")
     
     return gdf
 
-def save_outerwall_shapefile(outer_wall_points, floor, output_dir="shapes"):
+def save_outerwall_shapefile(outer_wall_points, floor, output_dir="shapes", plot=True):
     """
     Convert outer wall points into a Polygon and save as a shapefile.
     """
+    import geopandas as gpd
+
     if outer_wall_points is not None and len(outer_wall_points) >= 4:
         cleaned_outer = ensure_closed_polygon(outer_wall_points)
         try:
@@ -172,12 +276,9 @@ def save_outerwall_shapefile(outer_wall_points, floor, output_dir="shapes"):
             gdf.to_file(out_path)
             print(f"Outer wall shapefile saved for floor {floor}: {out_path}")
             # Optional plot
-            fig, ax = plt.subplots(figsize=(10, 8))
-            gdf.plot(column="feature", cmap="tab20", legend=True, edgecolor="black", ax=ax)
-            ax.set_title(f"Floor {floor} - Outer Wall")
-            ax.set_aspect("equal", adjustable='datalim')
-            ax.invert_yaxis()
-            plt.show()
+            if plot:
+                _plotting().plot_layer(gdf, f"Floor {floor} - Outer Wall", adjustable="datalim",
+                                       column="feature", cmap="tab20", legend=True, edgecolor="black")
         else:
             print(f"Outer wall polygon for floor {floor} is invalid.")
     else:
@@ -200,7 +301,7 @@ def tenant_contour_to_lines_exact(contour, skip_indices):
             segments.append(LineString([p1, p2]))
     return segments
 
-def save_tenant_lines_shapefile_exact(tenant_dict, tenant_skipper_dict, floor, output_dir="shapes"):
+def save_tenant_lines_shapefile_exact(tenant_dict, tenant_skipper_dict, floor, output_dir="shapes", plot=True):
     """
     • File name pattern:  floor_<floor>_tenant_lines_poi_<poi>.shp
     • Each file contains ONLY the 2‑point line segments that     *
@@ -210,6 +311,8 @@ def save_tenant_lines_shapefile_exact(tenant_dict, tenant_skipper_dict, floor, o
       0 → empty_area   1 → tenant   2 → toilet   3 → staircase
 
     """
+    import geopandas as gpd
+
     type_map = {
         0: "empty_area",
         1: "tenant",
@@ -247,16 +350,12 @@ def save_tenant_lines_shapefile_exact(tenant_dict, tenant_skipper_dict, floor, o
         gdf.to_file(out_path)
         print(f"Tenant outline lines shapefile saved for floor {floor}: {out_path}")
         
-        fig, ax = plt.subplots(figsize=(10, 8))
-        gdf.plot(ax=ax, linewidth=2, label="Tenant Outlines")
-        ax.set_title(f"Floor {floor} - Tenant Outlines for {cat_name}")
-        ax.set_aspect("equal")
-        ax.invert_yaxis()
-        plt.legend()
-        plt.show()
+        if plot:
+            _plotting().plot_layer(gdf, f"Floor {floor} - Tenant Outlines for {cat_name}", show_legend=True,
+                                   linewidth=2, label="Tenant Outlines")
         
 
-def save_bin_shapefile(bin_locations, floor, output_dir="shapes"):
+def save_bin_shapefile(bin_locations, floor, output_dir="shapes", plot=True):
     """
     Save a shapefile of bin point locations for a given floor.
     
@@ -265,6 +364,8 @@ def save_bin_shapefile(bin_locations, floor, output_dir="shapes"):
     - floor: Floor index or label as string.
     - output_dir: Directory to save shapefile in.
     """
+    import geopandas as gpd
+
     if not bin_locations:
         print(f"No bin locations provided for floor {floor}. Skipping.")
         return
@@ -282,16 +383,12 @@ def save_bin_shapefile(bin_locations, floor, output_dir="shapes"):
     shp_path = os.path.join(output_dir, f"floor_{floor}_bins.shp")
     gdf.to_file(shp_path)
 
-    fig, ax = plt.subplots(figsize=(8, 6))
-    gdf.plot(ax=ax, color='orange', markersize=50, label='Bin Locations')
-    ax.set_title(f"Floor {floor} - Bin Locations")
-    ax.legend()
-    ax.set_aspect("equal", adjustable='datalim')
-    ax.invert_yaxis()
-    plt.show()
+    if plot:
+        _plotting().plot_layer(gdf, f"Floor {floor} - Bin Locations", figsize=(8, 6), show_legend=True, adjustable="datalim",
+                               color='orange', markersize=50, label='Bin Locations')
     print(f"Bin shapefile saved for floor {floor}: {shp_path}")
 
-def save_agent_shapefile(agent_locations, floor, output_dir="shapes"):
+def save_agent_shapefile(agent_locations, floor, output_dir="shapes", plot=True):
     """
     Save a shapefile of bin point locations for a given floor.
     
@@ -300,6 +397,8 @@ def save_agent_shapefile(agent_locations, floor, output_dir="shapes"):
     - floor: Floor index or label as string.
     - output_dir: Directory to save shapefile in.
     """
+    import geopandas as gpd
+
     if not agent_locations:
         print(f"No agent locations provided for floor {floor}. Skipping.")
         return
@@ -317,16 +416,12 @@ def save_agent_shapefile(agent_locations, floor, output_dir="shapes"):
     shp_path = os.path.join(output_dir, f"floor_{floor}_agent.shp")
     gdf.to_file(shp_path)
 
-    fig, ax = plt.subplots(figsize=(8, 6))
-    gdf.plot(ax=ax, color='red', markersize=50, label='Agent Locations')
-    ax.set_title(f"Floor {floor} - Agent Locations")
-    ax.legend()
-    ax.set_aspect("equal", adjustable='datalim')
-    ax.invert_yaxis()
-    plt.show()
+    if plot:
+        _plotting().plot_layer(gdf, f"Floor {floor} - Agent Locations", figsize=(8, 6), show_legend=True, adjustable="datalim",
+                               color='red', markersize=50, label='Agent Locations')
     print(f"Agent shapefile saved for floor {floor}: {shp_path}")
 
-def save_stair_shapefile(stair_locations, floor, output_dir="shapes"):
+def save_stair_shapefile(stair_locations, floor, output_dir="shapes", plot=True):
     """
     Save a shapefile of stair point locations for a given floor.
     
@@ -335,6 +430,8 @@ def save_stair_shapefile(stair_locations, floor, output_dir="shapes"):
     - floor: Floor index or label as string.
     - output_dir: Directory to save shapefile in.
     """
+    import geopandas as gpd
+
     if not stair_locations:
         print(f"No stair locations provided for floor {floor}. Skipping.")
         return
@@ -352,19 +449,17 @@ def save_stair_shapefile(stair_locations, floor, output_dir="shapes"):
     shp_path = os.path.join(output_dir, f"floor_{floor}_stairs.shp")
     gdf.to_file(shp_path)
 
-    fig, ax = plt.subplots(figsize=(8, 6))
-    gdf.plot(ax=ax, color='blue', markersize=50, label='Stair Locations')
-    ax.set_title(f"Floor {floor} - Stair Locations")
-    ax.legend()
-    ax.set_aspect("equal", adjustable='datalim')
-    ax.invert_yaxis()
-    plt.show()
+    if plot:
+        _plotting().plot_layer(gdf, f"Floor {floor} - Stair Locations", figsize=(8, 6), show_legend=True, adjustable="datalim",
+                               color='blue', markersize=50, label='Stair Locations')
     print(f"Stair shapefile saved for floor {floor}: {shp_path}")
 
 def save_entrypoint_shapefile(entrypoints, floor, output_dir="shapes"):
     """
     Save a point shapefile for the EntryPoint(s) of a floor.
     """
+    import geopandas as gpd
+
     if not entrypoints:
         print(f"No entry points for floor {floor}, skipping.")
         return
@@ -379,4 +474,86 @@ def save_entrypoint_shapefile(entrypoints, floor, output_dir="shapes"):
     )
     out_path = os.path.join(output_dir, f"floor_{floor}_entrypoints.shp")
     df.to_file(out_path)
-    print(f"Entry points shapefile saved for floor {floor}: {out_path}")
\ No newline at end of file
+    print(f"Entry points shapefile saved for floor {floor}: {out_path}")
+
+# Layers written by save_floors_container, every feature carries the floor it belongs to
+CONTAINER_LAYERS = ["outerwall", "path_segments", "tenant_lines", "bins", "agent", "stairs", "entrypoints"]
+CONTAINER_DRIVERS = {"gpkg": "GPKG", "fgb": "FlatGeobuf"}
+
+def build_floor_layers(floor, path_list=None, outer_wall_points=None, tenant_dict=None, tenant_skipper_dict=None,
+                       bin_locations=None, agent_locations=None, stair_locations=None, entrypoints=None,
+                       simplify=True, snap_tolerance=0.0):
+    """
+    Builds the features of one floor for save_floors_container, the same geometry the save_*_shapefile
+    functions write, with a "floor" attribute on every row and the tenant category as a column
+    instead of a file per category.
+
+    Returns a dictionary {layer name: list of feature dicts}
+    """
+    layers = {layer: [] for layer in CONTAINER_LAYERS}
+
+    if outer_wall_points is not None and len(outer_wall_points) >= 4:
+        outer_poly = Polygon(ensure_closed_polygon(outer_wall_points)).buffer(0)
+        if not outer_poly.is_empty:
+            layers["outerwall"].append({"floor": floor, "feature": "outer_wall", "geometry": outer_poly})
+
+    if path_list:
+        if simplify:
+            path_list, _ = simplify_path_segments(path_list, snap_tolerance)
+        layers["path_segments"] = [{"floor": floor, "geometry": LineString([pt1, pt2])} for pt1, pt2 in path_list]
+
+    type_map = {0: "empty_area", 1: "tenant", 2: "toilet", 3: "staircase"}
+    tenant_skipper_dict = tenant_skipper_dict or {}
+    for poi, contours in (tenant_dict or {}).items():
+        cat_name = type_map.get(int(poi), f"unknown_{poi}")
+        skip_info = tenant_skipper_dict.get(poi, [])
+        for idx, contour in enumerate(contours):
+            skip_indices = skip_info[idx] if idx < len(skip_info) else []
+            for seg in tenant_contour_to_lines_exact(contour, skip_indices):
+                layers["tenant_lines"].append({"floor": floor, "category": cat_name, "geometry": seg})
+
+    for layer, feature, locations in [("bins", "bin", bin_locations), ("agent", "agent", agent_locations),
+                                      ("stairs", "stair", stair_locations), ("entrypoints", "entry_point", entrypoints)]:
+        for x, y in locations or []:
+            layers[layer].append({"floor": floor, "feature": feature, "geometry": Point(x, y)})
+    return layers
+
+def save_floors_container(floor_layers, output_dir="shapes", name="estate", file_format="gpkg"):
+    """
+    Writes every layer of every floor into a single container instead of a shapefile set per layer and floor.
+
+    Parameters:
+    - floor_layers: list of build_floor_layers results, one per floor
+    - file_format: "gpkg" writes one GeoPackage holding one table per layer (with an R-tree spatial index),
+      "fgb" writes one FlatGeobuf file per layer (with its packed Hilbert R-tree index) since FlatGeobuf
+      only holds a single layer. Either way each layer covers all floors, filter on the "floor" column.
+
+    Returns the list of written paths
+    """
+    import geopandas as gpd
+
+    if file_format not in CONTAINER_DRIVERS:
+        raise ValueError(f"Unknown container format: {file_format}")
+    driver = CONTAINER_DRIVERS[file_format]
+    os.makedirs(output_dir, exist_ok=True)
+    container_path = os.path.join(output_dir, f"{name}.{file_format}")
+    if file_format == "gpkg" and os.path.exists(container_path):
+        os.remove(container_path)  # Layers would otherwise be appended to the previous export
+
+    written = []
+    for layer in CONTAINER_LAYERS:
+        # All floors of a layer are gathered first so each layer is written with a single call
+        features = [feature for layers in floor_layers for feature in layers.get(layer, [])]
+        if not features:
+            continue
+        gdf = gpd.GeoDataFrame(features, crs=COMMON_CRS)
+        if file_format == "gpkg":
+            gdf.to_file(container_path, layer=layer, driver=driver, SPATIAL_INDEX="YES")
+            out_path = container_path
+        else:
+            out_path = os.path.join(output_dir, f"{name}_{layer}.fgb")
+            gdf.to_file(out_path, driver=driver, SPATIAL_INDEX="YES")
+        if out_path not in written:
+            written.append(out_path)
+        print(f"{layer}: {len(gdf)} features from {gdf['floor'].nunique()} floor(s) -> {out_path}")
+    return written
@@ -1,11 +1,23 @@
-from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, Request, Response, UploadFile, File, Form, HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Union
+import asyncio
 import json
+import os
+import tempfile
+import uuid
 
-from src.utils.FloorPlanExtractor import floorPlanExtractor
+from src.utils.distanceField import BIN
+from src.utils.gridCodec import ROUTE_FORMATS, decodeGrid, decodeRawGrid, encodeRoutes
 from src.utils.gridSolver import gridSolver
-from src.utils.mapCropper import mapCropper
+from src.utils.imageIO import IMAGE_FORMATS, loadImage
+from src.utils.jobQueue import FINISHED, jobQueue
+from src.utils.memoryStore import memoryStore
+from src.utils.resultCache import resultCache
+from src.utils.solverSession import sessionStore
+from src.utils.workerPool import (buildGrids, extractRegions, extractWalkways, optimizeBins, runInPool,
+                                  shutdownPool, solveMultiFloorRoutes, solveRoutes)
 
 app = FastAPI()
 app.add_middleware(
@@ -15,78 +27,570 @@ app.add_middleware(
     allow_methods=["*"],  # Allow all HTTP methods (GET, POST, etc.)
     allow_headers=["*"],  # Allow all headers
 )
+solverSessions = sessionStore()
+resultsCache = resultCache(
+    maxEntries=int(os.environ.get("SYDS_CACHE_ENTRIES") or 32),
+    directory=os.environ.get("SYDS_CACHE_DIR") or None,
+    maxDiskBytes=int(os.environ.get("SYDS_CACHE_MAX_BYTES") or 1024 ** 3),
+)
+# Encoded images handed out through GET /images/{imageId} when a request asks for response=urls
+imageStore = memoryStore(
+    maxBytes=int(os.environ.get("SYDS_IMAGE_STORE_BYTES") or 256 * 1024 ** 2),
+    ttl=float(os.environ.get("SYDS_IMAGE_TTL") or 15 * 60),
+)
+# Decoded floor images (extracted maps, padded floors and walkways) kept under content IDs, so the
+# next step of the wizard can send floorIds instead of uploading the same images again
+floorStore = memoryStore(
+    maxBytes=int(os.environ.get("SYDS_FLOOR_STORE_BYTES") or 512 * 1024 ** 2),
+    ttl=float(os.environ.get("SYDS_FLOOR_TTL") or 60 * 60),
+)
 
+# Background jobs, kept in sqlite so finished results survive a page reload (and a server restart)
+jobs = jobQueue(
+    os.environ.get("SYDS_JOB_DB") or os.path.join(tempfile.gettempdir(), "syds_jobs.sqlite3"),
+    keepJobs=int(os.environ.get("SYDS_JOB_KEEP") or 100),
+)
 
-@app.post("/uploadImages")
-async def findImage(images: List[UploadFile] = File(...)):
-    # Save the uploaded files to temporary locations
-    temp_file_paths = []
+
+@app.on_event("startup")
+async def startJobs():
+    jobs.start()
+
+
+@app.on_event("shutdown")
+def stopWorkers():
+    jobs.stop()
+    shutdownPool()
+
+
+# Uploads above this many bytes go through a uniquely named temp file instead of memory
+SPOOL_THRESHOLD = int(os.environ.get("SYDS_SPOOL_THRESHOLD") or 32 * 1024 * 1024)
+
+
+async def readUploads(images):
+    """
+    Reads every uploaded image into memory so it can be decoded straight from its bytes.
+    Files above SPOOL_THRESHOLD are copied to a unique temp file and passed by path instead.
+
+    Returns (sources, tempPaths), tempPaths have to be removed with removeTempFiles once done
+    """
+    sources = []
+    tempPaths = []
     for image in images:
-        contents = await image.read()
-        temp_path = f"/tmp/{image.filename}"
-        with open(temp_path, "wb") as f:
-            f.write(contents)
-        temp_file_paths.append(temp_path)
+        if image.size is not None and image.size > SPOOL_THRESHOLD:
+            suffix = os.path.splitext(image.filename or "")[1]
+            handle, tempPath = tempfile.mkstemp(prefix="syds_", suffix=suffix)
+            with os.fdopen(handle, "wb") as f:
+                while chunk := await image.read(1024 * 1024):
+                    f.write(chunk)
+            tempPaths.append(tempPath)
+            sources.append(tempPath)
+        else:
+            sources.append(await image.read())
+    return sources, tempPaths
 
-    # Process the images with mapExtractor
-    extractor = floorPlanExtractor(temp_file_paths)
-    processed_images = extractor.requestRegions()
 
-    return {"status": "success", "results": processed_images}
+def removeTempFiles(tempPaths):
+    for tempPath in tempPaths:
+        try:
+            os.remove(tempPath)
+        except OSError:
+            pass
+
+
+def keepFloors(arrays):
+    """
+    Stores decoded floor images in floorStore under the hash of their pixels
+
+    Returns the floorIds in floor order
+    """
+    return [floorStore.put(array, array.nbytes, key=resultsCache.makeKey([array], {"floor": True}))
+            for array in arrays]
+
+
+def haveFloors(floorIds):
+    return all(floorId in floorStore for floorId in floorIds)
+
+
+async def readFloors(images, floorIds):
+    """
+    Takes the floors either as uploaded images or as a JSON list of floorIds from an earlier step
+
+    Returns (sources, tempPaths) like readUploads, stored floors come back as their numpy arrays
+    """
+    if floorIds is None:
+        if not images:
+            raise HTTPException(status_code=400, detail="Send either images or floorIds")
+        return await readUploads(images)
+    try:
+        floorIds = json.loads(floorIds)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid floorIds: {str(e)}")
+    sources = [floorStore.get(floorId) for floorId in floorIds]
+    if any(source is None for source in sources):
+        raise HTTPException(status_code=404, detail="Unknown or expired floor ID, upload the images again")
+    return sources, []
+
+
+async def runTask(task, *args):
+    """
+    Runs one heavy task in the worker pool, turning a timeout into a 504
+    """
+    try:
+        return await runInPool(task, *args)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Processing took too long, try again or raise SYDS_TASK_TIMEOUT")
 
 
+# Ways the image endpoints can send their results back
+#   json: base64 PNG strings inside the JSON body (the default)
+#   multipart: one multipart/mixed body with a raw image part per floor
+#   urls: JSON list of GET /images/{imageId} URLs, one per floor
+RESPONSE_MODES = ("json", "multipart", "urls")
+
+
+def checkImageOptions(response, imageFormat, compression):
+    """
+    Validates the response query parameters of the image endpoints
+
+    Returns the imageFormat the workers should encode with, None for base64 JSON
+    """
+    if response not in RESPONSE_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown response mode: {response}")
+    if imageFormat not in IMAGE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown image format: {imageFormat}")
+    if compression is not None and not 0 <= compression <= 9:
+        raise HTTPException(status_code=400, detail="compression has to be between 0 and 9")
+    return None if response == "json" else imageFormat
+
+
+def imageResponse(images, response, imageFormat, floorIds):
+    """
+    Packs the encoded images from the workers into the requested response mode.
+    The floorIds of the images go in the JSON body, or in the X-Floor-Ids header of a multipart response
+    """
+    mediaType = IMAGE_FORMATS[imageFormat]
+    if response == "urls":
+        imageIds = [imageStore.put((image, mediaType), len(image)) for image in images]
+        return {"status": "success", "results": [f"/images/{imageId}" for imageId in imageIds], "floorIds": floorIds}
+
+    boundary = uuid.uuid4().hex
+    parts = []
+    for index, image in enumerate(images):
+        parts.append(f"--{boundary}\r\nContent-Type: {mediaType}\r\n"
+                     f"Content-Disposition: attachment; name=\"floor{index}\"; filename=\"floor{index}.{imageFormat}\"\r\n"
+                     f"Content-Length: {len(image)}\r\n\r\n".encode("ascii"))
+        parts.append(image)
+        parts.append(b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode("ascii"))
+    return Response(content=b"".join(parts), media_type=f"multipart/mixed; boundary={boundary}",
+                    headers={"X-Floor-Ids": ",".join(floorIds)})
+
+
+@app.post("/uploadImages")
+async def findImage(images: List[UploadFile] = File(...), response: str = "json",
+                    imageFormat: str = "png", compression: Optional[int] = None):
+    """
+    response picks how the regions come back: "json" (base64), "multipart" or "urls", see RESPONSE_MODES.
+    imageFormat ("png" or "webp") and compression (PNG level 0-9) only apply to the binary modes.
+    """
+    encoding = checkImageOptions(response, imageFormat, compression)
+    sources, tempPaths = await readUploads(images)
+    try:
+        key = resultsCache.makeKey(sources, {"task": "extractRegions", "pyramid": "band", "floorIds": True,
+                                             "imageFormat": encoding, "compression": compression})
+        cached = resultsCache.get(key)
+        if cached is None or not haveFloors(cached[1]):
+            # Process the images with mapExtractor
+            try:
+                processed_images, arrays = await runTask(extractRegions, sources, encoding, compression, True)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            cached = (processed_images, keepFloors(arrays.receive()))
+            resultsCache.put(key, cached)
+    finally:
+        removeTempFiles(tempPaths)
+
+    processed_images, floorIds = cached
+    if encoding is not None:
+        return imageResponse(processed_images, response, imageFormat, floorIds)
+    return {"status": "success", "results": processed_images, "floorIds": floorIds}
+
+
+@app.get("/images/{imageId}")
+async def getImage(imageId: str):
+    stored = imageStore.get(imageId)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired image ID")
+    image, mediaType = stored
+    return Response(content=image, media_type=mediaType)
+
+
+
+@app.get("/cacheStats")
+async def cacheStats():
+    return resultsCache.stats()
+
+
+@app.post("/floors")
+async def uploadFloors(images: List[UploadFile] = File(...)):
+    """
+    Decodes and keeps floor images the client changed itself (e.g. the padded floors), so the
+    following steps can refer to them by floorId. Images that are already stored are not decoded again.
+    """
+    sources, tempPaths = await readUploads(images)
+    try:
+        floorIds = []
+        for source in sources:
+            floorId = resultsCache.makeKey([source], {"upload": True})
+            if floorId not in floorStore:
+                image = await asyncio.to_thread(loadImage, source)
+                if image is None:
+                    raise HTTPException(status_code=400, detail="Image could not be decoded")
+                floorStore.put(image, image.nbytes, key=floorId)
+            floorIds.append(floorId)
+    finally:
+        removeTempFiles(tempPaths)
+    return {"status": "success", "floorIds": floorIds}
+
 
 @app.post("/extractingWalkway")
 async def extractingWalkway(
-    images: List[UploadFile] = File(...),
-    drawnRegions: str = Form(...)
+    images: List[UploadFile] = File(None),
+    floorIds: Optional[str] = Form(None),
+    drawnRegions: str = Form(...),
+    response: str = "json",
+    imageFormat: str = "png",
+    compression: Optional[int] = None
 ):
+    """
+    The floors come either as images or as a JSON list of floorIds from /uploadImages or /floors
+    """
+    encoding = checkImageOptions(response, imageFormat, compression)
     regions = json.loads(drawnRegions)
-    temp_file_paths = []
-    for image in images:
-        contents = await image.read()
-        temp_path = f"/tmp/{image.filename}"
-        with open(temp_path, "wb") as f:
-            f.write(contents)
-        temp_file_paths.append(temp_path)
-    extractor = mapCropper(temp_file_paths, regions)
-    processed_images = extractor.requestWalkways()
-    return {"status": "success", "results": processed_images}
+    sources, tempPaths = await readFloors(images, floorIds)
+    try:
+        key = resultsCache.makeKey(sources, {"task": "extractWalkways", "drawnRegions": regions, "floorIds": True,
+                                             "imageFormat": encoding, "compression": compression})
+        cached = resultsCache.get(key)
+        if cached is None or not haveFloors(cached[1]):
+            processed_images, arrays = await runTask(extractWalkways, sources, regions, encoding, compression, True)
+            cached = (processed_images, keepFloors(arrays.receive()))
+            resultsCache.put(key, cached)
+    finally:
+        removeTempFiles(tempPaths)
+    processed_images, walkwayIds = cached
+    if encoding is not None:
+        return imageResponse(processed_images, response, imageFormat, walkwayIds)
+    return {"status": "success", "results": processed_images, "floorIds": walkwayIds}
 
 @app.post("/createNumpy")
-async def createNumpy(    images: List[UploadFile] = File(...),
+async def createNumpy(    images: List[UploadFile] = File(None),
+    floorIds: Optional[str] = Form(None),
     drawnRegions: str = Form(...),
     shapeLabels: str = Form(...)):
-    regions = json.loads(drawnRegions)
-    labels = json.loads(shapeLabels)
-    temp_file_paths = []
-    for image in images:
-        contents = await image.read()
-        temp_path = f"/tmp/{image.filename}"
-        with open(temp_path, "wb") as f:
-            f.write(contents)
-        temp_file_paths.append(temp_path)
-    print(regions)
-    print(labels)
-    return{"status": "success", "results": None}
+    """
+    Builds the routing grid of every floor from its walkway image (or the walkway floorIds from
+    /extractingWalkway) and labelled regions.
+    Each grid is kept as a solver session, so /findRoutes and /sessions/{gridId}/edits only need its gridId.
+    The grids come without bins: place them with /sessions/{gridId}/edits or /optimizeBins before
+    asking /findRoutes for routes, it answers 409 for a grid that has none.
+    """
+    try:
+        regions = json.loads(drawnRegions)
+        labels = json.loads(shapeLabels)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid regions or labels: {str(e)}")
+    sources, tempPaths = await readFloors(images, floorIds)
+    try:
+        floors = await runTask(buildGrids, sources, regions, labels)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid floor data: {str(e)}")
+    finally:
+        removeTempFiles(tempPaths)
+
+    return storeGrids(floors)
 
 
+def storeGrids(floors):
+    """
+    Keeps the grid of every floor from buildGrids as a solver session
+
+    Returns the /createNumpy response, the grids themselves are replaced by their gridId
+    """
+    results = []
+    for floor in floors:
+        gridId, _ = solverSessions.create(floor["grid"])
+        results.append({
+            "gridId": gridId,
+            "shape": list(floor["grid"].shape),
+            "tenants": [list(tenant) for tenant in floor["tenants"]],
+            "unconnectedTenants": floor["unconnectedTenants"],
+            "regions": floor["regions"],
+            "doorSkips": floor["doorSkips"],
+        })
+    return {"status": "success", "results": results}
+
 
 @app.post("/findRoutes")
-async def find_routes(request: Request):
+async def find_routes(request: Request, routeFormat: str = "cells"):
+    """
+    Takes the grid as JSON ("grid", "gridBytes" + "shape" or "gridRle", see gridCodec.decodeGrid), as the
+    "gridId" of a grid from /createNumpy or /sessions, or as raw uint8 bytes with
+    Content-Type application/octet-stream and an X-Grid-Shape: rows,cols header.
+    routeFormat picks how each route is returned: "cells", "runs" or "corners".
+    The "hierarchical" mode takes a "clusterSize" (X-Cluster-Size header for raw grids), 64 by default.
+    """
     try:
-        data = await request.json()  # Extract raw JSON data
-        grid = data.get("grid")  # Get 'grid' key
-        solver = gridSolver(grid)
-        print(solver.routes)
-        if not grid or not isinstance(grid, list):
-            raise HTTPException(status_code=400, detail="Invalid grid format")
+        if request.headers.get("content-type", "").startswith("application/octet-stream"):
+            grid = decodeRawGrid(await request.body(), request.headers.get("x-grid-shape"))
+            mode = request.headers.get("x-routing-mode", "distanceField")
+            clusterSize = int(request.headers.get("x-cluster-size", 64))
+        else:
+            data = await request.json()  # Extract raw JSON data
+            mode = data.get("mode", "distanceField")  # "bfs" runs the old per tenant search
+            clusterSize = data.get("clusterSize", 64)
+            if not isinstance(clusterSize, int) or isinstance(clusterSize, bool):
+                raise ValueError("clusterSize has to be an int")
+            grid = None if "gridId" in data else decodeGrid(data)
+        if mode not in gridSolver.MODES:
+            raise ValueError(f"Unknown routing mode: {mode}")
+        if clusterSize < 2:
+            raise ValueError("clusterSize has to be at least 2")
+        if routeFormat not in ROUTE_FORMATS:
+            raise ValueError(f"Unknown route format: {routeFormat}")
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid grid format: {str(e)}")
 
-        # Example: Dummy response for testing
-        result = solver.routes
-        
+    if grid is None:
+        session = solverSessions.get(data["gridId"])
+        if session is None:
+            raise HTTPException(status_code=404, detail="Unknown grid ID")
+        if not (session.grid == BIN).any():
+            # Fresh /createNumpy grids have no bins yet, every route would come back empty
+            raise HTTPException(status_code=409, detail="The grid has no bins yet, add them with "
+                                                        "/sessions/{gridId}/edits or /optimizeBins first")
+        if mode == "distanceField":
+            # The session already holds the routes of its current grid
+            return encodeRoutes(session.requestRoutes(), routeFormat)
+        grid = session.grid.copy()
 
+    try:
+        result = await runTask(solveRoutes, grid, mode, routeFormat, clusterSize)
         return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+
+
+@app.post("/optimizeBins")
+async def optimize_bins(request: Request):
+    """
+    Finds where to put "budget" new bins so the tenants walk as little as possible, see binOptimizer.
+    The grid is sent as for /findRoutes, either in one of the JSON formats or as a "gridId".
+    "objective" is "total" (default) or "worst", "keepBins" false clears the bins already in the grid,
+    "timeLimit" (seconds, default 10) and "maxIterations" (default 50) bound the search.
+
+    The grid with the bins placed is kept as a new solver session, its gridId is returned with the placement
+    """
+    try:
+        data = await request.json()
+        budget = int(data["budget"])
+        objective = data.get("objective", "total")
+        keepBins = data.get("keepBins", True)
+        if not isinstance(keepBins, bool):
+            raise ValueError("keepBins has to be true or false")
+        timeLimit = float(data.get("timeLimit", 10))
+        maxIterations = int(data.get("maxIterations", 50))
+        if timeLimit <= 0 or maxIterations < 0:
+            raise ValueError("timeLimit has to be positive and maxIterations can not be negative")
+        if "gridId" in data:
+            session = solverSessions.get(data["gridId"])
+            if session is None:
+                raise HTTPException(status_code=404, detail="Unknown grid ID")
+            grid = session.grid.copy()
+        else:
+            grid = decodeGrid(data)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid optimization request: {str(e)}")
+
+    try:
+        result, grid = await runTask(optimizeBins, grid, budget, objective, keepBins, timeLimit, maxIterations)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    gridId, _ = solverSessions.create(grid)
+    return {"gridId": gridId, **result}
+
+
+@app.post("/findMultiFloorRoutes")
+async def find_multi_floor_routes(request: Request):
+    data = await request.json()
+    grids = data.get("grids")  # One grid per floor
+    stairs = data.get("stairs", [])  # [{"from": [floor, x, y], "to": [floor, x, y], "cost": int}]
+    if not grids or not isinstance(grids, list):
+        raise HTTPException(status_code=400, detail="Invalid grids format")
+    try:
+        return await runTask(solveMultiFloorRoutes, grids, stairs)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid staircase links: {str(e)}")
+
+
+@app.post("/sessions")
+async def create_session(request: Request):
+    """
+    Takes the grid in any of the JSON formats of /findRoutes ("grid", "gridBytes" + "shape" or "gridRle")
+    """
+    data = await request.json()
+    try:
+        grid = decodeGrid(data)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid grid format: {str(e)}")
+    gridId, session = solverSessions.create(grid)
+    return {"gridId": gridId, "routes": session.requestRoutes()}
+
+
+@app.post("/sessions/{gridId}/edits")
+async def edit_session(gridId: str, request: Request):
+    session = solverSessions.get(gridId)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown grid ID")
+    data = await request.json()
+    try:
+        changes = session.applyEdits(data.get("edits", []))
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid edits: {str(e)}")
+    return changes
+
+
+@app.delete("/sessions/{gridId}")
+async def delete_session(gridId: str):
+    if not solverSessions.remove(gridId):
+        raise HTTPException(status_code=404, detail="Unknown grid ID")
+    return {"status": "success"}
+
+
+# Background versions of the heavy endpoints. Each returns a jobId straight away, the job is then
+# followed with GET /jobs/{jobId} or the GET /jobs/{jobId}/events stream, and its result is the
+# same JSON the synchronous endpoint would have answered with.
+
+def cachedJob(kind, floorCount, key):
+    """
+    Returns the jobId of an already done job when the result is in the cache, None otherwise
+    """
+    cached = resultsCache.get(key)
+    if cached is None or not haveFloors(cached[1]):
+        return None
+    images, floorIds = cached
+    return jobs.complete(kind, floorCount, {"status": "success", "results": images, "floorIds": floorIds})
+
+
+def cachingFinish(key):
+    def finish(result):
+        images, arrays = result
+        floorIds = keepFloors(arrays.receive())
+        resultsCache.put(key, (images, floorIds))
+        return {"status": "success", "results": images, "floorIds": floorIds}
+    return finish
+
+
+@app.post("/jobs/uploadImages")
+async def uploadImagesJob(images: List[UploadFile] = File(...)):
+    sources, tempPaths = await readUploads(images)
+    key = resultsCache.makeKey(sources, {"task": "extractRegions", "pyramid": "band", "floorIds": True,
+                                         "imageFormat": None, "compression": None})
+    jobId = cachedJob("uploadImages", len(sources), key)
+    if jobId is None:
+        jobId = jobs.submit("uploadImages", len(sources), extractRegions, (sources, None, None, True),
+                            finish=cachingFinish(key), cleanup=lambda: removeTempFiles(tempPaths))
+    else:
+        removeTempFiles(tempPaths)
+    return {"jobId": jobId}
+
+
+@app.post("/jobs/extractingWalkway")
+async def extractingWalkwayJob(images: List[UploadFile] = File(None), floorIds: Optional[str] = Form(None),
+                               drawnRegions: str = Form(...)):
+    regions = json.loads(drawnRegions)
+    sources, tempPaths = await readFloors(images, floorIds)
+    key = resultsCache.makeKey(sources, {"task": "extractWalkways", "drawnRegions": regions, "floorIds": True,
+                                         "imageFormat": None, "compression": None})
+    jobId = cachedJob("extractingWalkway", len(sources), key)
+    if jobId is None:
+        jobId = jobs.submit("extractingWalkway", len(sources), extractWalkways, (sources, regions, None, None, True),
+                            finish=cachingFinish(key), cleanup=lambda: removeTempFiles(tempPaths))
+    else:
+        removeTempFiles(tempPaths)
+    return {"jobId": jobId}
+
+
+@app.post("/jobs/createNumpy")
+async def createNumpyJob(images: List[UploadFile] = File(None), floorIds: Optional[str] = Form(None),
+                         drawnRegions: str = Form(...), shapeLabels: str = Form(...)):
+    try:
+        regions = json.loads(drawnRegions)
+        labels = json.loads(shapeLabels)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid regions or labels: {str(e)}")
+    sources, tempPaths = await readFloors(images, floorIds)
+    jobId = jobs.submit("createNumpy", len(sources), buildGrids, (sources, regions, labels),
+                        finish=storeGrids, cleanup=lambda: removeTempFiles(tempPaths))
+    return {"jobId": jobId}
+
+
+@app.get("/jobs")
+async def listJobs(limit: int = 20):
+    return jobs.list(limit)
+
+
+@app.get("/jobs/{jobId}")
+async def jobStatus(jobId: str):
+    job = jobs.get(jobId)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job ID")
+    return job
+
+
+@app.get("/jobs/{jobId}/result")
+async def jobResult(jobId: str):
+    job = jobs.get(jobId)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job ID")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return jobs.result(jobId)
+
+
+@app.get("/jobs/{jobId}/events")
+async def jobEvents(jobId: str):
+    """
+    Server-sent events stream of the job status, one event per change until the job finishes
+    """
+    job = jobs.get(jobId)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job ID")
+
+    async def stream():
+        updates = jobs.subscribe(jobId)
+        try:
+            current = jobs.get(jobId)
+            yield f"data: {json.dumps(current)}\n\n"
+            while current["status"] not in FINISHED:
+                try:
+                    current = await asyncio.wait_for(updates.get(), 15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"  # Stops proxies from closing an idle stream
+                    continue
+                yield f"data: {json.dumps(current)}\n\n"
+        finally:
+            jobs.unsubscribe(jobId, updates)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.delete("/jobs/{jobId}")
+async def cancelJob(jobId: str):
+    if not jobs.cancel(jobId):
+        raise HTTPException(status_code=409, detail="Unknown or already finished job")
+    return {"status": "success"}
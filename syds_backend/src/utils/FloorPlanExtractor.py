@@ -1,16 +1,33 @@
 import cv2
 import numpy as np
-from matplotlib import pyplot as plt
 import os
 import base64
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.imageIO import encodeImage, makeTransparent, describeSource, loadImage
 
 
 class floorPlanExtractor():
     """
     Created another class to redo map extractor so there arent so many functions
     """
-    def __init__(self, images):
+    # In pyramid mode images with a longer side than this look for their quadrilateral on a downscaled copy
+    PYRAMID_MAX_SIDE = 1280
+
+    def __init__(self, images, workers=None, pyramid=True, progress=None):
+        """
+        Args:
+            images (list): One source per floor, either a numpy array, the encoded file bytes or a file path
+            workers (int): How many floors are processed at once, None uses one thread per floor up to
+            the CPU count and 1 processes the floors one after another
+            pyramid (bool): Find the quadrilateral on a downscaled copy of large photos and refine
+            its corners at full resolution, False runs the whole search at full resolution
+            progress (callable): Called as progress(floor index, stage name) whenever a floor starts a stage
+        """
         self.images = images
+        self.workers = workers
+        self.pyramid = pyramid
+        self.progress = progress
         self.extractedRegions = None
         self.extractedFloors = None
 
@@ -23,30 +40,68 @@ class floorPlanExtractor():
         if self.extractedRegions is None:
             self.batchExtract()
         exported = []
-        for image in self.extractedRegions:
+        for index, image in enumerate(self.extractedRegions):
+            self._report(index, "encode")
             image = self._makeTransparent(image)
             b64_image = self._imageToBase64(image, ext='.png')
             exported.append(b64_image)
         return exported
-    
+
+    def requestEncodedRegions(self, imageFormat="png", compression=None):
+        """
+        Function used to send out the extracted regions as image files instead of base64.
+
+        Args:
+            imageFormat (str): "png" or "webp", both lossless
+            compression (int): PNG compression level, lower encodes faster
+
+        Returns a list of the encoded image bytes
+        """
+        if self.extractedRegions is None:
+            self.batchExtract()
+        exported = []
+        for index, image in enumerate(self.extractedRegions):
+            self._report(index, "encode")
+            exported.append(encodeImage(self._makeTransparent(image), imageFormat, compression))
+        return exported
+
     def batchProcess(self):
         """
         Main function to be used to extract out the segmented map from the images
         
         Stores the extracted images within the self.extractedFloors value
         """
-        warpedImages = []
-        # dotted_images = []
-        for image in self.images:
-            warpedImage = self._processImage(image)
-            # if warped_image is not None:
-            #     # Convert the warped image (a NumPy array) to a Base64 string
-            #     b64_image = self._imageToBase64(warped_image, ext='.png')
-            #     warped_images.append(b64_image)
-            # else:
-            #     warped_images.append(None)
-            warpedImages.append(warpedImage)
-        self.extractedFloors = warpedImages
+        self.extractedFloors = self._mapFloors(self._processImage, self.images)
+
+    def _mapFloors(self, function, items):
+        """
+        Helper function used to run function on every floor in parallel.
+
+        The floors run on threads, OpenCV releases the GIL inside its calls so they spread across cores
+        while every thread works on the same pixel buffers without copying or pickling them.
+
+        Returns a list of the results in floor order
+        """
+        workers = self.workers or min(len(items), os.cpu_count() or 1)
+        if workers <= 1 or len(items) <= 1:
+            return [function(item) for item in items]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(function, items))
+
+    def _report(self, index, stage):
+        if self.progress is not None:
+            self.progress(index, stage)
+
+    def _processFloor(self, index):
+        """
+        Runs the independent per floor steps (warp and largest region) for one image
+
+        Returns (warped image, extracted region)
+        """
+        self._report(index, "warp")
+        warpedImage = self._processImage(self.images[index])
+        self._report(index, "region")
+        return warpedImage, self._extractLargestRegion(warpedImage)
 
     def _processImage(self, source):
         """
@@ -54,19 +109,20 @@ class floorPlanExtractor():
         and converting it into a storage of information.
 
         Returns a numpy array of the transformed image.
+        Raises ValueError when the image can not be read or holds no quadrilateral
         """
-        image = cv2.imread(source)
+        image = loadImage(source)
         if image is None:
-            print("Could not open image:", source)
-            return None
-        else:
-            rect = self._findLargestQuadrilateral(image)
-            if rect is not None:
-                # rect has shape (4,1,2)
-                corners = rect.reshape((4, 2))  # Now it's (4,2)
-                corners = self._orderPoints(corners)
-                transformedImage = self._fourPointTransform(image, corners)
-                return transformedImage
+            raise ValueError(f"Could not open image: {describeSource(source)}")
+        rect = self._findLargestQuadrilateral(image)
+        if rect is None:
+            raise ValueError(f"No floor plan outline found in image: {describeSource(source)}")
+        # rect has shape (4,1,2)
+        corners = rect.reshape((4, 2))  # Now it's (4,2)
+        corners = self._orderPoints(corners)
+        transformedImage = self._fourPointTransform(image, corners)
+        return transformedImage
+
     def _orderPoints(self, pts):
         """
         Helper Function used to order th points in the order of 
@@ -119,14 +175,16 @@ class floorPlanExtractor():
         Stores the extracted images within the self.extractedRegions
         """
         if self.extractedFloors is None:
-            self.batchProcess()
-        
-        extractedRegions = []
-        for image in self.extractedFloors:
-            extractedRegions.append(self._extractLargestRegion(image))
+            processed = self._mapFloors(self._processFloor, range(len(self.images)))
+            self.extractedFloors = [warpedImage for warpedImage, _ in processed]
+            extractedRegions = [region for _, region in processed]
+        else:
+            extractedRegions = self._mapFloors(self._extractLargestRegion, self.extractedFloors)
 
+        # Every floor is scaled against floor 0, so this last step stays sequential
         finalized = []
         for index, image in enumerate(extractedRegions):
+            self._report(index, "scale")
             if index == 0:
                 h0, w0 = image.shape[:2]
                 newH = int(h0 * 600/w0)
@@ -139,41 +197,117 @@ class floorPlanExtractor():
 
         self.extractedRegions = finalized
     
-    def _findLargestQuadrilateral(self,image):
+    def _findLargestQuadrilateral(self, image):
         """
         Finds the largest 4-sided contour (quadrilateral) in the image.
-        
+
+        In pyramid mode large photos are searched at a lower resolution and only the four
+        corners are refined on the full image, landing on the same pixels a full resolution search
+        would. The downscaled copy can lose a thin outline, so when it finds nothing the search runs
+        again at full resolution.
+
         Returns the approximated contour (4 points) if found, otherwise returns None.
         """
         # Convert to grayscale
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if not self.pyramid or max(gray.shape) <= self.PYRAMID_MAX_SIDE:
+            return self._pickQuadrilateral(self._edgeMap(gray))
+
+        # Halve the image until it fits, each pyrDown level is a cheap blur and subsample
+        small = gray
+        scale = 1.0
+        while max(small.shape) > self.PYRAMID_MAX_SIDE:
+            small = cv2.pyrDown(small)
+            scale /= 2
+        approx = self._pickQuadrilateral(self._edgeMap(small))
+        if approx is None:
+            return self._pickQuadrilateral(self._edgeMap(gray))
+        corners = approx.reshape(4, 2).astype(np.float32) / scale
+        refined = self._refineQuadrilateral(gray, corners, scale)
+        if refined is None:
+            return np.round(corners).astype(np.int32).reshape(4, 1, 2)
+        return refined
+
+    def _refineQuadrilateral(self, gray, corners, scale):
+        """
+        Helper function used to move a quadrilateral found on a downscaled copy back onto the full image.
+
+        The same edge steps run at full resolution, but only on strips along the four coarse sides,
+        and the usual search then runs on that band. The corners come out where the full resolution
+        search would have put them, for a fraction of the pixels.
+
+        Returns the approximated contour (4 points) if found, otherwise returns None.
+        """
+        height, width = gray.shape
+        # One downscaled pixel covers 1/scale full pixels, keep a few of them on both sides of each side
+        band = int(np.ceil(3 / scale)) + 4
+        margin = 8  # Room for the blur and closing kernels so the strip border does not leak in
+        # Only the bounding box of the band is ever looked at
+        left = max(int(corners[:, 0].min()) - band, 0)
+        top = max(int(corners[:, 1].min()) - band, 0)
+        right = min(int(corners[:, 0].max()) + band + 1, width)
+        bottom = min(int(corners[:, 1].max()) + band + 1, height)
+        closed = np.zeros((bottom - top, right - left), dtype=np.uint8)
+        for start, end in zip(corners, np.roll(corners, -1, axis=0)):
+            x0 = max(int(min(start[0], end[0])) - band, 0)
+            y0 = max(int(min(start[1], end[1])) - band, 0)
+            x1 = min(int(max(start[0], end[0])) + band + 1, width)
+            y1 = min(int(max(start[1], end[1])) + band + 1, height)
+            outerX0, outerY0 = max(x0 - margin, 0), max(y0 - margin, 0)
+            outerX1, outerY1 = min(x1 + margin, width), min(y1 + margin, height)
+            strip = self._edgeMap(gray[outerY0:outerY1, outerX0:outerX1])
+            closed[y0 - top:y1 - top, x0 - left:x1 - left] |= strip[y0 - outerY0:y1 - outerY0,
+                                                                    x0 - outerX0:x1 - outerX0]
+        bandMask = np.zeros_like(closed)
+        shifted = np.round(corners - (left, top)).astype(np.int32)
+        cv2.polylines(bandMask, [shifted], True, 255, thickness=2 * band + 1)
+        return self._pickQuadrilateral(cv2.bitwise_and(closed, bandMask, dst=closed), offset=(left, top))
+
+    def _edgeMap(self, gray):
+        """
+        Helper function used to find the closed edges the quadrilateral search runs on
+
+        Returns a binary numpy array of the edges
+        """
         # Apply Gaussian blur to reduce noise
         blurred = cv2.GaussianBlur(gray, (5, 5), 0)
         # Edge detection with Canny
         edged = cv2.Canny(blurred, 50, 200)
-        
+
         # Use a morphological closing to help join broken edges
         kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
-        closed = cv2.morphologyEx(edged, cv2.MORPH_CLOSE, kernel)
-        
+        return cv2.morphologyEx(edged, cv2.MORPH_CLOSE, kernel)
+
+    def _pickQuadrilateral(self, closed, offset=(0, 0)):
+        """
+        Helper function used to find the largest 4-sided contour in an edge map,
+        offset is added to every point when the edge map is a crop of the image
+
+        Returns the approximated contour (4 points) if found, otherwise returns None.
+        """
         # Find contours in the edged image
-        contours, _ = cv2.findContours(closed.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
+        contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=offset)
+
         largestArea = 0
         bestApprox = None
         # Loop over the contours
         for cnt in contours:
+            # The approximation can never be larger than the bounding box, so small contours
+            # are skipped before the expensive approxPolyDP
+            _, _, w, h = cv2.boundingRect(cnt)
+            if w * h <= largestArea:
+                continue
             # Approximate the contour to a polygon
             peri = cv2.arcLength(cnt, True)
             approx = cv2.approxPolyDP(cnt, 0.02 * peri, True)
-            
+
             # Check if it has 4 points
             if len(approx) == 4:
                 area = cv2.contourArea(approx)
                 if area > largestArea:
                     largestArea = area
                     bestApprox = approx
-                    
+
         return bestApprox
 
     def _scaleDownRegions(self, referenceImage, inputImage):
@@ -220,7 +354,7 @@ class floorPlanExtractor():
 
         Problem is that this probably means it can only work for maps with only one floor
 
-        Returns a numpy array of the cropped region
+        Returns a numpy array of the cropped region, raises ValueError when there is no large enough region
         """
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 15, 5)
@@ -245,23 +379,11 @@ class floorPlanExtractor():
             cropped_region = largest_region[y:y+h, x:x+w]  # Crop to remove black areas
 
             return cropped_region
-        else:
-            print("No valid large contours detected.")
-
-    def _makeTransparent(self, image, color=(0, 0, 0 )):
-        image_copy = image.copy()
+        raise ValueError("No floor plan region found inside the outline")
 
-        if image_copy.shape[2] == 3:  # If the image is RGB
-            image_copy = cv2.cvtColor(image_copy, cv2.COLOR_BGR2BGRA)
+    def _makeTransparent(self, image, color=(0, 0, 0)):
+        return makeTransparent(image, color)
 
-        # Create a mask for the target color
-        mask = np.all(image_copy[:, :, :3] == color, axis=-1)
-
-        # Set the alpha channel to 0 for the matching pixels
-        image_copy[mask, 3] = 0
-
-        return image_copy
-    
     def _imageToBase64(self,image_array, ext='.png'):
         """
         Helper function used to encode a numpy array into a
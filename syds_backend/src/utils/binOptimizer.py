@@ -0,0 +1,219 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.utils.distanceField import distanceField, EMPTY, TENANT, BIN, WALL
+
+OBJECTIVES = ("total", "worst")
+
+
+class binOptimizer():
+    def __init__(self, grid, budget, objective="total", keepBins=True, maxCandidates=20000, threads=None):
+        """
+        Searches the walkway cells for the bin placement that keeps the tenants' walks short.
+
+        One distance field is searched from every tenant, which gives the walking distance from each
+        tenant to every candidate cell at once. Bins do not block anyone, so these distances never
+        change while bins are moved around and every placement is scored straight from that matrix.
+        The bins are placed greedily one at a time and then improved by swapping single bins for
+        other candidates (the k-median interchange heuristic) until no swap helps.
+
+        Args:
+            grid (np.ndarray): Grid in the gridSolver encoding
+            budget (int): Number of bins to place
+            objective (str): "total" minimizes the summed walking distance of all tenants,
+            "worst" the longest walk any tenant has (ties broken on the total)
+            keepBins (bool): True keeps the bins already in the grid where they are on top of the budget,
+            False clears them first
+            maxCandidates (int): Walkway cells considered, evenly spread over the reachable ones when there are more
+            threads (int): Threads scoring candidates in parallel, one per CPU up to 8 by default
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective: {objective}")
+        if budget < 1:
+            raise ValueError("budget has to be at least 1")
+        self.grid = np.array(grid, dtype=np.int8)
+        if not keepBins:
+            self.grid[self.grid == BIN] = EMPTY
+        self.budget = int(budget)
+        self.objective = objective
+        self.threads = threads or min(8, os.cpu_count() or 1)
+        self.executor = None
+
+        passable = (self.grid != WALL) & (self.grid != TENANT)
+        ys, xs = np.nonzero(self.grid == TENANT)
+        self.tenants = list(zip(xs.tolist(), ys.tolist()))
+        ys, xs = np.nonzero(self.grid == BIN)
+        self.fixed = list(zip(xs.tolist(), ys.tolist()))
+        # Walking further than every cell of the grid is impossible, so this stands for "no bin reachable"
+        self.unreachable = self.grid.size + 1
+        fields = self._tenantFields(passable)
+        self.candidates, self.distances = self._candidateDistances(fields, maxCandidates)
+        xs, ys = np.array(self.fixed, dtype=np.int64).reshape(-1, 2).T
+        self.fixedDistances = self._distancesTo(fields, xs, ys)
+        # Tenants walled off from every candidate and bin are left out of the scores, nothing can change for them
+        self.reachable = ((self.distances < self.unreachable).any(axis=1) |
+                          (self.fixedDistances < self.unreachable).any(axis=1))
+        self.distances = self.distances[self.reachable]
+        self.fixedDistances = self.fixedDistances[self.reachable]
+
+    def _tenantFields(self, passable):
+        with ThreadPoolExecutor(self.threads) as executor:
+            return list(executor.map(lambda tenant: distanceField(passable, [tenant], parents=False), self.tenants))
+
+    def _candidateDistances(self, fields, maxCandidates):
+        """
+        Returns (candidates, distances): the (n, 2) array of candidate (x, y) cells and the
+        (tenants, n) walking distances to them, unreachable where a tenant can not get there
+        """
+        ys, xs = np.nonzero(self.grid == EMPTY)
+        distances = self._distancesTo(fields, xs, ys)
+        # Cells no tenant can walk to would never be picked
+        keep = np.flatnonzero((distances < self.unreachable).any(axis=0))
+        if len(keep) > maxCandidates:
+            keep = keep[np.linspace(0, len(keep) - 1, maxCandidates).astype(np.int64)]
+        return np.column_stack((xs[keep], ys[keep])), distances[:, keep]
+
+    def _distancesTo(self, fields, xs, ys):
+        distances = np.empty((len(fields), len(xs)), dtype=np.int32)
+        for row, field in enumerate(fields):
+            dist = field.dist[(ys + 1) * field.stride + xs + 1]
+            distances[row] = np.where(dist >= 0, dist, self.unreachable)
+        return distances
+
+    def _score(self, closest):
+        """
+        Returns (primary, secondary) cost arrays for a (tenants, n) block of closest bin distances
+        """
+        total = closest.sum(axis=0, dtype=np.int64)
+        worst = closest.max(axis=0).astype(np.int64) if len(closest) else np.zeros(closest.shape[1], np.int64)
+        return (total, worst) if self.objective == "total" else (worst, total)
+
+    def _bestAddition(self, closest, taken):
+        """
+        Scores adding every candidate except the taken ones to the bins whose closest distances are given,
+        the candidates are split into one block per thread
+
+        Returns (cost, candidate) of the best one
+        """
+        blocks = np.array_split(np.arange(len(self.candidates)), self.threads)
+
+        def scoreBlock(block):
+            if not len(block):
+                return None
+            primary, secondary = self._score(np.minimum(closest[:, None], self.distances[:, block]))
+            primary[np.isin(block, taken)] = np.iinfo(np.int64).max
+            best = np.lexsort((secondary, primary))[0]
+            return (int(primary[best]), int(secondary[best])), int(block[best])
+
+        found = [result for result in self.executor.map(scoreBlock, blocks) if result is not None]
+        return min(found)
+
+    def _closest(self, columns):
+        """
+        Returns the distance of every reachable tenant to the closest fixed bin or chosen candidate
+        """
+        closest = np.full(len(self.distances), self.unreachable, dtype=np.int32)
+        if self.fixed:
+            closest = np.minimum(closest, self.fixedDistances.min(axis=1))
+        if columns:
+            closest = np.minimum(closest, self.distances[:, columns].min(axis=1))
+        return closest
+
+    def optimize(self, timeLimit=10, maxIterations=50, seed=0):
+        """
+        Places the bins greedily and improves them by swapping. Once no single swap helps, one bin of
+        the best placement so far is moved to a random candidate and the swapping starts over from there,
+        which gets the search out of placements where only moving two bins at once would help.
+        This goes on until maxIterations passes over all bins were made or timeLimit seconds went by,
+        the greedy placement always runs to the end.
+
+        Returns {"bins", "total", "worst", "mean", "distances", "unreachable", "iterations",
+        "stoppedBy", "elapsed"}, distances maps every tenant to its walk to the closest bin
+        (-1 if it can not reach one) and unreachable lists the tenants no walkway cell can serve
+        """
+        start = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        iterations = 0
+        with ThreadPoolExecutor(self.threads) as executor:
+            self.executor = executor
+            chosen = []
+            for _ in range(min(self.budget, len(self.candidates))):
+                _, candidate = self._bestAddition(self._closest(chosen), chosen)
+                chosen.append(candidate)
+            best, bestCost = list(chosen), self._cost(chosen)
+            cost = bestCost
+
+            while True:
+                if len(chosen) in (0, len(self.candidates)):
+                    stoppedBy = "converged"  # Every candidate holds a bin, nothing left to try
+                    break
+                if iterations >= maxIterations:
+                    stoppedBy = "iterations"
+                    break
+                if time.perf_counter() - start > timeLimit:
+                    stoppedBy = "time"
+                    break
+                iterations += 1
+                swap = self._bestSwap(chosen, cost, start, timeLimit)
+                if swap is not None:
+                    cost, slot, candidate = swap
+                    chosen[slot] = candidate
+                    if cost < bestCost:
+                        best, bestCost = list(chosen), cost
+                    continue
+                chosen = list(best)
+                free = np.setdiff1d(np.arange(len(self.candidates)), chosen)
+                chosen[int(rng.integers(len(chosen)))] = int(rng.choice(free))
+                cost = self._cost(chosen)
+            self.executor = None
+
+        return self._describe(best, iterations, stoppedBy, time.perf_counter() - start)
+
+    def _bestSwap(self, chosen, cost, start, timeLimit):
+        """
+        Tries moving every bin to every other candidate
+
+        Returns (cost, slot, candidate) of the best swap that lowers the cost, None if there is none
+        """
+        best = None
+        for slot in range(len(chosen)):
+            if time.perf_counter() - start > timeLimit:
+                break
+            others = chosen[:slot] + chosen[slot + 1:]
+            swapCost, candidate = self._bestAddition(self._closest(others), others)
+            if swapCost < cost and (best is None or swapCost < best[0]):
+                best = (swapCost, slot, candidate)
+        return best
+
+    def _cost(self, columns):
+        primary, secondary = self._score(self._closest(columns)[:, None])
+        return int(primary[0]), int(secondary[0])
+
+    def _describe(self, chosen, iterations, stoppedBy, elapsed):
+        closest = np.full(len(self.tenants), self.unreachable, dtype=np.int32)
+        closest[self.reachable] = self._closest(chosen)
+        served = closest < self.unreachable
+        bins = [tuple(self.candidates[column].tolist()) for column in chosen]
+        return {
+            "bins": bins,
+            "total": int(closest[served].sum()),
+            "worst": int(closest[served].max()) if served.any() else 0,
+            "mean": float(closest[served].mean()) if served.any() else 0.0,
+            "distances": {str(list(tenant)): int(d) if ok else -1 for tenant, d, ok in zip(self.tenants, closest, served)},
+            "unreachable": [tenant for tenant, ok in zip(self.tenants, self.reachable) if not ok],
+            "iterations": iterations,
+            "stoppedBy": stoppedBy,
+            "elapsed": elapsed,
+        }
+
+    def requestGrid(self, bins):
+        """
+        Returns a copy of the grid with the given bins placed
+        """
+        grid = self.grid.copy()
+        for x, y in bins:
+            grid[y, x] = BIN
+        return grid
@@ -0,0 +1,253 @@
+import numpy as np
+
+from src.utils.distanceField import distanceField
+# scipy.sparse is imported inside the methods that search the abstract graph, it is slow to load
+
+
+class clusterGraph():
+    # Openings between two clusters longer than this get an entrance at both ends instead of one in the middle
+    WIDE_OPENING = 6
+
+    def __init__(self, passable, clusterSize=64):
+        """
+        Abstract graph for hierarchical routing on large grids.
+
+        The grid is split into clusterSize x clusterSize clusters. Every opening between two neighbouring
+        clusters gets entrance cells on both sides, and the distance between every pair of entrances of
+        the same cluster is measured once. Routes are then searched on this small graph and only the
+        clusters a route passes through are searched cell by cell.
+
+        Args:
+            passable (np.ndarray): Boolean (rows, cols) array of the cells a route may go through
+            clusterSize (int): Side of a cluster in cells, larger clusters mean fewer nodes but
+            more expensive searches inside each cluster
+        """
+        if clusterSize < 2:
+            raise ValueError("clusterSize has to be at least 2")
+        self.passable = np.asarray(passable, dtype=bool)
+        self.clusterSize = clusterSize
+        rows, cols = self.passable.shape
+        self.clusterCols = -(-cols // clusterSize)
+        self.clusterRows = -(-rows // clusterSize)
+        self.nodes, transitions = self._findEntrances()
+        self.nodeCluster = self.clusterOf(self.nodes[:, 0], self.nodes[:, 1])
+        self.edges = np.concatenate((transitions, self._linkEntrances())) if len(self.nodes) else np.zeros((0, 3), np.int64)
+        self._fields = {}
+
+    def clusterOf(self, x, y):
+        return (y // self.clusterSize) * self.clusterCols + x // self.clusterSize
+
+    def clusterBounds(self, cluster):
+        """
+        Returns (left, top, right, bottom) of a cluster, right and bottom exclusive
+        """
+        rows, cols = self.passable.shape
+        top, left = divmod(int(cluster), self.clusterCols)
+        left *= self.clusterSize
+        top *= self.clusterSize
+        return left, top, min(left + self.clusterSize, cols), min(top + self.clusterSize, rows)
+
+    def _findEntrances(self):
+        """
+        Walks every border between two clusters and places the entrance cells of each opening
+
+        Returns (nodes, transitions): the (x, y) entrance cells and the (node, node, 1) edges crossing the borders
+        """
+        size = self.clusterSize
+        rows, cols = self.passable.shape
+        pairs = []
+        for x in range(size, cols, size):
+            for start, end in self._openings(self.passable[:, x - 1] & self.passable[:, x]):
+                pairs.extend(((x - 1, y), (x, y)) for y in self._entranceSpots(start, end))
+        for y in range(size, rows, size):
+            for start, end in self._openings(self.passable[y - 1, :] & self.passable[y, :]):
+                pairs.extend(((x, y - 1), (x, y)) for x in self._entranceSpots(start, end))
+        if not pairs:
+            return np.zeros((0, 2), dtype=np.int64), np.zeros((0, 3), dtype=np.int64)
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2, 2)
+        nodes, inverse = np.unique(pairs.reshape(-1, 2), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1, 2)
+        transitions = np.column_stack((inverse, np.ones(len(inverse), dtype=np.int64)))
+        return nodes, transitions
+
+    def _openings(self, open):
+        """
+        Returns (start, end) of every run of open cells along a border, end inclusive.
+        Runs are also cut where the border moves on to the next pair of clusters
+        """
+        cut = np.zeros(len(open) + 1, dtype=bool)
+        cut[::self.clusterSize] = True
+        padded = np.concatenate(([False], open, [False]))
+        starts = np.flatnonzero(padded[1:-1] & (~padded[:-2] | cut[:-1]))
+        ends = np.flatnonzero(padded[1:-1] & (~padded[2:] | cut[1:]))
+        return zip(starts.tolist(), ends.tolist())
+
+    def _entranceSpots(self, start, end):
+        if end - start + 1 > self.WIDE_OPENING:
+            return (start, end)
+        return ((start + end) // 2,)
+
+    def _linkEntrances(self):
+        """
+        Measures the distance between every pair of entrances of the same cluster.
+
+        The clusters are laid out with a wall line between them, so one search over the whole grid
+        can run inside every cluster at once without leaking into its neighbours. Search r seeds the
+        r-th entrance of every cluster, so the number of searches is the most entrances any cluster has.
+
+        Returns the (node, node, distance) edges
+        """
+        size = self.clusterSize
+        rows, cols = self.passable.shape
+        padded = np.zeros((self.clusterRows * size, self.clusterCols * size), dtype=bool)
+        padded[:rows, :cols] = self.passable
+        blocks = padded.reshape(self.clusterRows, size, self.clusterCols, size)
+        blocks = np.pad(blocks, ((0, 0), (0, 1), (0, 0), (0, 1)))
+        separated = blocks.reshape(self.clusterRows * (size + 1), self.clusterCols * (size + 1))
+
+        xs, ys = self.nodes[:, 0], self.nodes[:, 1]
+        order = np.argsort(self.nodeCluster, kind="stable")
+        sortedClusters = self.nodeCluster[order]
+        firsts = np.searchsorted(sortedClusters, sortedClusters)
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order)) - firsts
+        cellXs, cellYs = xs + xs // size, ys + ys // size
+        cells = list(zip(cellXs.tolist(), cellYs.tolist()))
+
+        edges = []
+        sourceOf = np.full(self.clusterRows * self.clusterCols, -1, dtype=np.int64)
+        for level in range(int(rank.max()) + 1):
+            seeds = np.flatnonzero(rank == level)
+            field = distanceField(separated, [cells[seed] for seed in seeds], parents=False)
+            sourceOf[:] = -1
+            sourceOf[self.nodeCluster[seeds]] = seeds
+            source = sourceOf[self.nodeCluster]
+            # Each pair is measured once, from its lower ranked entrance
+            targets = np.flatnonzero((source >= 0) & (rank > level))
+            dist = field.dist[(cellYs[targets] + 1) * field.stride + cellXs[targets] + 1]
+            reached = dist >= 0
+            edges.append(np.column_stack((source[targets][reached], targets[reached], dist[reached])))
+        return np.concatenate(edges).astype(np.int64)
+
+    def _clusterField(self, cluster, sources):
+        """
+        Searches one cluster from the given (x, y) cells
+
+        Returns (field, left, top), the field works in the cluster's own coordinates
+        """
+        left, top, right, bottom = self.clusterBounds(cluster)
+        field = distanceField(self.passable[top:bottom, left:right], [(x - left, y - top) for x, y in sources])
+        return field, left, top
+
+    def _localRoute(self, fieldInfo, cell):
+        """
+        Returns the route from cell to the closest source of a cluster field, in grid coordinates
+        """
+        field, left, top = fieldInfo
+        return [(x + left, y + top) for x, y in field.routeFrom((cell[0] - left, cell[1] - top))]
+
+    def _localDistance(self, fieldInfo, cells):
+        field, left, top = fieldInfo
+        return field.dist[[field.index((x - left, y - top)) for x, y in cells]]
+
+    def routeToClosest(self, starts, targets):
+        """
+        Routes every start cell to its closest target through the abstract graph.
+
+        Args:
+            starts (list[tuple[int, int]]): (x, y) cells the routes begin at, they do not have to be passable
+            targets (list[tuple[int, int]]): (x, y) passable cells the routes may end at
+
+        Returns {start: [(x, y), ...]} with both ends included, an empty list when no target can be reached
+        """
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import dijkstra
+
+        nodeCount = len(self.nodes)
+        superSource = nodeCount
+        targetsByCluster = {}
+        for cell in targets:
+            targetsByCluster.setdefault(int(self.clusterOf(cell[0], cell[1])), []).append(tuple(cell))
+        targetFields = {cluster: self._clusterField(cluster, cells) for cluster, cells in targetsByCluster.items()}
+
+        # Every target cluster joins its entrances to one extra node, so a single search covers all targets
+        exits = [self.edges]
+        for cluster, fieldInfo in targetFields.items():
+            nodes = np.flatnonzero(self.nodeCluster == cluster)
+            dist = self._localDistance(fieldInfo, self.nodes[nodes].tolist()) if len(nodes) else np.zeros(0)
+            reached = dist >= 0
+            exits.append(np.column_stack((np.full(reached.sum(), superSource), nodes[reached], dist[reached])))
+        edges = np.concatenate(exits).astype(np.int64)
+        # A target sitting on an entrance gives a zero weight, which a sparse matrix would drop, so it gets a tiny one
+        weights = np.where(edges[:, 2] > 0, edges[:, 2], 1e-6)
+        graph = coo_matrix((weights, (edges[:, 0], edges[:, 1])), shape=(nodeCount + 1, nodeCount + 1)).tocsr()
+        abstract, predecessors = dijkstra(graph, directed=False, indices=superSource, return_predecessors=True)
+        abstract = np.where(np.isfinite(abstract), np.round(abstract), np.inf)
+
+        routes = {}
+        for start in starts:
+            routes[tuple(start)] = self._routeFrom(tuple(start), abstract, predecessors, superSource, targetFields)
+        return routes
+
+    def _routeFrom(self, start, abstract, predecessors, superSource, targetFields):
+        """
+        Picks the best way out of the start's cluster and refines the abstract route into cells
+        """
+        rows, cols = self.passable.shape
+        x, y = start
+        # The start is searched in its own cluster, open neighbours across a border each get their own search
+        seeds = [(start, 0)]
+        startCluster = int(self.clusterOf(x, y))
+        for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < cols and 0 <= ny < rows and self.passable[ny, nx] and self.clusterOf(nx, ny) != startCluster:
+                seeds.append(((nx, ny), 1))
+
+        best = None
+        for seed, offset in seeds:
+            cluster = int(self.clusterOf(seed[0], seed[1]))
+            fieldInfo = self._clusterField(cluster, [seed])
+            nodes = np.flatnonzero(self.nodeCluster == cluster)
+            if len(nodes):
+                dist = self._localDistance(fieldInfo, self.nodes[nodes].tolist())
+                usable = (dist >= 0) & np.isfinite(abstract[nodes])
+                if usable.any():
+                    total = np.where(usable, dist + abstract[nodes], np.inf)
+                    choice = int(np.argmin(total))
+                    if best is None or total[choice] + offset < best[0]:
+                        best = (total[choice] + offset, seed, fieldInfo, int(nodes[choice]))
+            if cluster in targetFields:
+                # A target in the same cluster can be reached without leaving it
+                targetInfo = targetFields[cluster]
+                direct = targetInfo[0].distanceAt((seed[0] - targetInfo[1], seed[1] - targetInfo[2]))
+                if direct >= 0 and (best is None or direct + offset < best[0]):
+                    best = (direct + offset, seed, targetInfo, None)
+        if best is None:
+            return []
+
+        _, seed, fieldInfo, node = best
+        path = [start] if seed != start else []
+        if node is None:
+            return path + self._localRoute(fieldInfo, seed)
+        # fieldInfo was seeded at the start, so the route to the first entrance is read backwards
+        path += self._localRoute(fieldInfo, tuple(self.nodes[node].tolist()))[::-1]
+        while True:
+            parent = int(predecessors[node])
+            cell = tuple(self.nodes[node].tolist())
+            if parent == superSource:
+                path += self._localRoute(targetFields[int(self.nodeCluster[node])], cell)[1:]
+                return path
+            nextCell = tuple(self.nodes[parent].tolist())
+            if self.nodeCluster[parent] != self.nodeCluster[node]:
+                path.append(nextCell)
+            else:
+                path += self._localRoute(self._entranceField(parent), cell)[1:]
+            node = parent
+
+    def _entranceField(self, node):
+        """
+        Cluster field seeded at one entrance, kept since many routes leave through the same entrances
+        """
+        if node not in self._fields:
+            self._fields[node] = self._clusterField(int(self.nodeCluster[node]), [tuple(self.nodes[node].tolist())])
+        return self._fields[node]
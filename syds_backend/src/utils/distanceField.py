@@ -0,0 +1,146 @@
+import numpy as np
+
+EMPTY = 0
+TENANT = 1
+BIN = 2
+WALL = 3
+
+# Same order gridSolver._bfs explores in: Left, Right, Up, Down
+DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+class distanceField():
+    """
+    Multi-source breadth first search over a numpy grid.
+
+    The grid is padded with a one cell wall so neighbours can be found with flat index
+    offsets without any bounds checks. Every cell stores its distance to the closest source
+    and a parent pointer (index into DIRECTIONS) towards it.
+    """
+    def __init__(self, passable, sources, parents=True):
+        """
+        Args:
+            passable (np.ndarray): Boolean (rows, cols) array of the cells a route may go through
+            sources (list[tuple[int, int]]): (x, y) cells the search is seeded from
+            parents (bool): False only measures distances, routeFrom can not be used then
+        """
+        rows, cols = passable.shape
+        self.shape = (rows, cols)
+        self.stride = cols + 2
+        self.offsets = np.array([dx + dy * self.stride for dx, dy in DIRECTIONS], dtype=np.int64)
+
+        self.passable = np.zeros((rows + 2, cols + 2), dtype=bool)
+        self.passable[1:-1, 1:-1] = passable
+        self.passable = self.passable.ravel()
+
+        self.sources = list(sources)
+        self.dist = self._search()
+        self.parent = self._findParents() if parents else None
+
+    @classmethod
+    def fromGrid(cls, grid):
+        """
+        Builds the field used for tenant routing, seeded from every bin in the grid.
+        Tenants and walls can not be walked through.
+        """
+        grid = np.asarray(grid)
+        passable = (grid != WALL) & (grid != TENANT)
+        ys, xs = np.nonzero(grid == BIN)
+        return cls(passable, list(zip(xs.tolist(), ys.tolist())))
+
+    def index(self, cell):
+        """
+        Returns the flat index of an (x, y) cell in the padded grid
+        """
+        return (cell[1] + 1) * self.stride + cell[0] + 1
+
+    def cell(self, index):
+        """
+        Returns the (x, y) cell of a flat index in the padded grid
+        """
+        y, x = divmod(int(index), self.stride)
+        return (x - 1, y - 1)
+
+    def _search(self):
+        """
+        Level synchronous BFS, each level is expanded as one numpy operation.
+
+        Returns the flat distance array, -1 for cells that can not reach a source
+        """
+        dist = np.full(self.passable.shape, -1, dtype=np.int32)
+        if not self.sources:
+            return dist
+        frontier = np.unique(np.array([self.index(s) for s in self.sources], dtype=np.int64))
+        dist[frontier] = 0
+        level = 0
+        while frontier.size:
+            level += 1
+            neighbours = (frontier[:, None] + self.offsets[None, :]).ravel()
+            neighbours = neighbours[self.passable[neighbours] & (dist[neighbours] < 0)]
+            frontier = np.unique(neighbours)
+            dist[frontier] = level
+        return dist
+
+    def _findParents(self):
+        """
+        Points every reached cell at the first neighbour (in DIRECTIONS order) that is one step
+        closer to a source. Following these pointers gives the same path a BFS started from the
+        cell itself would return.
+        """
+        parent = np.full(self.dist.shape, -1, dtype=np.int8)
+        inner = np.arange(self.stride + 1, self.dist.size - self.stride - 1)
+        self._pointParents(parent, inner)
+        return parent
+
+    def _pointParents(self, parent, indices):
+        """
+        Recomputes the parent pointers of the given flat indices in place
+        """
+        parent[indices] = -1
+        reached = indices[self.dist[indices] > 0]
+        # Walk the directions backwards so the first matching direction is written last
+        for direction in reversed(range(len(DIRECTIONS))):
+            step = reached + self.offsets[direction]
+            closer = self.dist[step] == self.dist[reached] - 1
+            parent[reached[closer]] = direction
+
+    def distanceAt(self, cell):
+        """
+        Returns the number of steps from cell to the closest source, -1 if there is none.
+        Cells that are not passable themselves (like tenants) are measured through their neighbours.
+        """
+        index = self.index(cell)
+        if self.dist[index] >= 0:
+            return int(self.dist[index])
+        steps = self.dist[index + self.offsets]
+        steps = steps[steps >= 0]
+        if steps.size == 0:
+            return -1
+        return int(steps.min()) + 1
+
+    def routeFrom(self, cell):
+        """
+        Rebuilds the route from cell to its closest source by following the parent pointers.
+
+        Returns a list of (x, y) tuples including both ends, empty if no source can be reached
+        """
+        index = self.index(cell)
+        if self.dist[index] < 0:
+            # Start cell is not part of the field (e.g. a tenant), take the first closest neighbour
+            steps = self.dist[index + self.offsets]
+            candidates = np.flatnonzero(steps >= 0)
+            if candidates.size == 0:
+                return []
+            best = steps[candidates].min()
+            direction = candidates[np.argmax(steps[candidates] == best)]
+            path = [tuple(cell)]
+            index = index + int(self.offsets[direction])
+        else:
+            path = []
+
+        while True:
+            path.append(self.cell(index))
+            direction = self.parent[index]
+            if direction < 0:
+                return path
+            index += int(self.offsets[direction])
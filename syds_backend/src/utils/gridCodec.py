@@ -0,0 +1,122 @@
+import base64
+
+import numpy as np
+
+from src.utils.distanceField import WALL
+
+ROUTE_FORMATS = ("cells", "runs", "corners")
+
+# Letter used for each single step in the "runs" route format
+STEP_LETTERS = {(-1, 0): "L", (1, 0): "R", (0, -1): "U", (0, 1): "D"}
+
+
+def decodeGrid(data):
+    """
+    Reads the grid out of a /findRoutes JSON body. Any one of these keys may be used:
+        "grid": nested list of ints, one list per row
+        "gridBytes": base64 of the uint8 cells in row order, with "shape": [rows, cols]
+        "gridRle": one list per row of alternating [value, count, value, count, ...]
+
+    Returns the grid as a (rows, cols) uint8 numpy array, raises ValueError for anything that is not a
+    rectangular grid of the cell values 0 to 3
+    """
+    if data.get("gridBytes") is not None:
+        return decodeRawGrid(base64.b64decode(data["gridBytes"]), data.get("shape"))
+    if data.get("gridRle") is not None:
+        return decodeRleGrid(data["gridRle"])
+    grid = data.get("grid")
+    if not grid or not isinstance(grid, list):
+        raise ValueError("grid has to be a nested list of ints")
+    try:
+        grid = np.array(grid)
+    except ValueError:
+        raise ValueError("Grid rows have to be the same length")
+    if grid.ndim != 2:
+        raise ValueError("Grid rows have to be the same length")
+    return _checkCells(grid)
+
+
+def _checkCells(grid):
+    """
+    Returns the grid as uint8 after checking every cell is an int from 0 (empty) to 3 (wall)
+    """
+    if grid.dtype.kind not in "iu":
+        raise ValueError("Grid cells have to be ints")
+    if grid.size and (grid.min() < 0 or grid.max() > WALL):
+        raise ValueError(f"Grid cells have to be between 0 and {WALL}")
+    return grid.astype(np.uint8, copy=False)
+
+
+def decodeRawGrid(raw, shape):
+    """
+    Decodes raw uint8 cells in row order, shape is [rows, cols] or a "rows,cols" header string
+
+    Returns the grid as a (rows, cols) uint8 numpy array, sharing memory with raw
+    """
+    if isinstance(shape, str):
+        shape = shape.split(",")
+    if not isinstance(shape, (list, tuple)) or len(shape) != 2:
+        raise ValueError("Raw grids need a [rows, cols] shape")
+    try:
+        rows, cols = int(shape[0]), int(shape[1])
+    except TypeError:
+        raise ValueError("Raw grids need a [rows, cols] shape")
+    if rows * cols != len(raw) or rows <= 0:
+        raise ValueError(f"Expected {rows * cols} bytes for a {rows}x{cols} grid, got {len(raw)}")
+    return _checkCells(np.frombuffer(raw, dtype=np.uint8).reshape(rows, cols))
+
+
+def decodeRleGrid(rows):
+    """
+    Decodes run length rows, each row being [value, count, value, count, ...]
+
+    Returns the grid as a (rows, cols) uint8 numpy array
+    """
+    if not isinstance(rows, list):
+        raise ValueError("gridRle has to be a list of rows")
+    decoded = []
+    for row in rows:
+        try:
+            pairs = np.asarray(row, dtype=np.int64).reshape(-1, 2)
+        except (TypeError, OverflowError):
+            raise ValueError("Run length rows have to hold ints")
+        if (pairs[:, 1] < 0).any():
+            raise ValueError("Run lengths can not be negative")
+        decoded.append(np.repeat(_checkCells(pairs[:, 0]), pairs[:, 1]))
+    if not decoded or len({len(row) for row in decoded}) != 1:
+        raise ValueError("Run length rows have to decode to the same width")
+    return np.stack(decoded)
+
+
+def encodeRoute(path, routeFormat="cells"):
+    """
+    Converts one route (list of (x, y) cells) into the requested format:
+        "cells": the route unchanged
+        "runs": {"start": [x, y], "runs": "R12D3L4"}, a letter per direction followed by its step count
+        "corners": [[x, y], ...] only the start, end and cells where the route turns
+    """
+    if routeFormat == "cells" or not path:
+        return path
+    cells = np.asarray(path, dtype=np.int64)
+    steps = np.diff(cells, axis=0)
+    # A new run starts wherever the step direction differs from the previous one
+    turns = np.flatnonzero(np.any(steps[1:] != steps[:-1], axis=1)) + 1
+    if routeFormat == "corners":
+        keep = np.concatenate(([0], turns, [len(cells) - 1])) if len(cells) > 1 else [0]
+        return cells[keep].tolist()
+    if routeFormat == "runs":
+        starts = np.concatenate(([0], turns))
+        lengths = np.diff(np.concatenate((starts, [len(steps)])))
+        runs = "".join(f"{STEP_LETTERS[tuple(steps[start])]}{length}"
+                       for start, length in zip(starts.tolist(), lengths.tolist()) if length)
+        return {"start": cells[0].tolist(), "runs": runs}
+    raise ValueError(f"Unknown route format: {routeFormat}")
+
+
+def encodeRoutes(routes, routeFormat="cells"):
+    """
+    Applies encodeRoute to every route of a gridSolver style {tenant: path} dict
+    """
+    if routeFormat not in ROUTE_FORMATS:
+        raise ValueError(f"Unknown route format: {routeFormat}")
+    return {tenant: encodeRoute(path, routeFormat) for tenant, path in routes.items()}
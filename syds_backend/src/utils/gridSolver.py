@@ -1,22 +1,39 @@
 from collections import deque
 
+import numpy as np
+
+from src.utils.clusterGraph import clusterGraph
+from src.utils.distanceField import distanceField, TENANT, WALL
+
 class gridSolver:
-    def __init__(self, grid):
+    MODES = ("distanceField", "bfs", "hierarchical")
+
+    def __init__(self, grid, mode="distanceField", clusterSize=64):
         """
         Initializes the grid solver
 
         Args:
-            grid (list[list[int]]): The grid configuration of any given floor
+            grid (list[list[int]] | np.ndarray): The grid configuration of any given floor
             The python thinks the following ints corresponds to the following objects
             0: Empty space
             1: Tenant
             2: Bin
             3: Wall
+            mode (str): "distanceField" runs one search seeded from every bin and rebuilds each
+            tenant's route from it, "bfs" runs a separate search from every tenant.
+            Both return the same routes. "hierarchical" routes over a graph of clusterSize x clusterSize
+            clusters and only searches the clusters a route passes through cell by cell, for very large
+            grids. Its routes can be a few steps longer than the shortest ones.
+            clusterSize (int): Cluster side used by the hierarchical mode
         """
-        print(grid)
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown routing mode: {mode}")
         self.grid = grid
+        self.mode = mode
+        self.clusterSize = clusterSize
         self.tenants = self._findTenants()
         self.bins = self._findBins()
+        self.field = None
         self.routes = self.findTenantRoutes()
 
     def _findBins(self):
@@ -30,12 +47,9 @@ class gridSolver:
         return indexes
 
     def _findGridItem(self, int):
-        items =[]
-        for (col, i) in enumerate(self.grid):
-            for (row, index) in enumerate(i):
-                if index == int:
-                    items.append((row, col))
-        return items
+        # Row by row, same order as walking the nested lists
+        rows, cols = np.nonzero(np.asarray(self.grid) == int)
+        return list(zip(cols.tolist(), rows.tolist()))
     
     def _bfs(self, start):
         """Finds the shortest path from start (tenant) to the nearest bin using BFS"""
@@ -73,6 +87,10 @@ class gridSolver:
         Returns:
             dict: {tenant_position: shortest_path_to_bin}
         """
+        if self.mode == "distanceField":
+            return self.findTenantRoutesFromField()
+        if self.mode == "hierarchical":
+            return self.findTenantRoutesHierarchical()
         tenant_routes = {}
         for tenant in self.tenants:
             path = self._bfs(tenant)
@@ -80,6 +98,32 @@ class gridSolver:
         # print(tenant_routes)
         return {str(list(k)): v for k, v in tenant_routes.items()}  # Convert keys to lists
 
+    def findTenantRoutesFromField(self):
+        """
+        Same result as findTenantRoutes, but from a single distance field seeded at every bin.
+        Each route is rebuilt by following parent pointers, so it costs only its own length.
+
+        Returns:
+            dict: {tenant_position: shortest_path_to_bin}
+        """
+        if self.field is None:
+            self.field = distanceField.fromGrid(self.grid)
+        tenant_routes = {}
+        for tenant in self.tenants:
+            tenant_routes[tenant] = self.field.routeFrom(tenant)
+        return {str(list(k)): v for k, v in tenant_routes.items()}
+
+    def findTenantRoutesHierarchical(self):
+        """
+        Routes every tenant to its closest bin over the cluster graph, see clusterGraph
+
+        Returns:
+            dict: {tenant_position: path_to_bin}
+        """
+        grid = np.asarray(self.grid)
+        graph = clusterGraph((grid != WALL) & (grid != TENANT), self.clusterSize)
+        tenant_routes = graph.routeToClosest(self.tenants, self.bins)
+        return {str(list(k)): v for k, v in tenant_routes.items()}
 
 
 
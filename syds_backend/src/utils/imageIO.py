@@ -0,0 +1,80 @@
+import os
+
+import cv2
+import numpy as np
+
+
+def loadImage(source, flags=cv2.IMREAD_COLOR):
+    """
+    Helper function used to turn any image source into a numpy array.
+
+    Args:
+        source: a numpy array (returned as is), the encoded file as bytes / bytearray / memoryview,
+        or a path to the file
+
+    Returns the decoded image, None if it could not be decoded
+    """
+    if isinstance(source, np.ndarray):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return cv2.imdecode(np.frombuffer(source, np.uint8), flags)
+    return cv2.imread(os.fspath(source), flags)
+
+
+def describeSource(source):
+    """
+    Short name for a source in log messages, so raw bytes never get printed
+    """
+    if isinstance(source, np.ndarray):
+        return f"array {source.shape}"
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return f"{len(source)} bytes"
+    return str(source)
+
+
+# Media type of every binary format the endpoints can send back
+IMAGE_FORMATS = {"png": "image/png", "webp": "image/webp"}
+
+
+def makeTransparent(image, color=(0, 0, 0)):
+    """
+    Helper function used to add an alpha channel that hides every pixel of the given color.
+
+    Only the BGRA output is allocated, the mask comes from cv2.inRange on the input instead of
+    a full image comparison. Images that already have an alpha channel are updated in place.
+
+    Returns the BGRA image
+    """
+    color = tuple(color)
+    if image.shape[2] == 3:  # If the image is RGB
+        mask = cv2.inRange(image, color, color)
+        transparent = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+    else:
+        mask = cv2.inRange(image, color + (0,), color + (255,))
+        transparent = image
+    # Set the alpha channel to 0 for the matching pixels and leave the rest as it was
+    transparent[:, :, 3] &= cv2.bitwise_not(mask)
+    return transparent
+
+
+def encodeImage(image, imageFormat="png", compression=None):
+    """
+    Helper function used to encode a numpy array as a lossless image file.
+
+    Args:
+        imageFormat (str): "png" or "webp" (always written lossless, although WebP does not keep
+        the color of fully transparent pixels)
+        compression (int): PNG compression level 0 (fastest) to 9 (smallest), None keeps OpenCV's default
+
+    Returns the encoded bytes, None if encoding failed
+    """
+    if imageFormat == "webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, 101]  # Anything above 100 is lossless
+    elif imageFormat == "png":
+        params = [] if compression is None else [cv2.IMWRITE_PNG_COMPRESSION, int(compression)]
+    else:
+        raise ValueError(f"Unknown image format: {imageFormat}")
+    success, encodedImage = cv2.imencode(f".{imageFormat}", image, params)
+    if not success:
+        return None
+    return encodedImage.tobytes()
@@ -0,0 +1,236 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from src.utils.workerPool import jobCancelled, progressChannel, progressReporter, submitTask
+
+# A job is finished once it reaches one of these
+FINISHED = ("done", "failed", "cancelled")
+
+
+class jobQueue():
+    def __init__(self, path, keepJobs=100):
+        """
+        Runs the heavy endpoints as background jobs on the worker pool and keeps their state in sqlite,
+        so a finished result can still be fetched after the page that started it was reloaded.
+
+        A job goes queued -> running -> done, failed or cancelled. While running every floor reports
+        the stage it is on, see the progress argument of floorPlanExtractor, mapCropper and processNumpy.
+
+        Args:
+            path (str): sqlite database file, ":memory:" keeps the jobs for the life of the process only
+            keepJobs (int): Finished jobs kept before the oldest ones are deleted
+        """
+        self.keepJobs = keepJobs
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY, kind TEXT, status TEXT, floors TEXT, error TEXT,
+            result TEXT, created REAL, updated REAL)""")
+        # Jobs that were still going when the server stopped will never finish
+        self.db.execute("UPDATE jobs SET status = 'failed', error = 'Interrupted by a server restart', updated = ? "
+                        "WHERE status IN ('queued', 'running')", (time.time(),))
+        self.db.commit()
+        self.tasks = {}
+        self.subscribers = {}
+        self.events = None
+        self.cancelled = None
+        self.loop = None
+        self.listener = None
+
+    def start(self):
+        """
+        Opens the progress channel to the workers, has to be called from the running event loop
+        """
+        self.loop = asyncio.get_running_loop()
+        self.events, self.cancelled = progressChannel()
+        self.listener = threading.Thread(target=self._listen, daemon=True)
+        self.listener.start()
+
+    def stop(self):
+        for task in self.tasks.values():
+            task.cancel()
+        if self.events is not None:
+            self.events.put(None)
+        if self.listener is not None:
+            self.listener.join(timeout=1)
+
+    def submit(self, kind, floorCount, task, args, finish=None, cleanup=None):
+        """
+        Queues task(*args, progress=...) on the worker pool
+
+        Args:
+            kind (str): Name of the endpoint the job stands for
+            floorCount (int): Floors the job reports progress for
+            finish (callable): Turns the task's return value into the stored result, runs in the server process
+            cleanup (callable): Called once the job has finished whatever the outcome, e.g. to remove temp files
+
+        Returns the job ID
+        """
+        jobId = self._insert(kind, floorCount, "queued")
+        self.tasks[jobId] = asyncio.create_task(self._run(jobId, task, args, finish, cleanup))
+        return jobId
+
+    def complete(self, kind, floorCount, result):
+        """
+        Stores a job that is already done, for results that were found in the cache
+
+        Returns the job ID
+        """
+        return self._insert(kind, floorCount, "done", result)
+
+    def _insert(self, kind, floorCount, status, result=None):
+        jobId = uuid.uuid4().hex
+        now = time.time()
+        stage = "done" if status == "done" else "queued"
+        floors = [{"floor": index, "stage": stage} for index in range(floorCount)]
+        with self.lock:
+            self.db.execute("INSERT INTO jobs (id, kind, status, floors, result, created, updated) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (jobId, kind, status, json.dumps(floors),
+                             None if result is None else json.dumps(result), now, now))
+            self._trim()
+            self.db.commit()
+        return jobId
+
+    async def _run(self, jobId, task, args, finish, cleanup):
+        future = submitTask(_runJob, task, args, progressReporter(self.events, self.cancelled, jobId))
+        # A cancelled job's worker only stops at its next stage, so the cancel flag and the job's files
+        # have to stay until the worker is really done with them, not just until the job is marked cancelled
+        future.add_done_callback(lambda _: self._release(jobId, cleanup))
+        try:
+            self._update(jobId, status="running")
+            result = await asyncio.wrap_future(future)
+            if finish is not None:
+                result = finish(result)
+            self._update(jobId, status="done", result=json.dumps(result), stage="done")
+        except (asyncio.CancelledError, jobCancelled):
+            future.cancel()
+            self._update(jobId, status="cancelled")
+        except Exception as e:
+            self._update(jobId, status="failed", error=str(e))
+        finally:
+            self.tasks.pop(jobId, None)
+
+    def _release(self, jobId, cleanup):
+        """
+        Runs once the job's task has finished in its worker (or was dropped before it started)
+        """
+        if cleanup is not None:
+            cleanup()
+        self.cancelled.pop(jobId, None)
+
+    def cancel(self, jobId):
+        """
+        Cancels a queued or running job. A running task stops at the start of its next stage.
+
+        Returns False if the job does not exist or has already finished
+        """
+        job = self.get(jobId)
+        if job is None or job["status"] in FINISHED:
+            return False
+        self.cancelled[jobId] = True
+        task = self.tasks.get(jobId)
+        if task is not None:
+            task.cancel()
+        return True
+
+    def get(self, jobId):
+        """
+        Returns the status of a job without its result, None if it does not exist
+        """
+        with self.lock:
+            row = self.db.execute("SELECT id, kind, status, floors, error, created, updated FROM jobs WHERE id = ?",
+                                  (jobId,)).fetchone()
+        return None if row is None else self._describe(row)
+
+    def list(self, limit=20):
+        """
+        Returns the most recent jobs, newest first
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT id, kind, status, floors, error, created, updated FROM jobs "
+                                   "ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+        return [self._describe(row) for row in rows]
+
+    def result(self, jobId):
+        """
+        Returns the result of a finished job, None if it has none
+        """
+        with self.lock:
+            row = self.db.execute("SELECT result FROM jobs WHERE id = ?", (jobId,)).fetchone()
+        return None if row is None or row[0] is None else json.loads(row[0])
+
+    def subscribe(self, jobId):
+        """
+        Returns an asyncio.Queue that receives the job status after every change,
+        hand it back to unsubscribe once done
+        """
+        updates = asyncio.Queue()
+        self.subscribers.setdefault(jobId, []).append(updates)
+        return updates
+
+    def unsubscribe(self, jobId, updates):
+        waiting = self.subscribers.get(jobId, [])
+        if updates in waiting:
+            waiting.remove(updates)
+        if not waiting:
+            self.subscribers.pop(jobId, None)
+
+    def _describe(self, row):
+        jobId, kind, status, floors, error, created, updated = row
+        return {"jobId": jobId, "kind": kind, "status": status, "floors": json.loads(floors),
+                "error": error, "created": created, "updated": updated}
+
+    def _update(self, jobId, status=None, error=None, result=None, stage=None, floor=None):
+        """
+        Writes a change to the database and passes the new status on to the subscribers.
+        stage with a floor moves that floor on, stage without one moves every floor
+        """
+        with self.lock:
+            row = self.db.execute("SELECT status, floors FROM jobs WHERE id = ?", (jobId,)).fetchone()
+            if row is None or row[0] in FINISHED:
+                return
+            floors = json.loads(row[1])
+            if stage is not None:
+                for entry in floors:
+                    if floor is None or entry["floor"] == floor:
+                        entry["stage"] = stage
+            self.db.execute("UPDATE jobs SET status = ?, floors = ?, error = ?, result = ?, updated = ? WHERE id = ?",
+                            (status or row[0], json.dumps(floors), error, result, time.time(), jobId))
+            self.db.commit()
+        self._notify(jobId)
+
+    def _notify(self, jobId):
+        if jobId not in self.subscribers:
+            return
+        job = self.get(jobId)
+        for updates in self.subscribers.get(jobId, []):
+            updates.put_nowait(job)
+
+    def _listen(self):
+        """
+        Moves the progress events from the workers into the database, runs on its own thread
+        """
+        while True:
+            event = self.events.get()
+            if event is None:
+                return
+            jobId, floor, stage = event
+            # The subscribers' queues belong to the event loop, so the update is handed over to it
+            self.loop.call_soon_threadsafe(self._update, jobId, None, None, None, stage, floor)
+
+    def _trim(self):
+        finished = self.db.execute("SELECT id FROM jobs WHERE status IN ('done', 'failed', 'cancelled') "
+                                   "ORDER BY created DESC LIMIT -1 OFFSET ?", (self.keepJobs,)).fetchall()
+        self.db.executemany("DELETE FROM jobs WHERE id = ?", finished)
+
+
+def _runJob(task, args, progress):
+    """
+    Runs in the worker, the job's progress reporter is passed on to the task
+    """
+    return task(*args, progress=progress)
@@ -1,57 +1,98 @@
 import cv2
-import numpy as np
-from matplotlib import pyplot as plt
-import os
 import base64
 
+from src.utils.imageIO import encodeImage, makeTransparent, loadImage
+from src.utils.regionRaster import rasterizeRegions, regionStats
+
 class mapCropper():
-    def __init__(self, rawImages, regions):
+    def __init__(self, rawImages, regions, progress=None):
+        """
+        Args:
+            rawImages (list): One source per floor, either a numpy array, the encoded file bytes or a file path
+            regions (dict): {floor index: [region points, ...]} of the regions to cut out of each floor
+            progress (callable): Called as progress(floor index, stage name) whenever a floor starts a stage
+        """
         self.rawImages = rawImages
         self.regions = regions
+        self.progress = progress
         self.extractedWalways = None
+        self.labelMaps = None
 
 
     def requestWalkways(self):
         if self.extractedWalways is None:
             self.batchExtractWalkWays()
         exported = []
-        for image in self.extractedWalways:
+        for index, image in enumerate(self.extractedWalways):
+            self._report(index, "encode")
             image = self._makeTransparent(image)
             b64_image = self._imageToBase64(image, ext='.png')
             exported.append(b64_image)
         return exported
 
+    def requestEncodedWalkways(self, imageFormat="png", compression=None):
+        """
+        Returns the walkways as a list of encoded image bytes ("png" or "webp", both lossless)
+        instead of base64 strings
+        """
+        if self.extractedWalways is None:
+            self.batchExtractWalkWays()
+        exported = []
+        for index, image in enumerate(self.extractedWalways):
+            self._report(index, "encode")
+            exported.append(encodeImage(self._makeTransparent(image), imageFormat, compression))
+        return exported
+
     def batchExtractWalkWays(self):
-        walkwayList = []
-        for index, image in enumerate(self.rawImages):
-            image = cv2.imread(image)
-            print(image)
-            print("HERE")
-            print(type(image))
-            mask = np.ones(image.shape[:2], dtype=np.uint8) * 255  # 255 means keep the image
-            for region in self.regions.get(str(index), []):
-                pts = np.array([[int(pt['x']), int(pt['y'])] for pt in region], dtype=np.int32)
-                pts = pts.reshape((-1, 1, 2))
-                cv2.fillPoly(mask, [pts], 0)
+        """
+        Blacks out every drawn region, using the label map of each floor as the mask
 
-            result = cv2.bitwise_and(image, image, mask=mask)
-            walkwayList.append(result)
+        Stores the walkways in self.extractedWalways and the label maps in self.labelMaps
+        """
+        walkwayList = []
+        labelMaps = []
+        for index, source in enumerate(self.rawImages):
+            self._report(index, "cut")
+            image = loadImage(source)
+            if image is source:
+                # Arrays are shared with the caller (e.g. the server's floor store), only decoded images are cut in place
+                image = image.copy()
+            labels = rasterizeRegions(self.regions.get(str(index), []), image.shape)
+            # x - x inside the mask zeroes the regions in place, no second image is allocated
+            cv2.subtract(image, image, dst=image, mask=cv2.compare(labels, 0, cv2.CMP_GT))
+            walkwayList.append(image)
+            labelMaps.append(labels)
         self.extractedWalways = walkwayList
-    
-    def _makeTransparent(self, image, color=(0, 0, 0 )):
-        image_copy = image.copy()
-
-        if image_copy.shape[2] == 3:  # If the image is RGB
-            image_copy = cv2.cvtColor(image_copy, cv2.COLOR_BGR2BGRA)
+        self.labelMaps = labelMaps
 
-        # Create a mask for the target color
-        mask = np.all(image_copy[:, :, :3] == color, axis=-1)
+    def requestLabelMaps(self):
+        """
+        Returns one int32 map per floor holding region index + 1 on every pixel a drawn region covers, 0 elsewhere
+        """
+        if self.labelMaps is None:
+            self.batchExtractWalkWays()
+        return self.labelMaps
 
-        # Set the alpha channel to 0 for the matching pixels
-        image_copy[mask, 3] = 0
+    def requestRegionStats(self):
+        """
+        Returns the area and bounding box of every drawn region per floor, see regionStats
+        """
+        return [regionStats(labels, len(self.regions.get(str(index), [])))
+                for index, labels in enumerate(self.requestLabelMaps())]
 
-        return image_copy 
+    def regionAt(self, floor, x, y):
+        """
+        Returns the index of the drawn region covering pixel (x, y) of a floor, -1 if none does
+        """
+        return int(self.requestLabelMaps()[floor][y, x]) - 1
     
+    def _report(self, index, stage):
+        if self.progress is not None:
+            self.progress(index, stage)
+
+    def _makeTransparent(self, image, color=(0, 0, 0)):
+        return makeTransparent(image, color)
+
     def _imageToBase64(self,image_array, ext='.png'):
         """
         Helper function used to encode a numpy array into a
@@ -0,0 +1,64 @@
+import time
+import uuid
+from collections import OrderedDict
+
+
+class memoryStore():
+    def __init__(self, maxBytes=256 * 1024 ** 2, ttl=15 * 60):
+        """
+        Small in-memory store for blobs handed out by ID.
+
+        Entries expire ttl seconds after they were last used, and the least recently used
+        entries are dropped whenever the stored bytes go over maxBytes.
+
+        Args:
+            maxBytes (int): Upper bound on the summed size of the stored values
+            ttl (float): Seconds an unused entry is kept for
+        """
+        self.maxBytes = maxBytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # {key: (value, size, expiry)}
+        self.totalBytes = 0
+
+    def put(self, value, size, key=None):
+        """
+        Stores value, size is what it counts towards maxBytes
+
+        Returns the key it was stored under, a new random one if key is None
+        """
+        key = key or uuid.uuid4().hex
+        self._drop(key)
+        self.entries[key] = (value, size, time.monotonic() + self.ttl)
+        self.totalBytes += size
+        self._evict()
+        return key
+
+    def get(self, key):
+        """
+        Returns the value stored under key (and refreshes its expiry), None if it is gone
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, size, expiry = entry
+        if expiry < time.monotonic():
+            self._drop(key)
+            return None
+        self.entries[key] = (value, size, time.monotonic() + self.ttl)
+        self.entries.move_to_end(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.totalBytes -= entry[1]
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [key for key, (_, _, expiry) in self.entries.items() if expiry < now]:
+            self._drop(key)
+        while self.totalBytes > self.maxBytes and len(self.entries) > 1:
+            self._drop(next(iter(self.entries)))
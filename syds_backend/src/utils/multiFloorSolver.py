@@ -0,0 +1,171 @@
+import heapq
+
+import numpy as np
+
+from src.utils.distanceField import distanceField, TENANT, WALL
+
+BIN_NODE = "bin"
+
+
+class multiFloorSolver:
+    def __init__(self, grids, stairs):
+        """
+        Routes every tenant of an estate to its closest bin, which may be on another floor.
+
+        Each floor is reduced to its portals (staircase ends, plus one shared node standing for
+        "any bin on this floor") with the walking distance between them read off per floor
+        distance fields. Cross floor queries are then answered with Dijkstra on that small graph,
+        the floors are never stacked into one 3D grid.
+
+        Args:
+            grids (list[list[list[int]]]): One grid per floor, same encoding as gridSolver
+            stairs (list[dict]): Staircase links, each {"from": [floor, x, y], "to": [floor, x, y], "cost": int}
+            where cost is the number of steps the staircase counts as (defaults to 1)
+        """
+        self.grids = [np.asarray(grid) for grid in grids]
+        self.stairs = [self._parseStair(stair) for stair in stairs]
+        self.binFields = [distanceField.fromGrid(grid) for grid in self.grids]
+        self.portals = self._findPortals()
+        self.portalFields = self._buildPortalFields()
+        self.graph = self._buildGraph()
+        self.binDistance, self.nextHop = self._solveFromBins()
+        self.routes = self.findTenantRoutes()
+
+    def _parseStair(self, stair):
+        start = tuple(int(v) for v in stair["from"])
+        end = tuple(int(v) for v in stair["to"])
+        if start[0] == end[0]:
+            raise ValueError("Staircases have to link two different floors")
+        for floor, x, y in (start, end):
+            if not 0 <= floor < len(self.grids):
+                raise ValueError(f"Staircase links to unknown floor {floor}")
+            rows, cols = self.grids[floor].shape
+            if not (0 <= x < cols and 0 <= y < rows):
+                raise ValueError(f"Staircase cell {(x, y)} is outside floor {floor}")
+        return start, end, int(stair.get("cost", 1))
+
+    def _findPortals(self):
+        """
+        Returns a dict of {floor: [(floor, x, y), ...]} holding every staircase end on that floor
+        """
+        portals = {floor: [] for floor in range(len(self.grids))}
+        for start, end, _ in self.stairs:
+            for node in (start, end):
+                if node not in portals[node[0]]:
+                    portals[node[0]].append(node)
+        return portals
+
+    def _buildPortalFields(self):
+        """
+        One distance field per staircase end, limited to the floor it is on
+        """
+        fields = {}
+        for floor, nodes in self.portals.items():
+            grid = self.grids[floor]
+            passable = (grid != WALL) & (grid != TENANT)
+            for node in nodes:
+                fields[node] = distanceField(passable, [node[1:]])
+        return fields
+
+    def _buildGraph(self):
+        """
+        Builds the sparse portal graph as {node: [(neighbour, steps), ...]}.
+
+        Portals on the same floor are joined by their walking distance, staircases join floors
+        and every portal that can walk to a bin is joined to BIN_NODE.
+        """
+        graph = {BIN_NODE: []}
+        for floor, nodes in self.portals.items():
+            for node in nodes:
+                graph.setdefault(node, [])
+                toBin = self.binFields[floor].distanceAt(node[1:])
+                if toBin >= 0:
+                    graph[node].append((BIN_NODE, toBin))
+                    graph[BIN_NODE].append((node, toBin))
+                for other in nodes:
+                    if other == node:
+                        continue
+                    steps = self.portalFields[other].distanceAt(node[1:])
+                    if steps >= 0:
+                        graph[node].append((other, steps))
+        for start, end, cost in self.stairs:
+            graph[start].append((end, cost))
+            graph[end].append((start, cost))
+        return graph
+
+    def _solveFromBins(self):
+        """
+        Dijkstra outwards from BIN_NODE over the portal graph.
+
+        Returns ({node: steps to the closest bin}, {node: next node on the way there})
+        """
+        distance = {BIN_NODE: 0}
+        nextHop = {}
+        queue = [(0, 0, BIN_NODE)]
+        order = 1  # Tie breaker so nodes themselves never need comparing
+        while queue:
+            steps, _, node = heapq.heappop(queue)
+            if steps > distance.get(node, float("inf")):
+                continue
+            for neighbour, weight in self.graph[node]:
+                candidate = steps + weight
+                if candidate < distance.get(neighbour, float("inf")):
+                    distance[neighbour] = candidate
+                    nextHop[neighbour] = node
+                    heapq.heappush(queue, (candidate, order, neighbour))
+                    order += 1
+        return distance, nextHop
+
+    def _findTenants(self, floor):
+        ys, xs = np.nonzero(self.grids[floor] == TENANT)
+        return list(zip(xs.tolist(), ys.tolist()))
+
+    def routeFrom(self, floor, cell):
+        """
+        Finds the shortest route from a cell to the closest bin on any floor.
+
+        Returns a list of (floor, x, y) tuples, empty if no bin can be reached
+        """
+        best = self.binFields[floor].distanceAt(cell)
+        bestPortal = None
+        for portal in self.portals[floor]:
+            if portal not in self.binDistance:
+                continue
+            steps = self.portalFields[portal].distanceAt(cell)
+            if steps < 0:
+                continue
+            total = steps + self.binDistance[portal]
+            if best < 0 or total < best:
+                best = total
+                bestPortal = portal
+        if best < 0:
+            return []
+        if bestPortal is None:
+            return [(floor, x, y) for x, y in self.binFields[floor].routeFrom(cell)]
+
+        route = [(floor, x, y) for x, y in self.portalFields[bestPortal].routeFrom(cell)]
+        node = bestPortal
+        while True:
+            hop = self.nextHop[node]
+            if hop == BIN_NODE:
+                walk = self.binFields[node[0]].routeFrom(node[1:])
+                route.extend((node[0], x, y) for x, y in walk[1:])
+                return route
+            if hop[0] == node[0]:
+                walk = self.portalFields[hop].routeFrom(node[1:])
+                route.extend((node[0], x, y) for x, y in walk[1:])
+            else:
+                route.append(hop)  # Taking the staircase
+            node = hop
+
+    def findTenantRoutes(self):
+        """
+        Finds the shortest route from each tenant on every floor to the nearest bin.
+        Returns:
+            dict: {[floor, x, y]: shortest_path_to_bin}
+        """
+        tenant_routes = {}
+        for floor in range(len(self.grids)):
+            for tenant in self._findTenants(floor):
+                tenant_routes[(floor,) + tenant] = self.routeFrom(floor, tenant)
+        return {str(list(k)): v for k, v in tenant_routes.items()}
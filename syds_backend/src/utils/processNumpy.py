@@ -1,18 +1,205 @@
 import cv2
 import numpy as np
-from matplotlib import pyplot as plt
-import os
-import base64
+
+from src.utils.imageIO import loadImage
+from src.utils.distanceField import EMPTY, TENANT, WALL
+from src.utils.regionRaster import rasterizeRegions
+from src.utils.walkwaySkeleton import extractSkeleton, findWallGaps
+
+# Label the region labelling page gives to tenant regions ("Cross", "Tenant", "Toilet", "Staircase")
+TENANT_LABEL = 1
+
 
 class processNumpy():
-    def __init__(self, sources, regions, labels):
-        images = []
-        for source in sources:
-            images.append(self._convertBase64ToNumpy(source))
-        self.walkway = images
+    def __init__(self, sources, regions, labels, spacer=5, connectLimit=40, progress=None):
+        """
+        Server side version of the formingNumpy notebook, turns the walkways and the labelled regions
+        of every floor into a routing grid.
+
+        Args:
+            sources (list): One walkway image per floor, either a numpy array, the encoded file bytes or a file path
+            regions (dict): {floor index: [region points, ...]} as drawn on the region labelling page
+            labels (dict): {floor index: {region index: label}}, regions labelled TENANT_LABEL become tenants
+            spacer (int): How far past a walkway crossing the door gap in a region wall reaches
+            connectLimit (int): Tenants the walkway does not cross are joined to a walkway up to this many pixels away
+            progress (callable): Called as progress(floor index, stage name) whenever a floor starts a stage
+        """
+        self.walkway = [self._convertBase64ToNumpy(source) for source in sources]
         self.regions = regions
         self.labels = labels
+        self.spacer = spacer
+        self.connectLimit = connectLimit
+        self.progress = progress
+        self.floors = None
+
+    def requestFloors(self):
+        """
+        Returns one dictionary per floor:
+            "grid": int8 array using the gridSolver encoding (walkways empty, everything else wall)
+            "tenants": [(x, y), ...] the tenant cell of every tenant region that reaches a walkway
+            "unconnectedTenants": [region index, ...] tenant regions with no walkway within connectLimit
+            "regions": {label: [[(x, y), ...], ...]} the orthogonal region walls with their door gaps
+            "doorSkips": {label: [[index, ...], ...]} the wall segments that are door gaps, as in breakThroughWalls
+        """
+        if self.floors is None:
+            self.floors = [self.processFloor(index) for index in range(len(self.walkway))]
+        return self.floors
+
+    def processFloor(self, index):
+        self._report(index, "skeleton")
+        skeleton = extractSkeleton(self.walkway[index])
+        floorRegions = self.regions.get(str(index), [])
+        floorLabels = self.labels.get(str(index), {})
+
+        grid = np.full(skeleton.shape, WALL, dtype=np.int8)
+        grid[self._fourConnect(skeleton)] = EMPTY
+
+        self._report(index, "walls")
+        walls = [self._processPoints(region) for region in floorRegions]
+        edges = [(reference[0], reference[1], point[0], point[1])
+                 for region in walls for reference, point in zip(region[:-1], region[1:])]
+        edgeGaps = iter(findWallGaps(skeleton, edges, self.spacer))
+        # One label map of the orthogonal walls answers every inside / outside question below
+        labelMap = rasterizeRegions(walls, grid.shape)
+
+        self._report(index, "tenants")
+        tenants = []
+        unconnected = []
+        regions = {}
+        doorSkips = {}
+        for ridx, region in enumerate(walls):
+            label = floorLabels.get(str(ridx), -1)
+            workingRegion = [region[0]]
+            workingSkipper = []
+            crossings = []
+            for point in region[1:]:
+                for gapStart, gapEnd, crossing in next(edgeGaps):
+                    workingSkipper.append(len(workingRegion))
+                    workingRegion.append(gapStart)
+                    workingRegion.append(gapEnd)
+                    crossings.append(crossing)
+                workingRegion.append(point)
+            regions.setdefault(label, []).append(workingRegion)
+            doorSkips.setdefault(label, []).append(workingSkipper)
+
+            if label != TENANT_LABEL:
+                continue
+            tenant = self._placeTenant(grid, labelMap, ridx + 1, region, crossings)
+            if tenant is None:
+                unconnected.append(ridx)
+            else:
+                tenants.append(tenant)
+
+        return {"grid": grid, "tenants": tenants, "unconnectedTenants": unconnected,
+                "regions": regions, "doorSkips": doorSkips}
+
+    def _report(self, index, stage):
+        if self.progress is not None:
+            self.progress(index, stage)
+
+    def _fourConnect(self, skeleton):
+        """
+        The skeleton is 8-connected but the solvers only step up, down, left and right, so every diagonal step
+        gets one of its corner pixels filled in
+
+        Returns the widened skeleton as a new boolean array
+        """
+        walkable = skeleton.copy()
+        # Down right steps with both corners empty fill the right corner, down left steps the left one
+        below = skeleton[:-1, :-1] & skeleton[1:, 1:] & ~skeleton[:-1, 1:] & ~skeleton[1:, :-1]
+        walkable[:-1, 1:] |= below
+        below = skeleton[:-1, 1:] & skeleton[1:, :-1] & ~skeleton[:-1, :-1] & ~skeleton[1:, 1:]
+        walkable[:-1, :-1] |= below
+        return walkable
+
+    def _processPoints(self, region):
+        """
+        Snaps a drawn region to horizontal and vertical walls
+
+        Returns the closed list of (x, y) corners, the first point repeated at the end
+        """
+        refinedPoints = []
+        for index, point in enumerate(region):
+            point = (int(point['x']), int(point['y']))
+            if index == 0:
+                refinedPoints.append(point)
+                continue
+            referencePoint = refinedPoints[-1]
+            if index == len(region) - 1:
+                # The last wall also has to line up with the first point
+                startingPoint = refinedPoints[0]
+                if self._checkHorizontal(startingPoint, point):
+                    refinedPoints.append((referencePoint[0], startingPoint[1]))
+                else:
+                    refinedPoints.append((startingPoint[0], referencePoint[1]))
+            elif self._checkHorizontal(referencePoint, point):
+                refinedPoints.append((point[0], referencePoint[1]))
+            else:
+                refinedPoints.append((referencePoint[0], point[1]))
+        refinedPoints.append(refinedPoints[0])
+        return refinedPoints
+
+    def _checkHorizontal(self, referencePoint, point):
+        """
+        Returns True if the line between the two (x, y) points is more horizontal than vertical
+        """
+        return abs(referencePoint[0] - point[0]) > abs(referencePoint[1] - point[1])
+
+    def _placeTenant(self, grid, labelMap, label, region, crossings):
+        """
+        Picks the grid cell of one tenant region, next to the first walkway crossing its walls. Regions the
+        walkway does not cross are joined to the closest walkway straight out of one of their walls.
+        label is the region's value in labelMap.
+
+        Returns the (x, y) tenant cell, None if no walkway is within connectLimit
+        """
+        rows, cols = grid.shape
+
+        def inRegion(x, y):
+            # Strictly inside, the filled map also covers the wall itself
+            if not (1 <= x < cols - 1 and 1 <= y < rows - 1):
+                return False
+            return (labelMap[y - 1:y + 2, x - 1:x + 2] == label).all()
+
+        for crossing in crossings:
+            # Step into the room until leaving the walkway, the tenant sits at the end of its door path
+            for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                x, y = crossing
+                if not inRegion(x + 2 * dx, y + 2 * dy):
+                    continue
+                while 0 <= x + dx < cols and 0 <= y + dy < rows and grid[y + dy, x + dx] == EMPTY:
+                    x, y = x + dx, y + dy
+                if 0 <= x + dx < cols and 0 <= y + dy < rows and grid[y + dy, x + dx] == WALL:
+                    grid[y + dy, x + dx] = TENANT
+                    return (x + dx, y + dy)
 
+        best = None
+        for reference, point in zip(region[:-1], region[1:]):
+            if reference == point:
+                continue
+            midpoint = ((reference[0] + point[0]) // 2, (reference[1] + point[1]) // 2)
+            vertical = reference[0] == point[0]
+            for sign in (1, -1):
+                dx, dy = (sign, 0) if vertical else (0, sign)
+                # Only look outwards from the room
+                if inRegion(midpoint[0] + 2 * dx, midpoint[1] + 2 * dy):
+                    continue
+                steps = np.arange(1, self.connectLimit + 1)
+                xs, ys = midpoint[0] + dx * steps, midpoint[1] + dy * steps
+                inside = (xs >= 0) & (xs < cols) & (ys >= 0) & (ys < rows)
+                hits = np.flatnonzero(grid[ys[inside], xs[inside]] == EMPTY)
+                if hits.size and (best is None or hits[0] < best[0]):
+                    best = (int(hits[0]), midpoint, dx, dy)
+        if best is None or not (0 <= best[1][0] < cols and 0 <= best[1][1] < rows):
+            return None
+        distance, (x, y), dx, dy = best
+        for step in range(1, distance + 1):
+            grid[y + dy * step, x + dx * step] = EMPTY
+        grid[y, x] = TENANT
+        return (x, y)
 
     def _convertBase64ToNumpy(self, source):
-        image = cv2.imread(source)
+        image = loadImage(source)
+        if image is None:
+            raise ValueError("Walkway image could not be decoded")
+        return image
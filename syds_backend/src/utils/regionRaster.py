@@ -0,0 +1,66 @@
+from operator import itemgetter
+
+import cv2
+import numpy as np
+
+_xy = itemgetter('x', 'y')
+
+
+def regionPoints(region):
+    """
+    Turns one region, either the drawn [{x, y}, ...] points or [(x, y), ...] tuples, into the int32
+    (n, 1, 2) array cv2 draws with
+    """
+    if region and isinstance(region[0], dict):
+        region = list(map(_xy, region))
+    return np.asarray(region, dtype=np.float64).astype(np.int32).reshape(-1, 1, 2)
+
+
+def rasterizeRegions(regions, shape):
+    """
+    Draws every region of a floor into one label map.
+
+    Args:
+        regions (list): The regions of the floor, see regionPoints
+        shape (tuple): (rows, cols) of the floor
+
+    Returns an int32 array holding region index + 1 on every pixel a region covers and 0 elsewhere,
+    where regions overlap the later one wins (same as filling them one after another)
+    """
+    labels = np.zeros(shape[:2], dtype=np.int32)
+    for index, region in enumerate(regions):
+        if len(region):
+            cv2.fillPoly(labels, [regionPoints(region)], index + 1)
+    return labels
+
+
+def regionStats(labels, count):
+    """
+    Measures every region of a label map from rasterizeRegions in one pass over its pixels.
+
+    Args:
+        count (int): Number of regions drawn into the map
+
+    Returns a list with one {"region", "area", "left", "top", "width", "height"} per region,
+    regions that cover no pixel have an area and box of 0
+    """
+    ys, xs = np.nonzero(labels)
+    found = labels[ys, xs]
+    area = np.bincount(found, minlength=count + 1)
+    left = np.full(count + 1, labels.shape[1])
+    top = np.full(count + 1, labels.shape[0])
+    right = np.full(count + 1, -1)
+    bottom = np.full(count + 1, -1)
+    np.minimum.at(left, found, xs)
+    np.minimum.at(top, found, ys)
+    np.maximum.at(right, found, xs)
+    np.maximum.at(bottom, found, ys)
+    stats = []
+    for index in range(count):
+        label = index + 1
+        if area[label] == 0:
+            stats.append({"region": index, "area": 0, "left": 0, "top": 0, "width": 0, "height": 0})
+            continue
+        stats.append({"region": index, "area": int(area[label]), "left": int(left[label]), "top": int(top[label]),
+                      "width": int(right[label] - left[label] + 1), "height": int(bottom[label] - top[label] + 1)})
+    return stats
@@ -0,0 +1,186 @@
+import base64
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+
+class resultCache():
+    def __init__(self, maxEntries=32, directory=None, maxDiskBytes=1024 ** 3):
+        """
+        Content addressed cache for the results of the image processing endpoints.
+
+        Results live in an in-memory LRU tier and, when a directory is given, in an on-disk tier
+        of JSON files that drops the least recently used files once it grows past maxDiskBytes.
+        The files are plain data (see _toJson), reading one back can never run code even if
+        someone else can write to the directory.
+
+        Args:
+            maxEntries (int): Results kept in memory, 0 turns the memory tier off
+            directory (str): Folder for the on-disk tier, None turns it off
+            maxDiskBytes (int): Size the on-disk tier is trimmed back to
+        """
+        self.maxEntries = maxEntries
+        self.directory = directory
+        self.maxDiskBytes = maxDiskBytes
+        self.memory = OrderedDict()
+        self.counts = {"memoryHits": 0, "diskHits": 0, "misses": 0, "evictions": 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            # Pickle files left by older versions are never read again
+            for entry in os.scandir(directory):
+                if entry.is_file() and entry.name.endswith(".pkl"):
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+
+    @staticmethod
+    def makeKey(sources, params):
+        """
+        Hashes the image contents together with the processing parameters.
+
+        Args:
+            sources (list): Image bytes, numpy arrays or file paths (the file contents are hashed)
+            params (dict): Anything else that changes the result, must be JSON serialisable
+
+        Returns the hex digest used as the cache key
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        for source in sources:
+            digest.update(b"\0")
+            if isinstance(source, np.ndarray):
+                digest.update(str(source.shape).encode("utf-8"))
+                digest.update(np.ascontiguousarray(source).data)
+            elif isinstance(source, (bytes, bytearray, memoryview)):
+                digest.update(source)
+            else:
+                with open(source, "rb") as f:
+                    while chunk := f.read(1024 * 1024):
+                        digest.update(chunk)
+        return digest.hexdigest()
+
+    def _diskPath(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """
+        Returns the cached result for key, None on a miss
+        """
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.counts["memoryHits"] += 1
+            return self.memory[key]
+        if self.directory:
+            path = self._diskPath(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    value = _fromJson(json.load(f))
+                os.utime(path)  # Marks the file as recently used for eviction
+                self.counts["diskHits"] += 1
+                self._remember(key, value)
+                return value
+            except (OSError, ValueError, KeyError, TypeError):
+                pass  # Missing, half written or not a cache file, treated as a miss
+        self.counts["misses"] += 1
+        return None
+
+    def put(self, key, value):
+        """
+        Stores a result (base64 strings or encoded image bytes) under key in every enabled tier.
+        The value can nest lists, tuples, dicts with str keys, str, bytes, numbers, bools and None
+        """
+        self._remember(key, value)
+        if self.directory:
+            path = self._diskPath(key)
+            tempPath = f"{path}.{os.getpid()}.tmp"
+            with open(tempPath, "w", encoding="utf-8") as f:
+                json.dump(_toJson(value), f)
+            os.replace(tempPath, path)
+            self._trimDisk()
+
+    def _remember(self, key, value):
+        if self.maxEntries <= 0:
+            return
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.maxEntries:
+            self.memory.popitem(last=False)
+            self.counts["evictions"] += 1
+
+    def _trimDisk(self):
+        """
+        Removes the least recently used files until the on-disk tier fits in maxDiskBytes
+        """
+        files = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.maxDiskBytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.counts["evictions"] += 1
+            except OSError:
+                pass
+
+    def stats(self):
+        """
+        Returns the hit and miss counts together with the current size of each tier
+        """
+        lookups = self.counts["memoryHits"] + self.counts["diskHits"] + self.counts["misses"]
+        hits = lookups - self.counts["misses"]
+        stats = dict(self.counts)
+        stats["hitRate"] = hits / lookups if lookups else 0.0
+        stats["memoryEntries"] = len(self.memory)
+        if self.directory:
+            stats["diskBytes"] = sum(entry.stat().st_size for entry in os.scandir(self.directory)
+                                     if entry.is_file() and entry.name.endswith(".json"))
+        return stats
+
+
+def _toJson(value):
+    """
+    Turns a cached value into plain JSON. Lists, str, numbers, bools and None stay as they are,
+    bytes, tuples and dicts are wrapped in a one key object naming their type so they come back the same
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"bytes": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, tuple):
+        return {"tuple": [_toJson(item) for item in value]}
+    if isinstance(value, list):
+        return [_toJson(item) for item in value]
+    if isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value):
+            raise TypeError("Cached dicts need str keys")
+        return {"dict": {key: _toJson(item) for key, item in value.items()}}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"Can not cache a {type(value).__name__} on disk")
+
+
+def _fromJson(value):
+    """
+    Reverses _toJson, raises ValueError (or KeyError, TypeError) for anything _toJson would not write
+    """
+    if isinstance(value, list):
+        return [_fromJson(item) for item in value]
+    if isinstance(value, dict):
+        (kind, item), = value.items()
+        if kind == "bytes":
+            return base64.b64decode(item, validate=True)
+        if kind == "tuple":
+            return tuple(_fromJson(part) for part in item)
+        if kind == "dict":
+            return {key: _fromJson(part) for key, part in item.items()}
+        raise ValueError(f"Unknown cached type: {kind}")
+    return value
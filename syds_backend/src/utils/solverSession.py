@@ -0,0 +1,228 @@
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from src.utils.distanceField import distanceField, BIN, TENANT, WALL
+
+# Past this share of invalidated cells a fresh vectorized search beats repairing cell by cell
+REBUILD_FRACTION = 0.25
+
+
+class solverSession():
+    def __init__(self, grid):
+        """
+        Keeps the distance field and tenant routes of one grid alive between requests,
+        so single cell edits only repair the part of the field they affect.
+
+        Args:
+            grid (list[list[int]]): Same encoding as gridSolver
+        """
+        self.grid = np.array(grid, dtype=np.int8)
+        self.field = distanceField.fromGrid(self.grid)
+        self.routes = {}
+        self.routeCells = {}
+        for tenant in self._findTenants():
+            self._storeRoute(tenant)
+
+    def _findTenants(self):
+        ys, xs = np.nonzero(self.grid == TENANT)
+        return list(zip(xs.tolist(), ys.tolist()))
+
+    def _storeRoute(self, tenant):
+        route = self.field.routeFrom(tenant)
+        self.routes[tenant] = route
+        # The tenant's neighbours decide its first step, the route cells decide the rest
+        index = self.field.index(tenant)
+        cells = [self.field.index(cell) for cell in route]
+        cells.extend(index + int(offset) for offset in self.field.offsets)
+        self.routeCells[tenant] = np.array(cells, dtype=np.int64)
+
+    def requestRoutes(self):
+        """
+        Returns every route in the same format as gridSolver.routes
+        """
+        return {str(list(k)): v for k, v in self.routes.items()}
+
+    def applyEdits(self, edits):
+        """
+        Applies a batch of cell edits and repairs the distance field around them.
+
+        Args:
+            edits (list[dict]): Each {"x": int, "y": int, "value": int} sets one cell,
+            using the grid encoding (0 clears a cell, 1 tenant, 2 bin, 3 wall)
+
+        Returns:
+            dict: {"routes": {tenant: path} for every route that changed,
+                   "removed": [tenant, ...] for tenants that no longer exist}
+        """
+        rows, cols = self.grid.shape
+        field = self.field
+        lostSource = []
+        lostPassable = []
+        gained = []
+        original = {}
+        for edit in edits:
+            x, y, value = int(edit["x"]), int(edit["y"]), int(edit["value"])
+            if not (0 <= x < cols and 0 <= y < rows) or value not in (0, TENANT, BIN, WALL):
+                raise ValueError(f"Invalid edit: {edit}")
+            old = int(self.grid[y, x])
+            if old == value:
+                continue
+            original.setdefault((x, y), old)
+            self.grid[y, x] = value
+            index = field.index((x, y))
+            field.passable[index] = value not in (WALL, TENANT)
+            if old == BIN:
+                lostSource.append(index)
+            if old in (0, BIN) and not field.passable[index]:
+                lostPassable.append(index)
+            if value == BIN or field.passable[index]:
+                gained.append(index)
+
+        removedTenants = {cell for cell, old in original.items()
+                          if old == TENANT and self.grid[cell[1], cell[0]] != TENANT}
+        addedTenants = {cell for cell, old in original.items()
+                        if old != TENANT and self.grid[cell[1], cell[0]] == TENANT}
+
+        before = field.dist.copy()
+        isSource = np.zeros((rows + 2, cols + 2), dtype=bool)
+        isSource[1:-1, 1:-1] = self.grid == BIN
+        isSource = isSource.ravel()
+        invalid = self._invalidate(np.array(lostSource + lostPassable, dtype=np.int64), isSource)
+        if invalid.size > REBUILD_FRACTION * rows * cols:
+            ys, xs = np.nonzero(self.grid == BIN)
+            field.sources = list(zip(xs.tolist(), ys.tolist()))
+            field.dist = field._search()
+        else:
+            self._repair(np.union1d(invalid, np.array(gained, dtype=np.int64)), isSource)
+
+        changed = np.flatnonzero(field.dist != before)
+        touched = np.unique((changed[:, None] + np.concatenate(([0], field.offsets))[None, :]).ravel())
+        field._pointParents(field.parent, touched)
+        changedMask = np.zeros(field.dist.shape, dtype=bool)
+        changedMask[touched] = True
+
+        for tenant in removedTenants:
+            self.routes.pop(tenant, None)
+            self.routeCells.pop(tenant, None)
+        updated = {}
+        for tenant in list(self.routes) + list(addedTenants):
+            if tenant in addedTenants or changedMask[self.routeCells[tenant]].any():
+                old = self.routes.get(tenant)
+                self._storeRoute(tenant)
+                if self.routes[tenant] != old:
+                    updated[tenant] = self.routes[tenant]
+        return {
+            "routes": {str(list(k)): v for k, v in updated.items()},
+            "removed": [str(list(k)) for k in removedTenants],
+        }
+
+    def _neighbours(self, indices):
+        return np.unique((indices[:, None] + self.field.offsets[None, :]).ravel())
+
+    def _invalidate(self, seeds, isSource):
+        """
+        Finds every cell whose distance depended on the removed bins or blocked cells,
+        one BFS level at a time. A cell is invalid once none of its neighbours one step
+        closer to a bin is still valid.
+
+        Returns the invalidated flat indices, their distances are reset to -1
+        """
+        dist = self.field.dist
+        offsets = self.field.offsets
+        seeds = np.unique(seeds)
+        seeds = seeds[dist[seeds] >= 0]
+        if seeds.size == 0:
+            return seeds
+        invalid = np.zeros(dist.shape, dtype=bool)
+        invalid[seeds] = True
+        seedLevels = dist[seeds]
+        level = int(seedLevels.min())
+        frontier = seeds[seedLevels == level]
+        found = [seeds]
+        while True:
+            children = self._neighbours(frontier)
+            children = children[(dist[children] == level + 1) & ~invalid[children] & ~isSource[children]]
+            around = children[:, None] + offsets[None, :]
+            supported = ((dist[around] == level) & ~invalid[around]).any(axis=1)
+            children = children[~supported]
+            invalid[children] = True
+            found.append(children)
+            level += 1
+            frontier = np.concatenate((children, seeds[seedLevels == level]))
+            if frontier.size == 0:
+                later = seedLevels[seedLevels > level]
+                if later.size == 0:
+                    break
+                level = int(later.min())
+                frontier = seeds[seedLevels == level]
+        invalid = np.concatenate(found)
+        dist[invalid] = -1
+        return invalid
+
+    def _repair(self, seeds, isSource):
+        """
+        Refills the invalidated cells and spreads any improvement from newly opened cells or bins.
+        Seeds start at different distances, so each one joins the BFS at its own level.
+        """
+        field = self.field
+        dist = field.dist
+        seeds = seeds[isSource[seeds] | field.passable[seeds]]
+        around = dist[seeds[:, None] + field.offsets[None, :]]
+        unreached = np.iinfo(np.int32).max
+        around = np.where(around >= 0, around, unreached - 1).min(axis=1) + 1
+        seedLevels = np.where(isSource[seeds], 0, around)
+        better = (seedLevels < unreached) & ((dist[seeds] < 0) | (seedLevels < dist[seeds]))
+        seeds, seedLevels = seeds[better], seedLevels[better]
+        if seeds.size == 0:
+            return
+        dist[seeds] = seedLevels
+        level = int(seedLevels.min())
+        frontier = seeds[seedLevels == level]
+        while True:
+            children = self._neighbours(frontier)
+            children = children[field.passable[children] & ((dist[children] < 0) | (dist[children] > level + 1))]
+            dist[children] = level + 1
+            level += 1
+            waiting = seeds[(seedLevels == level) & (dist[seeds] == level)]
+            frontier = np.union1d(children, waiting)
+            if frontier.size == 0:
+                later = seedLevels[seedLevels > level]
+                if later.size == 0:
+                    break
+                level = int(later.min())
+                frontier = seeds[(seedLevels == level) & (dist[seeds] == level)]
+
+
+class sessionStore():
+    def __init__(self, maxSessions=32):
+        """
+        Holds the live solver sessions keyed by grid ID, dropping the least recently used
+        once maxSessions is reached.
+        """
+        self.maxSessions = maxSessions
+        self.sessions = OrderedDict()
+
+    def create(self, grid):
+        """
+        Returns the new grid ID and its session
+        """
+        gridId = uuid.uuid4().hex
+        session = solverSession(grid)
+        self.sessions[gridId] = session
+        while len(self.sessions) > self.maxSessions:
+            self.sessions.popitem(last=False)
+        return gridId, session
+
+    def get(self, gridId):
+        """
+        Returns the session for gridId, None if it does not exist (or was evicted)
+        """
+        session = self.sessions.get(gridId)
+        if session is not None:
+            self.sessions.move_to_end(gridId)
+        return session
+
+    def remove(self, gridId):
+        return self.sessions.pop(gridId, None) is not None
@@ -0,0 +1,136 @@
+import cv2
+import numpy as np
+# skimage.morphology is imported inside extractSkeleton, it is slow to load
+
+# Skeleton fragments under this many pixels, or between the two FRAGMENT_RANGE sizes, are noise
+MIN_FRAGMENT = 50
+FRAGMENT_RANGE = (100, 200)
+
+# The backend image ships without pythons/, so the notebook helpers in pythons/utils keep their own copy of these rules
+
+
+def extractSkeleton(image, minFragment=MIN_FRAGMENT, fragmentRange=FRAGMENT_RANGE):
+    """
+    Returns the skeleton of a BGR walkway image as a boolean array, without the small fragments
+    left by the cut out regions
+    """
+    from skimage.morphology import skeletonize
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    mask = cv2.inRange(gray, 50, 150)
+    skeleton = skeletonize(mask > 0)
+    return filterComponents(skeleton, [areaAtLeast(minFragment), areaOutsideRange(*fragmentRange)])
+
+
+def componentStats(mask, connectivity=8):
+    """
+    Labels the connected components of a binary mask once and measures all of them in the same pass.
+
+    Returns (labels, stats), labels is the int32 label image and stats is a dictionary of arrays indexed by label
+    (index 0 being the background): "area", "left", "top", "width" and "height"
+    """
+    _, labels, raw, _ = cv2.connectedComponentsWithStats(mask.astype(np.uint8), connectivity=connectivity,
+                                                         ltype=cv2.CV_32S)
+    stats = {
+        "area": raw[:, cv2.CC_STAT_AREA],
+        "left": raw[:, cv2.CC_STAT_LEFT],
+        "top": raw[:, cv2.CC_STAT_TOP],
+        "width": raw[:, cv2.CC_STAT_WIDTH],
+        "height": raw[:, cv2.CC_STAT_HEIGHT],
+    }
+    return labels, stats
+
+
+def filterComponents(mask, predicates, connectivity=8):
+    """
+    Keeps only the connected components of the mask that pass every predicate, through a lookup table
+    indexed by label
+
+    Args:
+        mask (np.ndarray): Binary image, anything non zero is foreground
+        predicates (list): Functions taking the stats dictionary from componentStats and returning
+        a boolean array with one entry per label, e.g. areaAtLeast(50)
+        connectivity (int): 8 (default) or 4
+
+    Returns the filtered mask as a boolean array
+    """
+    labels, stats = componentStats(mask, connectivity)
+    keep = np.ones(len(stats["area"]), dtype=bool)
+    for predicate in predicates:
+        keep &= predicate(stats)
+    keep[0] = False
+    return keep[labels]
+
+
+def areaAtLeast(minArea):
+    """
+    Predicate for filterComponents, keeps components with at least minArea pixels
+    """
+    return lambda stats: stats["area"] >= minArea
+
+
+def areaOutsideRange(minArea, maxArea):
+    """
+    Predicate for filterComponents, keeps components whose area is NOT between minArea and maxArea
+    """
+    return lambda stats: (stats["area"] < minArea) | (stats["area"] > maxArea)
+
+def findWallGaps(skeleton, edges, spacer=5):
+    """
+    Finds every place the skeleton crosses each wall edge, reading the pixels of all edges in one gather.
+    Touching crossing pixels are one crossing, the gap reaches spacer pixels past it on both sides
+    and overlapping gaps are merged.
+
+    Args:
+        skeleton (np.ndarray): Binary skeleton, crossings are the pixels equal to 1
+        edges (list): (x1, y1, x2, y2) per edge. Edges that are not vertical are read along the row of y1
+        spacer (int): How far past a crossing the gap reaches on either side
+
+    Returns one list per edge of (gapStart, gapEnd, crossing) in the order they are met going from
+    (x1, y1) to (x2, y2), crossing being the first skeleton pixel of the gap
+    """
+    gaps = [[] for _ in edges]
+    if not edges:
+        return gaps
+    x1, y1, x2, y2 = np.asarray(edges, dtype=np.int64).reshape(-1, 4).T
+    vertical = x1 == x2
+    fixed = np.where(vertical, x1, y1)
+    first, last = np.where(vertical, y1, x1), np.where(vertical, y2, x2)
+    low, high = np.minimum(first, last), np.maximum(first, last)
+
+    # Every pixel of every edge, labelled with its edge and its position along it
+    lengths = high - low + 1
+    edgeOf = np.repeat(np.arange(len(lengths)), lengths)
+    position = low[edgeOf] + np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    ys = np.where(vertical[edgeOf], position, fixed[edgeOf])
+    xs = np.where(vertical[edgeOf], fixed[edgeOf], position)
+    inside = (ys >= 0) & (ys < skeleton.shape[0]) & (xs >= 0) & (xs < skeleton.shape[1])
+    hit = np.zeros(len(position), dtype=bool)
+    hit[inside] = skeleton[ys[inside], xs[inside]] == 1
+    edgeOf, position = edgeOf[hit], position[hit]
+    if len(position) == 0:
+        return gaps
+
+    # Touching skeleton pixels on the same edge are one crossing, every crossing opens spacer pixels to each side
+    newRun = np.concatenate(([True], (np.diff(edgeOf) != 0) | (np.diff(position) > 1)))
+    runStarts = np.flatnonzero(newRun)
+    runEnds = np.concatenate((runStarts[1:], [len(position)])) - 1
+    runEdge = edgeOf[runStarts]
+    gapStarts = np.maximum(position[runStarts] - spacer, low[runEdge])
+    gapEnds = np.minimum(position[runEnds] + spacer, high[runEdge])
+    # Gaps on the same edge that overlap or touch become one, their ends only grow along an edge
+    newGap = np.concatenate(([True], (np.diff(runEdge) != 0) | (gapStarts[1:] > gapEnds[:-1])))
+    gapFirsts = np.flatnonzero(newGap)
+    gapLasts = np.concatenate((gapFirsts[1:], [len(runEdge)])) - 1
+
+    for edge, start, end, crossing in zip(runEdge[gapFirsts].tolist(), gapStarts[gapFirsts].tolist(),
+                                          gapEnds[gapLasts].tolist(), position[runStarts[gapFirsts]].tolist()):
+        line = int(fixed[edge])
+        if vertical[edge]:
+            gaps[edge].append(((line, start), (line, end), (line, crossing)))
+        else:
+            gaps[edge].append(((start, line), (end, line), (crossing, line)))
+    # Edges walked backwards meet their gaps in the opposite order, each gap from its far side
+    for edge in np.flatnonzero(first > last).tolist():
+        gaps[edge] = [(end, start, crossing) for start, end, crossing in reversed(gaps[edge])]
+    return gaps
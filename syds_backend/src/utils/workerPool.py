@@ -0,0 +1,232 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Configured through the environment (see build/.env.template)
+#   SYDS_POOL_WORKERS: number of worker processes, defaults to the CPU count, 0 runs tasks inline
+#   SYDS_TASK_TIMEOUT: seconds a request waits for its task before giving up
+#   SYDS_POOL_START_METHOD: multiprocessing start method for the workers
+POOL_WORKERS = int(os.environ.get("SYDS_POOL_WORKERS") or os.cpu_count() or 1)
+TASK_TIMEOUT = float(os.environ.get("SYDS_TASK_TIMEOUT") or 300)
+START_METHOD = os.environ.get("SYDS_POOL_START_METHOD") or "spawn"
+
+_pool = None
+_inlinePool = None
+_manager = None
+
+
+def getPool():
+    """
+    Returns the shared process pool, creating it on first use
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS,
+                                    mp_context=multiprocessing.get_context(START_METHOD))
+    return _pool
+
+
+def submitTask(task, *args):
+    """
+    Starts task(*args) in a worker process (on a background thread when SYDS_POOL_WORKERS is 0)
+    without waiting for it
+
+    Returns the concurrent.futures.Future of the task
+    """
+    if POOL_WORKERS == 0:
+        return _getInlinePool().submit(task, *args)
+    return getPool().submit(task, *args)
+
+
+def _getInlinePool():
+    global _inlinePool
+    if _inlinePool is None:
+        _inlinePool = ThreadPoolExecutor(max_workers=1)
+    return _inlinePool
+
+
+def progressChannel():
+    """
+    Returns (events, cancelled): a queue the workers put their progress events on and a dict
+    whose keys are the cancelled job IDs, both usable from the worker processes
+    """
+    global _manager
+    if POOL_WORKERS == 0:
+        return queue.Queue(), {}
+    if _manager is None:
+        _manager = multiprocessing.get_context(START_METHOD).Manager()
+    return _manager.Queue(), _manager.dict()
+
+
+def shutdownPool():
+    """
+    Stops the workers, dropping any task that has not started yet
+    """
+    global _pool, _inlinePool, _manager
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+    if _inlinePool is not None:
+        _inlinePool.shutdown(wait=False, cancel_futures=True)
+        _inlinePool = None
+    if _manager is not None:
+        _manager.shutdown()
+        _manager = None
+
+
+async def runInPool(task, *args, timeout=None):
+    """
+    Runs task(*args) in a worker process (on the background thread when SYDS_POOL_WORKERS is 0)
+    without blocking the event loop.
+
+    Raises asyncio.TimeoutError once timeout (or SYDS_TASK_TIMEOUT) seconds pass. On a timeout or
+    when the request itself is cancelled the task is cancelled too if it has not started yet,
+    a task that is already running finishes in its worker and its result is dropped.
+    """
+    future = submitTask(task, *args)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout or TASK_TIMEOUT)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        future.cancel()
+        raise
+
+
+class jobCancelled(Exception):
+    """
+    Raised inside a worker when the job it is running was cancelled
+    """
+
+
+class progressReporter():
+    def __init__(self, events, cancelled, jobId):
+        """
+        Picklable progress callback handed to the tasks of a job. Every call puts a
+        (jobId, floor, stage) event on the events queue and stops the task once the job is cancelled.
+        """
+        self.events = events
+        self.cancelled = cancelled
+        self.jobId = jobId
+
+    def __call__(self, floor, stage):
+        if self.jobId in self.cancelled:
+            raise jobCancelled(self.jobId)
+        self.events.put((self.jobId, floor, stage))
+
+
+class sharedArrays():
+    def __init__(self, arrays):
+        """
+        Hands numpy arrays from a worker back to the server through shared memory instead of pickling
+        them down the pool's pipe. Each array is written once into its own block and only the block
+        names travel back, the server copies them out with receive().
+
+        Blocks belong to the copy unpickled in the server, so a result the server drops (e.g. after
+        a timeout) frees them when it is garbage collected. Tasks running inline keep the arrays as they are.
+        """
+        self.arrays = None
+        self.blocks = []  # (name, shape, dtype) per array
+        self.owner = False
+        if multiprocessing.parent_process() is None:
+            self.arrays = list(arrays)
+            return
+        for array in arrays:
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append((block.name, array.shape, array.dtype.str))
+            block.close()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.owner = True
+
+    def receive(self):
+        """
+        Returns the arrays in their original order, the shared blocks are freed on the first call
+        """
+        if self.arrays is None:
+            arrays = []
+            for name, shape, dtype in self.blocks:
+                block = shared_memory.SharedMemory(name=name)
+                arrays.append(np.ndarray(shape, dtype, buffer=block.buf).copy())
+                block.close()
+                block.unlink()
+            self.owner = False
+            self.arrays = arrays
+        return self.arrays
+
+    def _free(self):
+        if self.owner:
+            self.owner = False
+            for name, _, _ in self.blocks:
+                try:
+                    block = shared_memory.SharedMemory(name=name)
+                except FileNotFoundError:
+                    continue
+                block.close()
+                block.unlink()
+
+    def __del__(self):
+        self._free()
+
+
+# Tasks sent to the pool. They live at module level so the workers can unpickle them, and they
+# return the final encoded results, the decoded floors a step keeps come back as sharedArrays.
+# Each task imports what it needs itself, so a fresh worker only loads the image processing or
+# the solvers once a task actually needs them.
+
+def extractRegions(sources, imageFormat=None, compression=None, keepArrays=False, progress=None):
+    """
+    imageFormat None returns base64 strings, "png" or "webp" returns the encoded bytes.
+    keepArrays returns (images, sharedArrays) so the server can keep the decoded floors
+    """
+    from src.utils.FloorPlanExtractor import floorPlanExtractor
+
+    extractor = floorPlanExtractor(sources, progress=progress)
+    if imageFormat is None:
+        images = extractor.requestRegions()
+    else:
+        images = extractor.requestEncodedRegions(imageFormat, compression)
+    return (images, sharedArrays(extractor.extractedRegions)) if keepArrays else images
+
+
+def extractWalkways(sources, regions, imageFormat=None, compression=None, keepArrays=False, progress=None):
+    from src.utils.mapCropper import mapCropper
+
+    cropper = mapCropper(sources, regions, progress)
+    if imageFormat is None:
+        images = cropper.requestWalkways()
+    else:
+        images = cropper.requestEncodedWalkways(imageFormat, compression)
+    return (images, sharedArrays(cropper.extractedWalways)) if keepArrays else images
+
+
+def solveRoutes(grid, mode, routeFormat, clusterSize=64):
+    from src.utils.gridCodec import encodeRoutes
+    from src.utils.gridSolver import gridSolver
+
+    return encodeRoutes(gridSolver(grid, mode, clusterSize).routes, routeFormat)
+
+
+def solveMultiFloorRoutes(grids, stairs):
+    from src.utils.multiFloorSolver import multiFloorSolver
+
+    return multiFloorSolver(grids, stairs).routes
+
+
+def optimizeBins(grid, budget, objective, keepBins, timeLimit, maxIterations):
+    from src.utils.binOptimizer import binOptimizer
+
+    optimizer = binOptimizer(grid, budget, objective, keepBins)
+    result = optimizer.optimize(timeLimit, maxIterations)
+    return result, optimizer.requestGrid(result["bins"])
+
+
+def buildGrids(sources, regions, labels, progress=None):
+    from src.utils.processNumpy import processNumpy
+
+    return processNumpy(sources, regions, labels, progress=progress).requestFloors()
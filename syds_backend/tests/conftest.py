@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from src.utils.distanceField import EMPTY, TENANT, BIN, WALL
+
+
+@pytest.fixture
+def randomGrid():
+    """
+    Returns makeGrid(seed, rows=30, cols=40, tenants=12, bins=3, walls=0.3), which builds a random grid
+    in the gridSolver encoding with walls on about that share of the cells
+    """
+    def makeGrid(seed, rows=30, cols=40, tenants=12, bins=3, walls=0.3):
+        rng = np.random.default_rng(seed)
+        grid = np.where(rng.random((rows, cols)) < walls, WALL, EMPTY).astype(np.uint8)
+        ys, xs = np.nonzero(grid == EMPTY)
+        picks = rng.choice(len(xs), size=tenants + bins, replace=False)
+        grid[ys[picks[:tenants]], xs[picks[:tenants]]] = TENANT
+        grid[ys[picks[tenants:]], xs[picks[tenants:]]] = BIN
+        return grid
+    return makeGrid
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.utils.binOptimizer import binOptimizer
+from src.utils.distanceField import EMPTY, BIN
+from src.utils.solverSession import solverSession
+
+client = TestClient(app)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("budget", [1, 3])
+@pytest.mark.parametrize("keepBins", [True, False])
+def test_optimizer_respects_budget_and_keepBins(randomGrid, seed, budget, keepBins):
+    grid = randomGrid(seed, walls=0.2)
+    existing = set(zip(*np.nonzero(grid.T == BIN)))
+    optimizer = binOptimizer(grid, budget, keepBins=keepBins)
+    result = optimizer.optimize(timeLimit=5, maxIterations=10)
+
+    bins = {tuple(bin) for bin in result["bins"]}
+    assert len(result["bins"]) == len(bins) == budget
+    # New bins go on walkway cells, the old bins only count as walkway once they are cleared
+    free = (EMPTY,) if keepBins else (EMPTY, BIN)
+    assert all(grid[y, x] in free for x, y in bins)
+    placed = optimizer.requestGrid(result["bins"])
+    expected = bins | existing if keepBins else bins
+    assert set(zip(*np.nonzero(placed.T == BIN))) == expected
+
+    # The reported walks are the shortest ones to the bins that end up in the grid
+    routes = solverSession(placed).requestRoutes()
+    for tenant, distance in result["distances"].items():
+        assert distance == (len(routes[tenant]) - 1 if routes[tenant] else -1)
+    served = [d for d in result["distances"].values() if d >= 0]
+    assert result["total"] == sum(served)
+    assert result["worst"] == max(served, default=0)
+
+
+@pytest.mark.parametrize("keepBins", ["false", 0, None, [True]])
+def test_non_bool_keepBins_is_rejected(randomGrid, keepBins):
+    response = client.post("/optimizeBins", json={"grid": randomGrid(0).tolist(), "budget": 1, "keepBins": keepBins})
+    assert response.status_code == 400
@@ -0,0 +1,34 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from src.utils.FloorPlanExtractor import floorPlanExtractor
+
+# The sample photos live with the notebooks, the backend image does not ship them
+FLOORPLANS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "pythons", "OCRWithFloorPlan",
+                          "floorplans")
+
+
+def corners(extractor, image):
+    rect = extractor._findLargestQuadrilateral(image)
+    assert rect is not None
+    return extractor._orderPoints(rect.reshape(4, 2).astype(np.float32))
+
+
+@pytest.mark.parametrize("name", ["L1.jpg", "L2.jpg", "L3.jpg", "L4.jpg"])
+def test_pyramid_corners_match_full_resolution(name):
+    path = os.path.join(FLOORPLANS, name)
+    if not os.path.exists(path):
+        pytest.skip(f"{name} is not in this checkout")
+    image = cv2.imread(path)
+    # Upscaled 3x so the longer side is past PYRAMID_MAX_SIDE and the pyramid search kicks in
+    image = cv2.resize(image, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
+    assert max(image.shape[:2]) > floorPlanExtractor.PYRAMID_MAX_SIDE
+
+    pyramid = floorPlanExtractor([image], pyramid=True)
+    full = floorPlanExtractor([image], pyramid=False)
+    coarse, exact = corners(pyramid, image), corners(full, image)
+    assert np.abs(coarse - exact).max() <= 1
+    assert pyramid._processImage(image).shape == full._processImage(image).shape
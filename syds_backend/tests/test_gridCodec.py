@@ -0,0 +1,85 @@
+import base64
+import re
+
+import numpy as np
+import pytest
+
+from src.utils.gridCodec import STEP_LETTERS, decodeGrid, encodeRoute
+from src.utils.gridSolver import gridSolver
+
+DIRECTIONS = {letter: step for step, letter in STEP_LETTERS.items()}
+
+
+def toRle(grid):
+    rows = []
+    for row in grid.tolist():
+        runs = []
+        for value in row:
+            if runs and runs[-2] == value:
+                runs[-1] += 1
+            else:
+                runs += [value, 1]
+        rows.append(runs)
+    return rows
+
+
+def fromRuns(encoded):
+    cells = [tuple(encoded["start"])]
+    for letter, count in re.findall(r"([LRUD])(\d+)", encoded["runs"]):
+        dx, dy = DIRECTIONS[letter]
+        for _ in range(int(count)):
+            cells.append((cells[-1][0] + dx, cells[-1][1] + dy))
+    return cells
+
+
+def fromCorners(corners):
+    cells = [tuple(corners[0])]
+    for x, y in corners[1:]:
+        while cells[-1] != (x, y):
+            cx, cy = cells[-1]
+            cells.append((cx + np.sign(x - cx), cy + np.sign(y - cy)))
+    return cells
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_every_grid_format_decodes_the_same(randomGrid, seed):
+    grid = randomGrid(seed, rows=7 + seed, cols=11)
+    for data in ({"grid": grid.tolist()},
+                 {"gridBytes": base64.b64encode(grid.tobytes()).decode(), "shape": list(grid.shape)},
+                 {"gridRle": toRle(grid)}):
+        decoded = decodeGrid(data)
+        assert decoded.dtype == np.uint8
+        assert np.array_equal(decoded, grid)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_route_formats_decode_back_to_the_cells(randomGrid, seed):
+    routes = gridSolver(randomGrid(seed, walls=0.25), "distanceField").routes
+    assert any(routes.values())
+    for path in routes.values():
+        assert encodeRoute(path, "cells") == path
+        if path:
+            assert fromRuns(encodeRoute(path, "runs")) == path
+            assert fromCorners(encodeRoute(path, "corners")) == path
+
+
+@pytest.mark.parametrize("data", [
+    {"grid": [[0, 4]]},
+    {"grid": [[0, -1]]},
+    {"grid": [[0, 256]]},
+    {"grid": [[0, 1.5]]},
+    {"grid": [["0", "1"]]},
+    {"grid": [[0, 1], [2]]},
+    {"grid": [0, 1, 2]},
+    {"grid": []},
+    {"gridBytes": base64.b64encode(bytes([0, 1, 2, 4])).decode(), "shape": [2, 2]},
+    {"gridBytes": base64.b64encode(bytes([0, 1, 2])).decode(), "shape": [2, 2]},
+    {"gridBytes": base64.b64encode(bytes([0, 1])).decode(), "shape": [2]},
+    {"gridRle": [[0, 2], [1, 3]]},
+    {"gridRle": [[7, 2]]},
+    {"gridRle": [[0, -2, 1, 4]]},
+    {"gridRle": [[0, 2**70]]},
+])
+def test_bad_grids_are_rejected(data):
+    with pytest.raises(ValueError):
+        decodeGrid(data)
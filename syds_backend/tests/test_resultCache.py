@@ -0,0 +1,44 @@
+import os
+import pickle
+
+import numpy as np
+
+from src.utils.resultCache import resultCache
+
+
+def test_disk_tier_round_trips_results(tmp_path):
+    value = (["iVBORw0KGgo=", b"\x89PNG\r\n\x1a\n\x00\xff"], ["floor0", "floor1"])
+    key = resultCache.makeKey([np.zeros((2, 2), np.uint8)], {"task": "test"})
+    resultCache(directory=str(tmp_path)).put(key, value)
+    # A fresh cache with no memory tier has to read it back from the file
+    cache = resultCache(maxEntries=0, directory=str(tmp_path))
+    assert cache.get(key) == value
+    assert cache.stats()["diskHits"] == 1
+
+
+def test_disk_tier_never_unpickles(tmp_path):
+    class payload:
+        def __reduce__(self):
+            return (os.mkdir, (str(tmp_path / "ran"),))
+
+    cache = resultCache(maxEntries=0, directory=str(tmp_path))
+    for name, content in [("a" * 64 + ".json", pickle.dumps(payload())), ("b" * 64 + ".json", b"{\"exec\": 1}"),
+                          ("c" * 64 + ".json", b"[{\"bytes\": \"not base64!\"}]")]:
+        (tmp_path / name).write_bytes(content)
+        assert cache.get(name[:64]) is None
+    assert not (tmp_path / "ran").exists()
+    assert cache.stats()["misses"] == 3
+
+
+def test_old_pickle_files_are_removed(tmp_path):
+    (tmp_path / ("d" * 64 + ".pkl")).write_bytes(pickle.dumps(("old", [])))
+    resultCache(directory=str(tmp_path))
+    assert not list(tmp_path.glob("*.pkl"))
+
+
+def test_disk_tier_is_trimmed(tmp_path):
+    cache = resultCache(maxEntries=0, directory=str(tmp_path), maxDiskBytes=3000)
+    for index in range(5):
+        cache.put(f"{index:064d}", ([b"x" * 1000], []))
+    assert cache.stats()["diskBytes"] <= 3000
+    assert cache.get(f"{4:064d}") == ([b"x" * 1000], [])
@@ -0,0 +1,70 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.utils.distanceField import TENANT, BIN, WALL
+from src.utils.gridSolver import gridSolver
+
+client = TestClient(app)
+
+
+def solve(grid, mode, clusterSize=64):
+    return gridSolver(grid, mode, clusterSize).routes
+
+
+def checkRoute(grid, tenant, path):
+    """
+    Asserts path walks from the tenant to a bin in single horizontal or vertical steps over walkable cells
+    """
+    assert path[0] == tenant
+    assert grid[path[-1][1], path[-1][0]] == BIN
+    steps = np.abs(np.diff(np.array(path), axis=0)).sum(axis=1)
+    assert (steps == 1).all()
+    for x, y in path[1:]:
+        assert grid[y, x] not in (WALL, TENANT)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_distance_field_matches_bfs(randomGrid, seed):
+    grid = randomGrid(seed, walls=0.1 + 0.03 * seed)
+    exact, bfs = solve(grid, "distanceField"), solve(grid, "bfs")
+    assert exact == bfs
+    for tenant, path in exact.items():
+        if path:
+            checkRoute(grid, tuple(json.loads(tenant)), path)
+
+
+def test_grid_without_bins_has_no_routes(randomGrid):
+    grid = randomGrid(0, bins=0)
+    routes = solve(grid, "distanceField")
+    assert len(routes) == (grid == TENANT).sum()
+    assert not any(routes.values())
+
+
+@pytest.mark.parametrize("mode", ["dijkstra", None, 3])
+def test_unknown_modes_are_rejected(randomGrid, mode):
+    grid = randomGrid(0)
+    assert client.post("/findRoutes", json={"grid": grid.tolist(), "mode": mode}).status_code == 400
+    if isinstance(mode, str):
+        response = client.post("/findRoutes", content=grid.tobytes(),
+                               headers={"Content-Type": "application/octet-stream",
+                                        "X-Grid-Shape": f"{grid.shape[0]},{grid.shape[1]}", "X-Routing-Mode": mode})
+        assert response.status_code == 400
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("clusterSize", [2, 5, 16])
+def test_hierarchical_routes_are_valid(randomGrid, seed, clusterSize):
+    grid = randomGrid(seed, rows=48, cols=64, tenants=20, walls=0.15 + 0.03 * seed)
+    exact = solve(grid, "distanceField")
+    routes = solve(grid, "hierarchical", clusterSize)
+    assert routes.keys() == exact.keys()
+    for tenant, path in routes.items():
+        # Every tenant that can reach a bin gets a route to one, never shorter than the shortest
+        assert bool(path) == bool(exact[tenant])
+        if path:
+            checkRoute(grid, tuple(json.loads(tenant)), path)
+            assert len(path) >= len(exact[tenant])
@@ -0,0 +1,61 @@
+import base64
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.utils.distanceField import EMPTY, TENANT, BIN, WALL
+from src.utils.solverSession import solverSession
+
+client = TestClient(app)
+
+
+def randomEdits(rng, grid, count):
+    rows, cols = grid.shape
+    return [{"x": int(rng.integers(cols)), "y": int(rng.integers(rows)),
+             "value": int(rng.choice([EMPTY, TENANT, BIN, WALL], p=[0.4, 0.1, 0.2, 0.3]))}
+            for _ in range(count)]
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("batch", [1, 5, 200])
+def test_edits_match_a_fresh_solve(randomGrid, seed, batch):
+    rng = np.random.default_rng(seed)
+    session = solverSession(randomGrid(seed))
+    for _ in range(8):
+        before = session.requestRoutes()
+        changes = session.applyEdits(randomEdits(rng, session.grid, batch))
+        fresh = solverSession(session.grid.copy()).requestRoutes()
+        assert session.requestRoutes() == fresh
+        # Only the routes that really changed are sent back
+        assert changes["routes"] == {tenant: path for tenant, path in fresh.items() if before.get(tenant) != path}
+        assert set(changes["removed"]) == set(before) - set(fresh)
+
+
+def test_invalid_edits_are_rejected(randomGrid):
+    session = solverSession(randomGrid(0))
+    with pytest.raises(ValueError):
+        session.applyEdits([{"x": -1, "y": 0, "value": WALL}])
+    with pytest.raises(ValueError):
+        session.applyEdits([{"x": 0, "y": 0, "value": 4}])
+
+
+def test_sessions_take_every_grid_format(randomGrid):
+    grid = randomGrid(1)
+    expected = {tenant: [list(cell) for cell in path] for tenant, path in solverSession(grid).requestRoutes().items()}
+    bodies = [
+        {"grid": grid.tolist()},
+        {"gridBytes": base64.b64encode(grid.tobytes()).decode(), "shape": list(grid.shape)},
+        {"gridRle": [[int(value) for cell in row for value in (cell, 1)] for row in grid]},
+    ]
+    for body in bodies:
+        response = client.post("/sessions", json=body)
+        assert response.status_code == 200
+        assert response.json()["routes"] == expected
+
+
+@pytest.mark.parametrize("body", [{}, {"grid": [[0, 1], [2]]}, {"grid": [[0, 5]]}, {"grid": [["a"]]},
+                                  {"gridBytes": "AAEC", "shape": [2, 2]}, {"gridRle": "nope"}])
+def test_sessions_reject_bad_grids(body):
+    assert client.post("/sessions", json=body).status_code == 400
@@ -9,6 +9,8 @@ export const ImageStorageProvider = ({ children }) => {
   const [paddedImages, setPaddedImages] = useState([]);
   const [drawnRegions, setDrawnRegions] = useState({});
   const [extractedWalkways, setExtractedWalkways] = useState([]);
+  // Server side IDs of the extracted walkways, lets /createNumpy skip re-uploading them
+  const [walkwayIds, setWalkwayIds] = useState([]);
   const [polishedWalkeways, setPolishedWalkways] = useState({});
   const [labelColor, setLabelColor] = useState({
     0: { fill: "rgba(20, 22, 22, 0.5)", outline: "rgba(59,80,78,1)" },
@@ -32,6 +34,8 @@ export const ImageStorageProvider = ({ children }) => {
         setDrawnRegions,
         extractedWalkways,
         setExtractedWalkways,
+        walkwayIds,
+        setWalkwayIds,
         labelColor,
         setLabelColor,
         polishedWalkeways,
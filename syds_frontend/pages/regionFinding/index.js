@@ -13,6 +13,7 @@ const RegionFinding = () => {
     drawnRegions,
     setDrawnRegions,
     setExtractedWalkways,
+    setWalkwayIds,
   } = useContext(ImageStorageContext);
   const router = useRouter();
 
@@ -93,6 +94,7 @@ const RegionFinding = () => {
 
       console.log(response.data);
       setExtractedWalkways(response.data.results);
+      setWalkwayIds(response.data.floorIds || []);
     } catch (error) {
       console.error(
         "Error sending images to backend:",
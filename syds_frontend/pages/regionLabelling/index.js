@@ -13,6 +13,7 @@ const RegionLabelling = () => {
     extractedWalkways,
     polishedWalkeways,
     paddedImages,
+    walkwayIds,
   } = useContext(ImageStorageContext);
   const router = useRouter();
   // Stores region labels per canvas. For example: { 0: { 0: 1, 1: 2 }, 1: { ... } }
@@ -87,29 +88,47 @@ const RegionLabelling = () => {
   };
 
   const uploadData = async () => {
-    try {
+    const postData = (useIds) => {
       const formData = new FormData();
 
-      // Choose which walkways to send:
-      // If polishedWalkeways is not empty, use its values (assuming it holds base64 strings);
-      // Otherwise, use extractedWalkways.
-      const walkwaysToSend =
-        polishedWalkeways && Object.keys(polishedWalkeways).length > 0
-          ? Object.values(polishedWalkeways)
-          : extractedWalkways;
-
-      walkwaysToSend.forEach((base64String, index) => {
-        const imageFile = base64ToFile(base64String, `image_${index}.png`);
-        formData.append("images", imageFile);
-      });
+      if (useIds) {
+        // The backend still holds the walkways it extracted, only their IDs are sent
+        formData.append("floorIds", JSON.stringify(walkwayIds));
+      } else {
+        // Choose which walkways to send:
+        // If polishedWalkeways is not empty, use its values (assuming it holds base64 strings);
+        // Otherwise, use extractedWalkways.
+        const walkwaysToSend =
+          polishedWalkeways && Object.keys(polishedWalkeways).length > 0
+            ? Object.values(polishedWalkeways)
+            : extractedWalkways;
+
+        walkwaysToSend.forEach((base64String, index) => {
+          const imageFile = base64ToFile(base64String, `image_${index}.png`);
+          formData.append("images", imageFile);
+        });
+      }
 
       formData.append("drawnRegions", JSON.stringify(drawnRegions));
       formData.append("shapeLabels", JSON.stringify(shapeLabels));
 
-      const response = await axios.post(
-        "http://localhost:8000/createNumpy",
-        formData
-      );
+      return axios.post("http://localhost:8000/createNumpy", formData);
+    };
+
+    const canUseIds =
+      walkwayIds.length === extractedWalkways.length &&
+      walkwayIds.length > 0 &&
+      Object.keys(polishedWalkeways || {}).length === 0;
+
+    try {
+      let response;
+      try {
+        response = await postData(canUseIds);
+      } catch (error) {
+        // Expired IDs are answered with a 404, fall back to uploading the walkways
+        if (!canUseIds || error.response?.status !== 404) throw error;
+        response = await postData(false);
+      }
 
       console.log(response.data);
     } catch (error) {